@@ -0,0 +1,213 @@
+"""
+End-to-end load benchmark for the DHS IA Exam Bot application/exam lifecycle
+
+Runs create -> submit -> approve -> start_exam -> submit_exam -> get_exam_results
+for synthetic applicants through DHSBot on a fresh database, then reports
+throughput and latency percentiles per request type. Each step runs as its
+own phase for every applicant, so its throughput is measured on its own.
+    
+    python benchmarks/lifecycle.py --users 2000 --concurrency 8 --save baseline.json
+    python benchmarks/lifecycle.py --users 2000 --concurrency 8 --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root and src to path
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, os.path.join(PROJECT_DIR, 'src'))
+
+from bot import DHSBot
+from database import Database
+from sessions import MemorySessionStore
+
+STEPS = ["create_application", "submit_application", "approve_application",
+         "start_exam", "submit_exam", "get_exam_results"]
+
+
+class LatencyRecorder:
+    """Collects latencies and failures for one request type from many threads"""
+    
+    def __init__(self):
+        self.samples = []
+        self.failures = 0
+        self._lock = threading.Lock()
+    
+    def timed(self, call, *args, **kwargs):
+        """Run call, recording its latency and whether it succeeded"""
+        started = time.perf_counter()
+        result = call(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.samples.append(elapsed)
+            if not result.get('success'):
+                self.failures += 1
+        return result
+
+
+def step_call(bot, step, user_id, exams, accuracy, rng):
+    """Return the call and arguments that perform one lifecycle step for a user"""
+    if step == "create_application":
+        return bot.process_user_request, (step, user_id), {
+            "name": f"Applicant {user_id}", "email": f"{user_id}@example.com"
+        }
+    if step == "approve_application":
+        # Reviewer action; not a bot request type
+        return bot.app_manager.approve_application, (user_id,), {}
+    if step == "submit_exam":
+        questions = exams.get(user_id, [])
+        answers = [
+            {"question_id": question['id'],
+             "answer": question['correct_answer'] if rng.random() < accuracy else "Z"}
+            for question in questions
+        ]
+        return bot.process_user_request, (step, user_id), {"answers": answers}
+    return bot.process_user_request, (step, user_id), {}
+
+
+def run_step(bot, step, user_ids, concurrency, exams, accuracy, seed):
+    """Run one lifecycle step for every user and return its recorder and wall time"""
+    recorder = LatencyRecorder()
+    
+    def work(index, user_id):
+        call, args, kwargs = step_call(bot, step, user_id, exams, accuracy,
+                                       random.Random(seed + index))
+        result = recorder.timed(call, *args, **kwargs)
+        if step == "start_exam":
+            exams[user_id] = result.get('exam_session', {}).get('questions', [])
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(work, index, user_id) for index, user_id in enumerate(user_ids)]:
+            future.result()
+    return recorder, time.perf_counter() - started
+
+
+def percentile(sorted_samples, fraction):
+    """Return the nearest-rank percentile of sorted samples"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_samples) + 0.5)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def run_benchmark(users, concurrency, db_path=None, accuracy=0.75, seed=0):
+    """Run the lifecycle for ``users`` applicants and return the report dict"""
+    db_path = db_path or os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    db = Database(db_path, pool_size=max(concurrency, 1))
+    bot = DHSBot(db)
+    # Every applicant holds a session between the start and submit phases
+    bot.exam.sessions = MemorySessionStore(max_sessions=max(users, 1))
+    # Forms are generated ahead of time in production, not during start_exam
+    bot.exam.forms.refill()
+    user_ids = [f"bench{index:07d}" for index in range(users)]
+    exams = {}
+    
+    results = {}
+    wall_seconds = 0.0
+    for step in STEPS:
+        recorder, seconds = run_step(bot, step, user_ids, concurrency, exams, accuracy, seed)
+        wall_seconds += seconds
+        samples = sorted(recorder.samples)
+        results[step] = {
+            "count": len(samples),
+            "failures": recorder.failures,
+            "ops_per_sec": len(samples) / seconds if seconds else 0.0,
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000
+        }
+    bot.close()
+    db.close()
+    
+    return {
+        "config": {"users": users, "concurrency": concurrency, "accuracy": accuracy},
+        "wall_seconds": wall_seconds,
+        "lifecycles_per_sec": users / wall_seconds if wall_seconds else 0.0,
+        "results": results
+    }
+
+
+def compare(report, baseline, tolerance, min_delta_ms=1.0):
+    """Return request types whose throughput or p95 latency regressed past tolerance
+    
+    p95 changes smaller than min_delta_ms are ignored; sub-millisecond
+    latencies swing by more than any sensible tolerance between runs.
+    """
+    regressions = []
+    for step, current in report['results'].items():
+        previous = baseline['results'].get(step)
+        if not previous:
+            continue
+        if current['ops_per_sec'] < previous['ops_per_sec'] * (1 - tolerance):
+            regressions.append(f"{step}: ops/sec {previous['ops_per_sec']:.1f} -> {current['ops_per_sec']:.1f}")
+        if (current['p95_ms'] > previous['p95_ms'] * (1 + tolerance)
+                and current['p95_ms'] - previous['p95_ms'] > min_delta_ms):
+            regressions.append(f"{step}: p95 {previous['p95_ms']:.2f}ms -> {current['p95_ms']:.2f}ms")
+    return regressions
+
+
+def print_report(report, baseline=None):
+    """Print the per-request-type table, with baseline deltas when given"""
+    config = report['config']
+    print(f"{config['users']} applicants, concurrency {config['concurrency']}: "
+          f"{report['wall_seconds']:.2f}s, {report['lifecycles_per_sec']:.1f} lifecycles/s\n")
+    print(f"{'Request type':<22}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'failed':>8}")
+    for step, row in report['results'].items():
+        line = (f"{step:<22}{row['ops_per_sec']:>10.1f}{row['p50_ms']:>10.2f}"
+                f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['failures']:>8}")
+        previous = baseline['results'].get(step) if baseline else None
+        if previous and previous['p95_ms']:
+            change = (row['p95_ms'] - previous['p95_ms']) / previous['p95_ms']
+            line += f"   p95 {change:+.0%} vs baseline"
+        print(line)
+
+
+def main(argv=None):
+    """Run the benchmark from the command line"""
+    parser = argparse.ArgumentParser(description="DHS IA Exam Bot lifecycle benchmark")
+    parser.add_argument("--users", type=int, default=1000, help="Synthetic applicants to run")
+    parser.add_argument("--concurrency", type=int, default=4, help="Worker threads")
+    parser.add_argument("--db", help="Database file to use (default: a fresh temporary file)")
+    parser.add_argument("--accuracy", type=float, default=0.75, help="Share of questions answered correctly")
+    parser.add_argument("--save", help="Write the report to this JSON file as a baseline")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown before a change counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore p95 changes smaller than this")
+    args = parser.parse_args(argv)
+    
+    report = run_benchmark(args.users, args.concurrency, args.db, args.accuracy)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    print_report(report, baseline)
+    
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+    
+    if baseline:
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
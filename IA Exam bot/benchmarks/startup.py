@@ -0,0 +1,85 @@
+"""
+Cold-start benchmark for the DHS IA Exam Bot
+
+Starts fresh interpreters and times importing the bot, constructing DHSBot
+and handling the first request, then checks the medians against
+STARTUP_BUDGET_MS in config/settings.py.
+    
+    python benchmarks/startup.py --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Add the project root and src to path
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PROJECT_DIR)
+
+from config.settings import STARTUP_BUDGET_MS
+
+# Run in a child interpreter so nothing is already imported or cached
+PROBE = """
+import json, os, sys, tempfile, time
+started = time.perf_counter()
+sys.path.insert(0, {project!r})
+sys.path.insert(0, os.path.join({project!r}, 'src'))
+from bot import DHSBot
+from database import Database
+imported = time.perf_counter()
+bot = DHSBot(Database(os.path.join(tempfile.mkdtemp(), "startup.db")))
+constructed = time.perf_counter()
+bot.process_user_request("get_status", "startup")
+answered = time.perf_counter()
+print(json.dumps({{
+    "import": (imported - started) * 1000,
+    "construct": (constructed - imported) * 1000,
+    "first_request": (answered - constructed) * 1000,
+    "heavy_modules": sorted(name for name in ("numpy", "tabulate") if name in sys.modules)
+}}))
+bot.close()
+"""
+
+
+def measure_once():
+    """Time one cold start in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(project=os.path.abspath(PROJECT_DIR))],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def run_benchmark(runs):
+    """Return the median of each phase over several cold starts"""
+    samples = [measure_once() for _ in range(runs)]
+    report = {phase: statistics.median(sample[phase] for sample in samples)
+              for phase in STARTUP_BUDGET_MS}
+    report['heavy_modules'] = sorted({name for sample in samples for name in sample['heavy_modules']})
+    return report
+
+
+def main(argv=None):
+    """Run the benchmark from the command line"""
+    parser = argparse.ArgumentParser(description="DHS IA Exam Bot cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time")
+    args = parser.parse_args(argv)
+    
+    report = run_benchmark(args.runs)
+    over_budget = False
+    print(f"{'Phase':<16}{'median ms':>10}{'budget ms':>11}")
+    for phase, budget in STARTUP_BUDGET_MS.items():
+        flag = "" if report[phase] <= budget else "  OVER BUDGET"
+        over_budget = over_budget or bool(flag)
+        print(f"{phase:<16}{report[phase]:>10.1f}{budget:>11}{flag}")
+    if report['heavy_modules']:
+        print(f"\nLoaded at startup: {', '.join(report['heavy_modules'])}")
+        over_budget = True
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,53 +1,199 @@
-"""
-Configuration settings for the DHS IA Exam Bot
-"""
-
-import os
-from pathlib import Path
-
-# Project root
-PROJECT_ROOT = Path(__file__).parent.parent
-
-# Database configuration
-DATABASE_PATH = PROJECT_ROOT / "data" / "dhs_bot.db"
-DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
-
-# Application settings
-APP_NAME = "DHS IA Exam Bot"
-APP_VERSION = "1.0.0"
-DEBUG_MODE = True
-
-# Exam configuration
-IA_EXAM_CONFIG = {
-    "min_passing_score": 70,
-    "max_attempts": 3,
-    "time_limit_minutes": 120,
-    "total_questions": 50
-}
-
-# Application states
-APPLICATION_STATES = [
-    "DRAFT",
-    "SUBMITTED",
-    "UNDER_REVIEW",
-    "APPROVED",
-    "REJECTED",
-    "PENDING_EXAM"
-]
-
-# Exam categories
-EXAM_CATEGORIES = [
-    "Security Fundamentals",
-    "Network Security",
-    "Cryptography",
-    "Access Control",
-    "Incident Response"
-]
-
-# Logging configuration
-LOG_LEVEL = "INFO"
-LOG_FILE = PROJECT_ROOT / "logs" / "dhs_bot.log"
-
-# Create necessary directories
-DATABASE_PATH.parent.mkdir(parents=True, exist_ok=True)
-LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+"""
+Configuration settings for the DHS IA Exam Bot
+"""
+
+import os
+from pathlib import Path
+
+# Project root
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Database configuration
+DATABASE_PATH = PROJECT_ROOT / "data" / "dhs_bot.db"
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+
+# Connection pool shared by the bot and its managers
+DATABASE_POOL_SIZE = 5
+DATABASE_TIMEOUT_SECONDS = 30
+
+# Number of SQLite files applicants are spread across by a hash of user_id.
+# With more than one, DATABASE_PATH names the set (dhs_bot.1-of-4.db, ...).
+# Change it with `main.py reshard`, never by editing it on a live database.
+DATABASE_SHARDS = 1
+
+# Pragmas applied to every pooled connection
+DATABASE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000  # negative values are in KiB
+}
+
+# Read-through caches in front of application and exam history lookups.
+# Writes through the same Database invalidate entries as they commit; the TTL
+# bounds how stale an entry can get when another process writes.
+READ_CACHE_CONFIG = {
+    "applications": {"maxsize": 10000, "ttl_seconds": 5},
+    "exam_history": {"maxsize": 10000, "ttl_seconds": 5}
+}
+
+# Asyncio front-end (async_bot.AsyncDHSBot). Blocking SQLite work runs on a
+# thread pool no larger than the connection pool.
+ASYNC_BOT_CONFIG = {
+    "max_workers": DATABASE_POOL_SIZE,
+    "max_concurrent_requests": 200,
+    "request_timeout_seconds": 30
+}
+
+# Audit log writer. "sync" entries are committed with the change they
+# describe; "async" entries are queued and written in background batches.
+AUDIT_LOG_CONFIG = {
+    "queue_size": 10000,
+    "batch_size": 500,
+    "flush_interval_seconds": 0.5,
+    "max_retries": 3,
+    "default_durability": "async",
+    "durability": {
+        "EXAM_COMPLETED": "sync",
+        "APPLICATION_REJECTED": "sync"
+    }
+}
+
+# Audit log partitioning and retention (audit_archive.AuditLogArchiver).
+# Entries older than hot_months move out of audit_log into monthly
+# audit_log_pYYYYMM tables, read together through the audit_log_all view.
+# Partitions older than archive_after_months are compacted into gzip JSONL
+# files and dropped; archives older than delete_after_months are removed
+# (None keeps them forever). archive_dir None means an audit_archive
+# directory next to the database file.
+AUDIT_RETENTION_CONFIG = {
+    "hot_months": 1,
+    "archive_after_months": 12,
+    "delete_after_months": None,
+    "archive_dir": None,
+    "fetch_size": 1000
+}
+
+# Bulk application import (importer.ApplicationImporter). Each chunk is
+# validated and inserted in one transaction.
+IMPORT_CONFIG = {
+    "chunk_size": 5000
+}
+
+# Application settings
+APP_NAME = "DHS IA Exam Bot"
+APP_VERSION = "1.0.0"
+DEBUG_MODE = True
+
+# Exam configuration
+IA_EXAM_CONFIG = {
+    "min_passing_score": 70,
+    "max_attempts": 3,
+    "time_limit_minutes": 120,
+    "total_questions": 50
+}
+
+# How graded answers are stored: "packed" keeps one exam_answer_packs row per
+# result, "rows" keeps one exam_answers row per question.
+EXAM_ANSWER_STORAGE = "packed"
+
+# Item analysis (analytics.ItemAnalysis). New exam results are folded into the
+# running aggregates this many at a time.
+ANALYTICS_CONFIG = {
+    "batch_size": 5000
+}
+
+# Streaming export (export.export_table). Rows are read in keyset pages of
+# page_size, fetched from the cursor fetch_size at a time.
+EXPORT_CONFIG = {
+    "page_size": 10000,
+    "fetch_size": 1000
+}
+
+# Keyset pagination for exam history and audit log pages
+PAGINATION_CONFIG = {
+    "default_page_size": 20,
+    "max_page_size": 100
+}
+
+# Request, SQL statement and commit metrics (metrics.METRICS). Latency
+# histogram bucket bounds are in seconds.
+METRICS_CONFIG = {
+    "enabled": True,
+    "latency_buckets": [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5]
+}
+
+# Exam sessions. "memory" keeps them in-process; "sqlite" stores them in the
+# database so they survive restarts. Sessions expire once the time limit plus
+# the grace period has passed.
+EXAM_SESSION_CONFIG = {
+    "backend": "memory",
+    "grace_minutes": 5,
+    "max_sessions": 10000
+}
+
+# Pre-generated exam forms (forms.ExamFormPool). start_exam takes the next
+# unused form instead of sampling questions, or samples one when the pool is
+# empty. Pools are filled by the generate-forms command; a long-running bot
+# also tops each shard's pool back up to pool_size in the background once it
+# falls below low_water_mark.
+EXAM_FORM_CONFIG = {
+    "enabled": True,
+    "pool_size": 2000,
+    "low_water_mark": 500,
+    "batch_size": 200
+}
+
+# Application states
+APPLICATION_STATES = [
+    "DRAFT",
+    "SUBMITTED",
+    "UNDER_REVIEW",
+    "APPROVED",
+    "REJECTED",
+    "PENDING_EXAM"
+]
+
+# States an application can be approved or rejected from in a bulk review
+REVIEWABLE_STATES = ["SUBMITTED", "UNDER_REVIEW"]
+
+# Packed question bank file (see question_bank.write_question_bank)
+QUESTION_BANK_PATH = PROJECT_ROOT / "data" / "question_bank.qbank"
+
+# Exam categories
+EXAM_CATEGORIES = [
+    "Security Fundamentals",
+    "Network Security",
+    "Cryptography",
+    "Access Control",
+    "Incident Response"
+]
+
+# Share of each difficulty level within a category when sampling an exam
+EXAM_DIFFICULTY_DISTRIBUTION = {
+    "Easy": 0.3,
+    "Medium": 0.5,
+    "Hard": 0.2
+}
+
+# Cold-start budget for short-lived worker and CLI processes, checked by
+# benchmarks/startup.py: importing the bot, constructing DHSBot, and handling
+# the first request against a new database (which creates the schema)
+STARTUP_BUDGET_MS = {
+    "import": 100,
+    "construct": 10,
+    "first_request": 50
+}
+
+# Logging configuration
+LOG_LEVEL = "INFO"
+LOG_FILE = PROJECT_ROOT / "logs" / "dhs_bot.log"
+
+
+def ensure_directories():
+    """Create the data and log directories
+    
+    Importing settings has no side effects; entry points call this before
+    writing files. Database creates its own directory on first connection.
+    """
+    DATABASE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
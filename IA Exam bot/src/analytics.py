@@ -0,0 +1,261 @@
+"""
+Item analysis for DHS IA Exam Bot
+"""
+
+import math
+import numpy as np
+from database import IN_CLAUSE_CHUNK_SIZE, _chunks, _option_code, _placeholders
+from config.settings import ANALYTICS_CONFIG, EXAM_CATEGORIES, IA_EXAM_CONFIG
+
+WATERMARK = "item_analysis"
+
+
+class ItemAnalysis:
+    """Per-question difficulty and discrimination kept up to date incrementally
+    
+    Running sums per question (responses, correct answers, and the exam
+    scores of all and of correct respondents) live in the database next to
+    a watermark: the id of the last exam result folded in. ``refresh`` only
+    reads results past the watermark, so reports never rescan the tables.
+    A sharded database keeps aggregates per shard and reports add them up.
+    Pass rates are per question category, from the question bank.
+    """
+    
+    def __init__(self, db, batch_size=None, question_bank=None):
+        self.db = db
+        self.batch_size = batch_size or ANALYTICS_CONFIG['batch_size']
+        self._question_bank = question_bank
+        self._categories = None
+    
+    @property
+    def question_bank(self):
+        """Question bank giving each question's category, loaded on first use"""
+        if self._question_bank is None:
+            from exam import get_question_bank
+            self._question_bank = get_question_bank()
+        return self._question_bank
+    
+    def _category_codes(self):
+        """Return sorted question ids and each one's EXAM_CATEGORIES position, -1 if none"""
+        if self._categories is None:
+            ids = np.sort(np.asarray(self.question_bank.answer_columns()[0], dtype=np.int64))
+            codes = np.full(len(ids), -1, dtype=np.int64)
+            for code, category in enumerate(EXAM_CATEGORIES):
+                in_category = np.asarray(self.question_bank.ids_in_category(category), dtype=np.int64)
+                codes[np.searchsorted(ids, in_category)] = code
+            self._categories = ids, codes
+        return self._categories
+    
+    def refresh(self):
+        """Fold every new exam result into the aggregates; return how many were added"""
+        return sum(self._refresh_shard(shard) for shard in self.db.shards)
+    
+    def _refresh_shard(self, shard):
+        """Fold one shard's new exam results into its aggregates"""
+        added = 0
+        while True:
+            with shard.transaction() as conn:
+                row = conn.execute("SELECT last_result_id FROM analytics_watermark WHERE name = ?",
+                                   (WATERMARK,)).fetchone()
+                watermark = row[0] if row else 0
+                results = conn.execute("""
+                    SELECT id, score FROM exam_results
+                    WHERE id > ? ORDER BY id LIMIT ?
+                """, (watermark, self.batch_size)).fetchall()
+                if not results:
+                    return added
+                self._fold(conn, results)
+                conn.execute("""
+                    INSERT INTO analytics_watermark (name, last_result_id) VALUES (?, ?)
+                    ON CONFLICT(name) DO UPDATE SET last_result_id = excluded.last_result_id
+                """, (WATERMARK, results[-1][0]))
+            added += len(results)
+    
+    def _fold(self, conn, results):
+        """Add one batch of results and their answers to the aggregates"""
+        scores = {result_id: score or 0 for result_id, score in results}
+        result_ids, question_ids, options, correct = _load_answers(conn, list(scores))
+        
+        if len(question_ids):
+            answer_scores = np.fromiter((scores[result_id] for result_id in result_ids.tolist()),
+                                        dtype=np.float64, count=len(result_ids))
+            items, item_index = np.unique(question_ids, return_inverse=True)
+            responses = np.bincount(item_index)
+            right = np.bincount(item_index, weights=correct)
+            score_sum = np.bincount(item_index, weights=answer_scores)
+            score_sum_correct = np.bincount(item_index, weights=answer_scores * correct)
+            score_sum_squares = np.bincount(item_index, weights=answer_scores ** 2)
+            conn.executemany("""
+                INSERT INTO item_statistics
+                    (question_id, responses, correct, score_sum, score_sum_correct, score_sum_squares)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(question_id) DO UPDATE SET
+                    responses = responses + excluded.responses,
+                    correct = correct + excluded.correct,
+                    score_sum = score_sum + excluded.score_sum,
+                    score_sum_correct = score_sum_correct + excluded.score_sum_correct,
+                    score_sum_squares = score_sum_squares + excluded.score_sum_squares
+            """, zip(items.tolist(), responses.tolist(), right.astype(np.int64).tolist(),
+                     score_sum.tolist(), score_sum_correct.tolist(), score_sum_squares.tolist()))
+            
+            answered = options > 0
+            pairs, counts = np.unique(question_ids[answered] * 256 + options[answered],
+                                      return_counts=True)
+            conn.executemany("""
+                INSERT INTO item_option_counts (question_id, option, responses) VALUES (?, ?, ?)
+                ON CONFLICT(question_id, option) DO UPDATE SET
+                    responses = responses + excluded.responses
+            """, ((int(pair) // 256, chr(int(pair) % 256), int(count))
+                  for pair, count in zip(pairs, counts)))
+            
+            self._fold_categories(conn, result_ids, question_ids, correct)
+    
+    def _fold_categories(self, conn, result_ids, question_ids, correct):
+        """Add per-category attempts and passes for one batch of answers
+        
+        A result attempts every category it has answers in, and passes one
+        when its score on that category's questions reaches min_passing_score.
+        """
+        ids, lookup = self._category_codes()
+        positions = np.searchsorted(ids, question_ids)
+        known = positions < len(ids)
+        known[known] = ids[positions[known]] == question_ids[known]
+        codes = np.full(len(question_ids), -1, dtype=np.int64)
+        codes[known] = lookup[positions[known]]
+        categorized = codes >= 0
+        if not categorized.any():
+            return
+        
+        # One (result, category) pair as one integer
+        width = len(EXAM_CATEGORIES)
+        pairs, pair_index = np.unique(result_ids[categorized] * width + codes[categorized],
+                                      return_inverse=True)
+        totals = np.bincount(pair_index)
+        right = np.bincount(pair_index, weights=correct[categorized]).astype(np.int64)
+        passed = right * 100 // totals >= IA_EXAM_CONFIG['min_passing_score']
+        attempts = np.bincount(pairs % width, minlength=width)
+        passes = np.bincount(pairs % width, weights=passed, minlength=width).astype(np.int64)
+        conn.executemany("""
+            INSERT INTO category_statistics (category, attempts, passed) VALUES (?, ?, ?)
+            ON CONFLICT(category) DO UPDATE SET
+                attempts = attempts + excluded.attempts,
+                passed = passed + excluded.passed
+        """, [(EXAM_CATEGORIES[code], int(attempts[code]), int(passes[code]))
+              for code in range(width) if attempts[code]])
+    
+    def item_statistics(self):
+        """Return p-value, point-biserial discrimination and option counts per question"""
+        sums = {}
+        options = {}
+        for shard in self.db.shards:
+            with shard.connection() as conn:
+                for question_id, *values in conn.execute("""
+                    SELECT question_id, responses, correct, score_sum, score_sum_correct,
+                           score_sum_squares
+                    FROM item_statistics
+                """):
+                    total = sums.get(question_id)
+                    sums[question_id] = values if total is None else [
+                        a + b for a, b in zip(total, values)
+                    ]
+                for question_id, option, responses in conn.execute(
+                    "SELECT question_id, option, responses FROM item_option_counts"
+                ):
+                    key = (question_id, option)
+                    options[key] = options.get(key, 0) + responses
+        
+        stats = {}
+        for question_id in sorted(sums):
+            responses, correct, score_sum, sum_correct, sum_squares = sums[question_id]
+            stats[question_id] = {
+                "responses": responses,
+                "p_value": correct / responses if responses else None,
+                "discrimination": _point_biserial(responses, correct, score_sum,
+                                                  sum_correct, sum_squares),
+                "options": {}
+            }
+        for (question_id, option), responses in sorted(options.items()):
+            stats[question_id]['options'][option] = responses
+        return stats
+    
+    def category_pass_rates(self):
+        """Return attempts, passes and pass rate per question category, in EXAM_CATEGORIES order"""
+        totals = {}
+        for shard in self.db.shards:
+            with shard.connection() as conn:
+                for category, attempts, passed in conn.execute(
+                    "SELECT category, attempts, passed FROM category_statistics"
+                ):
+                    total = totals.get(category, (0, 0))
+                    totals[category] = (total[0] + attempts, total[1] + passed)
+        rates = {}
+        for category in EXAM_CATEGORIES:
+            if category in totals:
+                attempts, passed = totals[category]
+                rates[category] = {"attempts": attempts, "passed": passed,
+                                   "pass_rate": passed / attempts if attempts else None}
+        return rates
+
+
+def _point_biserial(responses, correct, score_sum, sum_correct, sum_squares):
+    """Return the correlation between answering an item correctly and the exam score
+    
+    Uses the running sums only: (M1 - M0) / s * sqrt(p * q), where M1 and M0
+    are the mean scores of correct and incorrect respondents and s is the
+    population standard deviation of all respondents' scores.
+    """
+    wrong = responses - correct
+    if not correct or not wrong:
+        return None
+    mean = score_sum / responses
+    variance = sum_squares / responses - mean * mean
+    if variance <= 0:
+        return None
+    mean_correct = sum_correct / correct
+    mean_wrong = (score_sum - sum_correct) / wrong
+    p = correct / responses
+    return (mean_correct - mean_wrong) / math.sqrt(variance) * math.sqrt(p * (1 - p))
+
+
+def _load_answers(conn, result_ids):
+    """Return flat (result id, question id, option code, correct) arrays for some results
+    
+    Packed rows are unpacked with NumPy; results stored row by row are read
+    from exam_answers. Answers that are not a single character get option
+    code 0 and are left out of the option counts.
+    """
+    parts = []
+    packed = set()
+    for chunk in _chunks(result_ids, IN_CLAUSE_CHUNK_SIZE):
+        for result_id, question_ids, user_answers, bitmap in conn.execute(f"""
+            SELECT result_id, question_ids, user_answers, correct_bitmap
+            FROM exam_answer_packs WHERE result_id IN ({_placeholders(chunk)})
+        """, chunk):
+            count = len(user_answers)
+            packed.add(result_id)
+            parts.append((
+                np.full(count, result_id, dtype=np.int64),
+                np.frombuffer(question_ids, dtype="<i8").astype(np.int64),
+                np.frombuffer(user_answers, dtype=np.uint8).astype(np.int64),
+                np.unpackbits(np.frombuffer(bitmap, dtype=np.uint8),
+                              bitorder="little")[:count].astype(np.float64)
+            ))
+    
+    unpacked = [result_id for result_id in result_ids if result_id not in packed]
+    for chunk in _chunks(unpacked, IN_CLAUSE_CHUNK_SIZE):
+        rows = conn.execute(f"""
+            SELECT result_id, question_id, user_answer, is_correct FROM exam_answers
+            WHERE result_id IN ({_placeholders(chunk)}) AND question_id IS NOT NULL
+        """, chunk).fetchall()
+        if rows:
+            parts.append((
+                np.array([row[0] for row in rows], dtype=np.int64),
+                np.array([row[1] for row in rows], dtype=np.int64),
+                np.array([_option_code(row[2]) or 0 for row in rows], dtype=np.int64),
+                np.array([1.0 if row[3] else 0.0 for row in rows])
+            ))
+    
+    if not parts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0)
+    return tuple(np.concatenate(column) for column in zip(*parts))
@@ -1,85 +1,133 @@
-"""
-Application management for DHS IA Exam Bot
-"""
-
-from datetime import datetime
-from database import Database
-from config.settings import APPLICATION_STATES
-
-
-class ApplicationManager:
-    """Manages DHS applications"""
-    
-    def __init__(self):
-        self.db = Database()
-    
-    def create_application(self, user_id, name, email):
-        """Create a new application"""
-        if not self._validate_email(email):
-            return {"success": False, "message": "Invalid email format"}
-        
-        if self.db.add_application(user_id, name, email):
-            return {
-                "success": True,
-                "message": "Application created successfully",
-                "user_id": user_id
-            }
-        else:
-            return {
-                "success": False,
-                "message": "User already has an application"
-            }
-    
-    def get_application(self, user_id):
-        """Retrieve application details"""
-        app = self.db.get_application(user_id)
-        if app:
-            return {"success": True, "data": app}
-        return {"success": False, "message": "Application not found"}
-    
-    def submit_application(self, user_id):
-        """Submit an application for review"""
-        app = self.db.get_application(user_id)
-        if not app:
-            return {"success": False, "message": "Application not found"}
-        
-        if app['status'] != 'DRAFT':
-            return {"success": False, "message": f"Cannot submit application in {app['status']} state"}
-        
-        self.db.update_application_status(user_id, 'SUBMITTED')
-        return {"success": True, "message": "Application submitted successfully"}
-    
-    def approve_application(self, user_id):
-        """Approve an application"""
-        app = self.db.get_application(user_id)
-        if not app:
-            return {"success": False, "message": "Application not found"}
-        
-        self.db.update_application_status(user_id, 'APPROVED')
-        self.db.update_application_status(user_id, 'PENDING_EXAM')
-        return {"success": True, "message": "Application approved. User can now take IA exam"}
-    
-    def reject_application(self, user_id, reason):
-        """Reject an application"""
-        app = self.db.get_application(user_id)
-        if not app:
-            return {"success": False, "message": "Application not found"}
-        
-        self.db.update_application_status(user_id, 'REJECTED')
-        self.db.log_action(user_id, "APPLICATION_REJECTED", reason)
-        return {"success": True, "message": "Application rejected"}
-    
-    def get_application_status(self, user_id):
-        """Get current application status"""
-        app = self.db.get_application(user_id)
-        if app:
-            return {"success": True, "status": app['status']}
-        return {"success": False, "message": "Application not found"}
-    
-    def _validate_email(self, email):
-        """Validate email format"""
-        return "@" in email and "." in email.split("@")[1]
-    
-    def close(self):
-        """Close database connection"""
-        self.db.close()
+"""
+Application management for DHS IA Exam Bot
+"""
+
+from datetime import datetime
+from sharding import open_database
+from importer import ApplicationImporter
+from config.settings import APPLICATION_STATES, REVIEWABLE_STATES
+
+
+class ApplicationManager:
+    """Manages DHS applications"""
+    
+    def __init__(self, db=None):
+        # A shared Database can be injected; otherwise this manager owns its own
+        self._owns_db = db is None
+        self.db = db if db is not None else open_database()
+    
+    def create_application(self, user_id, name, email):
+        """Create a new application"""
+        if not self._validate_email(email):
+            return {"success": False, "message": "Invalid email format"}
+        
+        if self.db.add_application(user_id, name, email):
+            return {
+                "success": True,
+                "message": "Application created successfully",
+                "user_id": user_id
+            }
+        else:
+            return {
+                "success": False,
+                "message": "User already has an application"
+            }
+    
+    def get_application(self, user_id):
+        """Retrieve application details"""
+        app = self.db.get_application(user_id)
+        if app:
+            return {"success": True, "data": app.to_dict()}
+        return {"success": False, "message": "Application not found"}
+    
+    def import_applications(self, source, reject_path=None, chunk_size=None):
+        """Create applications in bulk from a CSV or JSONL file"""
+        importer = ApplicationImporter(self.db, self._validate_email, chunk_size)
+        return importer.run(source, reject_path)
+    
+    def submit_application(self, user_id):
+        """Submit an application for review"""
+        app = self.db.get_application(user_id)
+        if not app:
+            return {"success": False, "message": "Application not found"}
+        
+        if app.status != 'DRAFT':
+            return {"success": False, "message": f"Cannot submit application in {app.status} state"}
+        
+        self.db.update_application_status(user_id, 'SUBMITTED')
+        return {"success": True, "message": "Application submitted successfully"}
+    
+    def approve_application(self, user_id):
+        """Approve an application"""
+        app = self.db.get_application(user_id)
+        if not app:
+            return {"success": False, "message": "Application not found"}
+        
+        self.db.transition_applications([user_id], ['APPROVED', 'PENDING_EXAM'])
+        return {"success": True, "message": "Application approved. User can now take IA exam"}
+    
+    def reject_application(self, user_id, reason):
+        """Reject an application"""
+        app = self.db.get_application(user_id)
+        if not app:
+            return {"success": False, "message": "Application not found"}
+        
+        self.db.transition_applications([user_id], ['REJECTED'], action="APPLICATION_REJECTED",
+                                        details=reason)
+        return {"success": True, "message": "Application rejected"}
+    
+    def approve_applications(self, user_ids):
+        """Approve every application under review in one transaction"""
+        approved = self.db.transition_applications(
+            user_ids, ['APPROVED', 'PENDING_EXAM'], REVIEWABLE_STATES
+        )
+        return self._bulk_outcome(user_ids, approved, "approve",
+                                  "Application approved. User can now take IA exam")
+    
+    def reject_applications(self, user_ids, reason):
+        """Reject every application under review in one transaction"""
+        rejected = self.db.transition_applications(
+            user_ids, ['REJECTED'], REVIEWABLE_STATES, action="APPLICATION_REJECTED", details=reason
+        )
+        return self._bulk_outcome(user_ids, rejected, "reject", "Application rejected")
+    
+    def _bulk_outcome(self, user_ids, changed, verb, message):
+        """Build per-user results for a bulk review, explaining each skipped user"""
+        skipped = [user_id for user_id in user_ids if user_id not in changed]
+        apps = self.db.get_applications(skipped) if skipped else {}
+        results = {}
+        for user_id in user_ids:
+            if user_id in changed:
+                results[user_id] = {"success": True, "message": message}
+            elif user_id in apps:
+                results[user_id] = {
+                    "success": False,
+                    "message": f"Cannot {verb} application in {apps[user_id].status} state"
+                }
+            else:
+                results[user_id] = {"success": False, "message": "Application not found"}
+        return {"success": True, "updated": len(changed), "results": results}
+    
+    def get_application_status(self, user_id):
+        """Get current application status"""
+        app = self.db.get_application(user_id)
+        if app:
+            return {"success": True, "status": app.status}
+        return {"success": False, "message": "Application not found"}
+    
+    def get_audit_trail(self, user_id, cursor=None, limit=None, action=None):
+        """Get one page of a user's audit log entries, newest first"""
+        try:
+            page = self.db.get_audit_log_page(user_id, cursor, limit, action)
+        except ValueError as exc:
+            return {"success": False, "message": str(exc)}
+        return {"success": True, "entries": page['items'], "next_cursor": page['next_cursor']}
+    
+    def _validate_email(self, email):
+        """Validate email format"""
+        return "@" in email and "." in email.split("@")[1]
+    
+    def close(self):
+        """Close database connection if this manager owns it"""
+        if self._owns_db:
+            self.db.close()
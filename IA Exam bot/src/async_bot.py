@@ -0,0 +1,107 @@
+"""
+Asyncio front-end for the DHS IA Exam Bot
+"""
+
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from bot import DHSBot
+from config.settings import ASYNC_BOT_CONFIG
+
+
+class AsyncDHSBot:
+    """Serves many in-flight requests by running DHSBot work on a bounded thread pool"""
+    
+    def __init__(self, bot=None, max_workers=None, max_concurrent_requests=None,
+                 request_timeout=None):
+        self._owns_bot = bot is None
+        self.bot = bot if bot is not None else DHSBot()
+        self.request_timeout = request_timeout or ASYNC_BOT_CONFIG['request_timeout_seconds']
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or ASYNC_BOT_CONFIG['max_workers'],
+            thread_name_prefix="dhs-bot-db"
+        )
+        self._limit = asyncio.Semaphore(
+            max_concurrent_requests or ASYNC_BOT_CONFIG['max_concurrent_requests']
+        )
+        self._user_locks = weakref.WeakValueDictionary()
+        self._finishing = set()
+    
+    async def process_user_request(self, request_type, user_id, timeout=None, **kwargs):
+        """Process a request without blocking the event loop
+        
+        Requests for the same user run one at a time so that, for example, a
+        double-clicked submit cannot grade one session twice. If the request
+        times out or the caller is cancelled before a worker picks it up, it
+        never runs. Once SQLite work has started it runs to completion, and
+        the user's next request waits for it even after the caller has been
+        told the outcome is unknown.
+        """
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = self._user_locks[user_id] = asyncio.Lock()
+        
+        await lock.acquire()
+        try:
+            await self._limit.acquire()
+        except BaseException:
+            lock.release()
+            raise
+        
+        call = functools.partial(self.bot.process_user_request, request_type, user_id, **kwargs)
+        work = self._executor.submit(call)
+        future = asyncio.wrap_future(work)
+        try:
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout or self.request_timeout)
+            except asyncio.TimeoutError:
+                if work.cancel():
+                    return {"success": False, "message": "Request timed out"}
+                reply = {"success": False,
+                         "message": "Request timed out while processing; its outcome is unknown"}
+            except asyncio.CancelledError:
+                if not work.cancel():
+                    self._release_when_done(future, lock)
+                    future = None
+                raise
+            # Keep the user's lock and the slot until the work has finished
+            self._release_when_done(future, lock)
+            future = None
+            return reply
+        finally:
+            if future is not None:
+                self._limit.release()
+                lock.release()
+    
+    def _release_when_done(self, future, lock):
+        """Release a request's slot and user lock once its executor work finishes"""
+        async def release():
+            try:
+                await asyncio.wait([future])
+            finally:
+                self._limit.release()
+                lock.release()
+        
+        task = asyncio.ensure_future(release())
+        self._finishing.add(task)
+        task.add_done_callback(self._finishing.discard)
+    
+    def get_bot_help(self):
+        """Get available bot commands"""
+        return self.bot.get_bot_help()
+    
+    async def close(self):
+        """Wait for in-flight work, then clean up resources"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        if self._finishing:
+            await asyncio.gather(*self._finishing)
+        if self._owns_bot:
+            await loop.run_in_executor(None, self.bot.close)
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,143 @@
+"""
+Batched audit log writer for DHS IA Exam Bot
+"""
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from metrics import METRICS
+from config.settings import AUDIT_LOG_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Queue markers: write the current batch now / write it and stop
+_FLUSH = object()
+_STOP = object()
+
+
+class AuditLogWriter:
+    """Writes audit entries from a bounded queue in batched transactions"""
+    
+    def __init__(self, pool, config=None):
+        self.pool = pool
+        self.config = dict(AUDIT_LOG_CONFIG, **(config or {}))
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=self.config['queue_size'])
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+    
+    def durability(self, action):
+        """Return "sync" or "async" for an audit action"""
+        return self.config['durability'].get(action, self.config['default_durability'])
+    
+    def entry(self, user_id, action, details):
+        """Build a queued entry, stamped now in the same format as CURRENT_TIMESTAMP"""
+        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        return (user_id, action, timestamp, details)
+    
+    def submit(self, entries):
+        """Queue entries for the background writer, blocking if the queue is full"""
+        if self._closed:
+            raise RuntimeError("Audit log writer is closed")
+        self._ensure_started()
+        for entry in entries:
+            self._queue.put(entry)
+    
+    def flush(self):
+        """Block until every queued entry has been written"""
+        if self._thread is not None and not self._closed:
+            self._queue.put(_FLUSH)
+            self._queue.join()
+    
+    def close(self):
+        """Flush pending entries and stop the background thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        # The exit hook would otherwise keep this writer and its pool alive
+        atexit.unregister(self.close)
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+    
+    def _ensure_started(self):
+        """Start the writer thread on first use"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="audit-log-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+    
+    def _run(self):
+        """Collect entries into batches by size or age and write them"""
+        batch_size = self.config['batch_size']
+        interval = self.config['flush_interval_seconds']
+        stopping = False
+        
+        while not stopping:
+            batch = []
+            markers = 0
+            deadline = None
+            
+            # Wait for the first entry, then collect until full, aged out or flushed
+            while len(batch) < batch_size:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if entry is _FLUSH or entry is _STOP:
+                    markers += 1
+                    stopping = entry is _STOP
+                    break
+                batch.append(entry)
+                if deadline is None:
+                    deadline = time.monotonic() + interval
+            
+            # Every queued item is marked done, or flush() and close() would
+            # wait for it forever
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                for _ in range(len(batch) + markers):
+                    self._queue.task_done()
+    
+    def _write(self, batch):
+        """Insert one batch, retrying briefly if the database is busy
+        
+        A batch that still fails, or fails for any other reason, is dropped,
+        logged and counted in ``dropped`` and the audit metrics; the writer
+        keeps running.
+        """
+        for attempt in range(self.config['max_retries'] + 1):
+            try:
+                with self.pool.connection() as conn:
+                    with conn:
+                        conn.executemany("""
+                            INSERT INTO audit_log (user_id, action, timestamp, details)
+                            VALUES (?, ?, ?, ?)
+                        """, batch)
+                return
+            except sqlite3.OperationalError as exc:
+                error = exc
+                if attempt < self.config['max_retries']:
+                    time.sleep(self.config['flush_interval_seconds'] * (attempt + 1))
+            except Exception as exc:
+                error = exc
+                break
+        self.dropped += len(batch)
+        METRICS.observe_audit_dropped(len(batch))
+        logger.error("Dropped %d audit log entries: %s", len(batch), error)
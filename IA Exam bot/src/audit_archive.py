@@ -0,0 +1,238 @@
+"""
+Audit log partitioning and archival for DHS IA Exam Bot
+
+New audit entries always go into the audit_log table. Maintenance moves
+entries from past months into one table per month (audit_log_pYYYYMM),
+so audit_log only holds recent history and its inserts and indexes stay
+cheap. The audit_log_all view reads audit_log and every live partition
+together. Partitions past the retention period are compacted into gzip
+JSONL files and dropped.
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from config.settings import AUDIT_RETENTION_CONFIG
+
+AUDIT_COLUMNS = ["id", "user_id", "action", "timestamp", "details"]
+
+# Every partition gets the indexes audit_log has, so reads through the view
+# can merge the tables in (timestamp, id) order
+PARTITION_INDEXES = {
+    "user_time": "user_id, timestamp",
+    "time": "timestamp",
+    "action_time": "action, timestamp"
+}
+
+_PERIOD = re.compile(r"\d{4}-\d{2}")
+
+
+def partition_table(period):
+    """Return the table holding one "YYYY-MM" period"""
+    return f"audit_log_p{period.replace('-', '')}"
+
+
+def read_audit_archive(path):
+    """Yield the entries of an archive file as dicts, oldest id first"""
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            yield json.loads(line)
+
+
+class AuditLogArchiver:
+    """Moves old audit entries into monthly partitions and archives expired ones"""
+    
+    def __init__(self, db, config=None):
+        self.db = db
+        self.config = dict(AUDIT_RETENTION_CONFIG, **(config or {}))
+    
+    def run(self, now=None):
+        """Partition, archive and expire the audit log of every shard
+        
+        Safe to run at any time, from cron for example; it only needs to run
+        about once a month to keep audit_log to hot_months of entries.
+        Returns counts of entries moved and archived and files deleted.
+        """
+        now = now or datetime.now(timezone.utc)
+        totals = {"moved": 0, "archived_partitions": 0, "archived_rows": 0, "deleted_archives": 0}
+        for shard in self.db.shards:
+            totals['moved'] += self.partition(shard, now)
+            partitions, rows = self.archive(shard, now)
+            totals['archived_partitions'] += partitions
+            totals['archived_rows'] += rows
+            totals['deleted_archives'] += self.expire(shard, now)
+        return totals
+    
+    def partition(self, shard, now):
+        """Move entries older than hot_months from audit_log into monthly tables"""
+        cutoff = _month_start(now, self.config['hot_months'] - 1)
+        with shard.connection() as conn:
+            periods = [row[0] for row in conn.execute("""
+                SELECT DISTINCT substr(timestamp, 1, 7) FROM audit_log WHERE timestamp < ?
+            """, (cutoff,))]
+        
+        moved = 0
+        for period in periods:
+            # Entries without a well-formed timestamp stay in audit_log
+            if period is None or not _PERIOD.fullmatch(period):
+                continue
+            table = partition_table(period)
+            bounds = (f"{period}-01 00:00:00", _next_month(period))
+            with shard.transaction() as conn:
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id INTEGER PRIMARY KEY,
+                        user_id TEXT,
+                        action TEXT,
+                        timestamp TIMESTAMP,
+                        details TEXT
+                    )
+                """)
+                for name, columns in PARTITION_INDEXES.items():
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{name} ON {table} ({columns})")
+                count = conn.execute(f"""
+                    INSERT INTO {table} ({", ".join(AUDIT_COLUMNS)})
+                    SELECT {", ".join(AUDIT_COLUMNS)} FROM audit_log
+                    WHERE timestamp >= ? AND timestamp < ?
+                """, bounds).rowcount
+                conn.execute("DELETE FROM audit_log WHERE timestamp >= ? AND timestamp < ?", bounds)
+                conn.execute("""
+                    INSERT INTO audit_log_partitions (period, table_name, row_count) VALUES (?, ?, ?)
+                    ON CONFLICT(period) DO UPDATE SET row_count = row_count + excluded.row_count
+                """, (period, table, count))
+                _rebuild_view(conn)
+            moved += count
+        return moved
+    
+    def archive(self, shard, now):
+        """Compact partitions older than archive_after_months into gzip files
+        
+        Each archive is written and synced before its table is dropped. Late
+        entries for a period that was already archived are appended to the
+        same file as another gzip member. The file's size is recorded in the
+        transaction that drops the table, so a run interrupted in between
+        cuts the archive back to that size instead of appending the rows
+        twice. Returns (partitions, rows) archived.
+        """
+        cutoff = _month_start(now, self.config['archive_after_months'])[:7]
+        with shard.connection() as conn:
+            due = conn.execute("""
+                SELECT period, table_name, archive_path, archive_bytes FROM audit_log_partitions
+                WHERE row_count > 0 AND period < ? ORDER BY period
+            """, (cutoff,)).fetchall()
+        
+        rows = 0
+        for period, table, archived_to, archive_bytes in due:
+            path = self._archive_path(shard, period)
+            # Bytes of the archive that are committed; archives written before
+            # sizes were recorded are kept whole
+            if archived_to is None:
+                archive_bytes = 0
+            with shard.connection() as conn:
+                count, size = self._write_archive(conn, table, path, archive_bytes)
+            with shard.transaction() as conn:
+                conn.execute(f"DROP TABLE {table}")
+                conn.execute("""
+                    UPDATE audit_log_partitions
+                    SET row_count = 0, archive_path = ?, archived_rows = archived_rows + ?,
+                        archive_bytes = ?
+                    WHERE period = ?
+                """, (str(path), count, size, period))
+                _rebuild_view(conn)
+            rows += count
+        return len(due), rows
+    
+    def expire(self, shard, now):
+        """Delete archive files older than delete_after_months; return how many"""
+        if self.config['delete_after_months'] is None:
+            return 0
+        cutoff = _month_start(now, self.config['delete_after_months'])[:7]
+        with shard.connection() as conn:
+            expired = conn.execute("""
+                SELECT period, archive_path FROM audit_log_partitions
+                WHERE row_count = 0 AND archive_path IS NOT NULL AND period < ?
+            """, (cutoff,)).fetchall()
+        for period, path in expired:
+            if os.path.exists(path):
+                os.remove(path)
+            with shard.transaction() as conn:
+                conn.execute("DELETE FROM audit_log_partitions WHERE period = ?", (period,))
+        return len(expired)
+    
+    def partitions(self):
+        """Return every partition's period, live row count and archive of every shard"""
+        listing = []
+        for index, shard in enumerate(self.db.shards):
+            with shard.connection() as conn:
+                cursor = conn.execute("""
+                    SELECT period, table_name, row_count, archive_path, archived_rows
+                    FROM audit_log_partitions ORDER BY period
+                """)
+                columns = [col[0] for col in cursor.description]
+                listing.extend(dict(zip(columns, row), shard=index) for row in cursor)
+        return listing
+    
+    def _archive_path(self, shard, period):
+        """Return the archive file of one shard's period"""
+        db_path = Path(shard.db_path)
+        directory = Path(self.config['archive_dir'] or db_path.parent / "audit_archive")
+        return directory / f"{db_path.stem}.{partition_table(period)}.jsonl.gz"
+    
+    def _write_archive(self, conn, table, path, keep_bytes=None):
+        """Append a partition's rows to path atomically; return (rows written, file size)
+        
+        Only the first keep_bytes of an existing archive are kept, or all of
+        it when keep_bytes is None.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.name + ".tmp")
+        if path.exists() and keep_bytes != 0:
+            shutil.copyfile(path, temp_path)
+            if keep_bytes is not None:
+                os.truncate(temp_path, keep_bytes)
+        elif temp_path.exists():
+            os.remove(temp_path)
+        
+        count = 0
+        cursor = conn.execute(f"SELECT {', '.join(AUDIT_COLUMNS)} FROM {table} ORDER BY id")
+        with open(temp_path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as handle:
+                while True:
+                    batch = cursor.fetchmany(self.config['fetch_size'])
+                    if not batch:
+                        break
+                    handle.write("".join(json.dumps(dict(zip(AUDIT_COLUMNS, row))) + "\n"
+                                         for row in batch).encode("utf-8"))
+                    count += len(batch)
+            raw.flush()
+            os.fsync(raw.fileno())
+            size = raw.tell()
+        os.replace(temp_path, path)
+        return count, size
+
+
+def _rebuild_view(conn):
+    """Point audit_log_all at audit_log and every live partition"""
+    tables = [row[0] for row in conn.execute("""
+        SELECT table_name FROM audit_log_partitions WHERE row_count > 0 ORDER BY period DESC
+    """)]
+    columns = ", ".join(AUDIT_COLUMNS)
+    selects = [f"SELECT {columns} FROM {table}" for table in ["audit_log", *tables]]
+    conn.execute("DROP VIEW IF EXISTS audit_log_all")
+    conn.execute(f"CREATE VIEW audit_log_all AS {' UNION ALL '.join(selects)}")
+
+
+def _month_start(now, months_back):
+    """Return the timestamp at which the month months_back before now's began"""
+    index = now.year * 12 + now.month - 1 - months_back
+    return f"{index // 12:04d}-{index % 12 + 1:02d}-01 00:00:00"
+
+
+def _next_month(period):
+    """Return the timestamp at which the month after a "YYYY-MM" period begins"""
+    year, month = map(int, period.split("-"))
+    return f"{year + month // 12:04d}-{month % 12 + 1:02d}-01 00:00:00"
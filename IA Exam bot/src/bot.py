@@ -1,65 +1,158 @@
-"""
-Main Bot logic for DHS IA Exam Bot
-"""
-
-from application import ApplicationManager
-from exam import IAExam
-from database import Database
-
-
-class DHSBot:
-    """Main DHS Application and Exam Bot"""
-    
-    def __init__(self):
-        self.app_manager = ApplicationManager()
-        self.exam = IAExam()
-        self.db = Database()
-    
-    def process_user_request(self, request_type, user_id, **kwargs):
-        """Process user requests based on type"""
-        
-        if request_type == "create_application":
-            return self.app_manager.create_application(
-                user_id, kwargs.get('name'), kwargs.get('email')
-            )
-        
-        elif request_type == "get_application":
-            return self.app_manager.get_application(user_id)
-        
-        elif request_type == "submit_application":
-            return self.app_manager.submit_application(user_id)
-        
-        elif request_type == "get_status":
-            return self.app_manager.get_application_status(user_id)
-        
-        elif request_type == "start_exam":
-            return self.exam.start_exam(user_id)
-        
-        elif request_type == "submit_exam":
-            return self.exam.submit_exam(user_id, kwargs.get('answers', []))
-        
-        elif request_type == "get_exam_results":
-            return self.exam.get_exam_results(user_id)
-        
-        else:
-            return {"success": False, "message": f"Unknown request type: {request_type}"}
-    
-    def get_bot_help(self):
-        """Get available bot commands"""
-        return {
-            "commands": {
-                "create_application": "Create a new DHS application",
-                "get_application": "Get your application details",
-                "submit_application": "Submit your application for review",
-                "get_status": "Check your application status",
-                "start_exam": "Start the IA exam",
-                "submit_exam": "Submit exam answers",
-                "get_exam_results": "View your exam results"
-            }
-        }
-    
-    def close(self):
-        """Clean up resources"""
-        self.app_manager.close()
-        self.exam.close()
-        self.db.close()
+"""
+Main Bot logic for DHS IA Exam Bot
+"""
+
+from application import ApplicationManager
+from exam import IAExam
+from sharding import open_database
+from metrics import METRICS
+
+
+class DHSBot:
+    """Main DHS Application and Exam Bot"""
+    
+    def __init__(self, db=None):
+        # One connection pool is shared by the bot and both managers
+        self._owns_db = db is None
+        self.db = db if db is not None else open_database()
+        self.app_manager = ApplicationManager(self.db)
+        self.exam = IAExam(self.db)
+        self.handlers = {}
+        self._register_default_handlers()
+    
+    def register_handler(self, request_type, handler, description, writes=False, prefetch=None):
+        """Register a request type
+        
+        ``handler`` is called as ``handler(user_id, **kwargs)``. ``writes`` marks
+        requests that change data, and ``prefetch`` is an optional bulk loader
+        called with every user id of this type in a batch before it runs.
+        """
+        self.handlers[request_type] = {
+            "handler": handler,
+            "description": description,
+            "writes": writes,
+            "prefetch": prefetch
+        }
+    
+    def _register_default_handlers(self):
+        """Register the built-in request types"""
+        apps = self.app_manager
+        exam = self.exam
+        
+        self.register_handler(
+            "create_application",
+            lambda user_id, name=None, email=None, **kwargs: apps.create_application(user_id, name, email),
+            "Create a new DHS application", writes=True
+        )
+        self.register_handler(
+            "get_application", lambda user_id, **kwargs: apps.get_application(user_id),
+            "Get your application details", prefetch=self.db.get_applications
+        )
+        self.register_handler(
+            "submit_application", lambda user_id, **kwargs: apps.submit_application(user_id),
+            "Submit your application for review", writes=True, prefetch=self.db.get_applications
+        )
+        self.register_handler(
+            "get_status", lambda user_id, **kwargs: apps.get_application_status(user_id),
+            "Check your application status", prefetch=self.db.get_applications
+        )
+        self.register_handler(
+            "start_exam", lambda user_id, **kwargs: exam.start_exam(user_id),
+            "Start the IA exam", writes=True, prefetch=self.db.get_applications
+        )
+        self.register_handler(
+            "submit_exam",
+            lambda user_id, answers=None, **kwargs: exam.submit_exam(user_id, answers or []),
+            "Submit exam answers", writes=True
+        )
+        self.register_handler(
+            "get_exam_results", lambda user_id, **kwargs: exam.get_exam_results(user_id),
+            "View your exam results", prefetch=self.db.get_exam_histories
+        )
+        self.register_handler(
+            "get_exam_results_page",
+            lambda user_id, cursor=None, limit=None, status=None, **kwargs:
+                exam.get_exam_results_page(user_id, cursor, limit, status),
+            "View your exam results a page at a time"
+        )
+        self.register_handler(
+            "get_audit_trail",
+            lambda user_id, cursor=None, limit=None, action=None, **kwargs:
+                apps.get_audit_trail(user_id, cursor, limit, action),
+            "View an account's audit trail a page at a time"
+        )
+    
+    def process_user_request(self, request_type, user_id, **kwargs):
+        """Process user requests based on type"""
+        entry = self.handlers.get(request_type)
+        # Unknown types share one label so callers cannot grow the metrics without bound
+        with METRICS.track_request(request_type if entry else "unknown") as outcome:
+            if entry is None:
+                return {"success": False, "message": f"Unknown request type: {request_type}"}
+            result = entry['handler'](user_id, **kwargs)
+            outcome['success'] = bool(result.get('success'))
+            return result
+    
+    def process_batch(self, requests):
+        """Process many requests, returning one response per request in input order
+        
+        Each request is a dict with ``request_type``, ``user_id`` and the
+        request's own arguments. Reads are served from bulk ``IN`` queries run
+        once per request type, and if any request writes, the whole batch runs
+        in one transaction with a savepoint per request, so a failing request
+        is undone without affecting the others. On a sharded database only the
+        shards of the batch's users are held.
+        """
+        user_ids_by_loader = {}
+        has_writes = False
+        for request in requests:
+            entry = self.handlers.get(request.get('request_type'))
+            if entry is None:
+                continue
+            has_writes = has_writes or entry['writes']
+            if entry['prefetch'] is not None:
+                user_ids_by_loader.setdefault(entry['prefetch'], []).append(request.get('user_id'))
+        
+        for loader, user_ids in user_ids_by_loader.items():
+            loader(user_ids)
+        
+        if not has_writes:
+            return [self._process_batch_request(request, isolated=False) for request in requests]
+        with self.db.transaction([request.get('user_id') for request in requests]):
+            return [self._process_batch_request(request, isolated=True) for request in requests]
+    
+    def _process_batch_request(self, request, isolated):
+        """Run one request from a batch, turning errors into a failed response"""
+        kwargs = dict(request)
+        request_type = kwargs.pop('request_type', None)
+        user_id = kwargs.pop('user_id', None)
+        try:
+            if not isolated:
+                return self.process_user_request(request_type, user_id, **kwargs)
+            with self.db.transaction([user_id]):
+                return self.process_user_request(request_type, user_id, **kwargs)
+        except Exception as exc:
+            return {"success": False, "message": f"Request failed: {exc}"}
+    
+    def get_bot_help(self):
+        """Get available bot commands"""
+        return {
+            "commands": {
+                request_type: entry['description'] for request_type, entry in self.handlers.items()
+            }
+        }
+    
+    def get_metrics(self):
+        """Return request, SQL statement and commit metrics as a snapshot"""
+        return METRICS.snapshot()
+    
+    def get_metrics_text(self):
+        """Return the metrics in the Prometheus text format"""
+        return METRICS.prometheus()
+    
+    def close(self):
+        """Clean up resources"""
+        self.app_manager.close()
+        self.exam.close()
+        if self._owns_db:
+            self.db.close()
@@ -0,0 +1,74 @@
+"""
+In-process read caches for DHS IA Exam Bot
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by LRUCache.get on a miss, so that None can be cached
+MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL"""
+    
+    def __init__(self, maxsize, ttl_seconds):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return the cached value for key, or MISSING"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key, value, version=None):
+        """Cache a value loaded when the cache was at ``version``
+        
+        The value is dropped if anything was invalidated since then, so a
+        read that raced with a write cannot put stale data back.
+        """
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def invalidate(self, key):
+        """Drop one key"""
+        with self._lock:
+            self.version += 1
+            self._data.pop(key, None)
+    
+    def clear(self):
+        """Drop every key"""
+        with self._lock:
+            self.version += 1
+            self._data.clear()
+    
+    def stats(self):
+        """Return hit and miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize
+            }
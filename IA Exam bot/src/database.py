@@ -1,164 +1,934 @@
-"""
-Database operations for DHS IA Exam Bot
-"""
-
-import sqlite3
-from pathlib import Path
-from datetime import datetime
-from config.settings import DATABASE_PATH
-
-
-class Database:
-    """Database management class"""
-    
-    def __init__(self, db_path=DATABASE_PATH):
-        self.db_path = db_path
-        self.connection = None
-        self.init_database()
-    
-    def init_database(self):
-        """Initialize the database with required tables"""
-        self.connection = sqlite3.connect(self.db_path)
-        cursor = self.connection.cursor()
-        
-        # Create applications table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS applications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                status TEXT DEFAULT 'DRAFT',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                submission_date TIMESTAMP
-            )
-        """)
-        
-        # Create exam results table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS exam_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                exam_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                score INTEGER,
-                passed BOOLEAN,
-                time_taken_minutes INTEGER,
-                attempt_number INTEGER,
-                category TEXT,
-                FOREIGN KEY (user_id) REFERENCES applications(user_id)
-            )
-        """)
-        
-        # Create exam answers table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS exam_answers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                result_id INTEGER NOT NULL,
-                question_id INTEGER,
-                user_answer TEXT,
-                correct_answer TEXT,
-                is_correct BOOLEAN,
-                FOREIGN KEY (result_id) REFERENCES exam_results(id)
-            )
-        """)
-        
-        # Create audit log table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS audit_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT,
-                action TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                details TEXT
-            )
-        """)
-        
-        self.connection.commit()
-    
-    def add_application(self, user_id, name, email):
-        """Add a new application"""
-        cursor = self.connection.cursor()
-        try:
-            cursor.execute("""
-                INSERT INTO applications (user_id, name, email, status)
-                VALUES (?, ?, ?, 'DRAFT')
-            """, (user_id, name, email))
-            self.connection.commit()
-            self.log_action(user_id, "APPLICATION_CREATED", f"Application created for {name}")
-            return True
-        except sqlite3.IntegrityError:
-            return False
-    
-    def get_application(self, user_id):
-        """Retrieve an application"""
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT * FROM applications WHERE user_id = ?", (user_id,))
-        row = cursor.fetchone()
-        if row:
-            columns = [col[0] for col in cursor.description]
-            return dict(zip(columns, row))
-        return None
-    
-    def update_application_status(self, user_id, status):
-        """Update application status"""
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            UPDATE applications 
-            SET status = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-        """, (status, user_id))
-        self.connection.commit()
-        self.log_action(user_id, "STATUS_UPDATED", f"Status changed to {status}")
-    
-    def save_exam_result(self, user_id, score, passed, time_taken, attempt_num, category):
-        """Save exam result"""
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            INSERT INTO exam_results (user_id, score, passed, time_taken_minutes, attempt_number, category)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (user_id, score, passed, time_taken, attempt_num, category))
-        self.connection.commit()
-        result_id = cursor.lastrowid
-        
-        status = "PASSED" if passed else "FAILED"
-        self.log_action(user_id, "EXAM_COMPLETED", f"Exam completed with score {score} - {status}")
-        
-        return result_id
-    
-    def save_exam_answers(self, result_id, answers):
-        """Save exam answers"""
-        cursor = self.connection.cursor()
-        for answer in answers:
-            cursor.execute("""
-                INSERT INTO exam_answers (result_id, question_id, user_answer, correct_answer, is_correct)
-                VALUES (?, ?, ?, ?, ?)
-            """, (result_id, answer['question_id'], answer['user_answer'], 
-                  answer['correct_answer'], answer['is_correct']))
-        self.connection.commit()
-    
-    def get_exam_history(self, user_id):
-        """Get exam history for a user"""
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            SELECT * FROM exam_results 
-            WHERE user_id = ?
-            ORDER BY exam_date DESC
-        """, (user_id,))
-        rows = cursor.fetchall()
-        columns = [col[0] for col in cursor.description]
-        return [dict(zip(columns, row)) for row in rows]
-    
-    def log_action(self, user_id, action, details):
-        """Log an action"""
-        cursor = self.connection.cursor()
-        cursor.execute("""
-            INSERT INTO audit_log (user_id, action, details)
-            VALUES (?, ?, ?)
-        """, (user_id, action, details))
-        self.connection.commit()
-    
-    def close(self):
-        """Close database connection"""
-        if self.connection:
-            self.connection.close()
+"""
+Database operations for DHS IA Exam Bot
+"""
+
+import base64
+import json
+import queue
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from datetime import datetime
+from audit import AuditLogWriter
+from cache import LRUCache, MISSING
+from metrics import METRICS
+from models import Application, ExamAnswer, ExamResult
+from config.settings import (
+    DATABASE_PATH, DATABASE_POOL_SIZE, DATABASE_TIMEOUT_SECONDS, DATABASE_PRAGMAS,
+    READ_CACHE_CONFIG, EXAM_ANSWER_STORAGE, PAGINATION_CONFIG
+)
+
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that collects work to run once its transaction commits
+    
+    Statements and commits are timed into METRICS. A statement's time covers
+    running it up to its first result row.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending_audit = []
+        self.pending_invalidations = set()
+    
+    def execute(self, sql, parameters=()):
+        if not METRICS.enabled:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            METRICS.observe_statement(sql, time.perf_counter() - started)
+    
+    def executemany(self, sql, parameters):
+        if not METRICS.enabled:
+            return super().executemany(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            METRICS.observe_statement(sql, time.perf_counter() - started)
+    
+    def commit(self):
+        if not METRICS.enabled or not self.in_transaction:
+            return super().commit()
+        started = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            METRICS.observe_commit(time.perf_counter() - started)
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        # ``with conn:`` commits without going through commit()
+        if exc_type is not None or not METRICS.enabled or not self.in_transaction:
+            return super().__exit__(exc_type, exc_value, traceback)
+        started = time.perf_counter()
+        try:
+            return super().__exit__(exc_type, exc_value, traceback)
+        finally:
+            METRICS.observe_commit(time.perf_counter() - started)
+
+
+class ConnectionPool:
+    """Thread-safe pool of SQLite connections to a single database file"""
+    
+    def __init__(self, db_path, size=DATABASE_POOL_SIZE, timeout=DATABASE_TIMEOUT_SECONDS,
+                 pragmas=None, initializer=None):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = dict(DATABASE_PRAGMAS if pragmas is None else pragmas)
+        self.initializer = initializer
+        self._initialized = initializer is None
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._connections = []
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+    
+    def _connect(self):
+        """Open a new connection and apply the configured pragmas
+        
+        Nothing touches the filesystem until the first connection is needed;
+        that one also creates the database directory and runs the initializer.
+        """
+        if not self._initialized:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                               factory=PooledConnection)
+        try:
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            if not self._initialized:
+                with self._init_lock:
+                    if not self._initialized:
+                        self.initializer(conn)
+                        self._initialized = True
+        except BaseException:
+            conn.close()
+            raise
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of the block"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("Timed out waiting for a database connection")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                # Never hand a connection with an open transaction to the next caller
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+    
+    def close(self):
+        """Close every connection opened by the pool"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Append new migrations to the end; never edit one that has already shipped.
+SCHEMA_MIGRATIONS = [
+    # 1: base tables
+    [
+        """
+        CREATE TABLE IF NOT EXISTS applications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            status TEXT DEFAULT 'DRAFT',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            submission_date TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS exam_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            exam_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            score INTEGER,
+            passed BOOLEAN,
+            time_taken_minutes INTEGER,
+            attempt_number INTEGER,
+            category TEXT,
+            FOREIGN KEY (user_id) REFERENCES applications(user_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS exam_answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            result_id INTEGER NOT NULL,
+            question_id INTEGER,
+            user_answer TEXT,
+            correct_answer TEXT,
+            is_correct BOOLEAN,
+            FOREIGN KEY (result_id) REFERENCES exam_results(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            action TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            details TEXT
+        )
+        """
+    ],
+    # 2: indexes for per-user history, per-result answers and per-user audit lookups
+    [
+        "CREATE INDEX IF NOT EXISTS idx_exam_results_user_date ON exam_results (user_id, exam_date)",
+        "CREATE INDEX IF NOT EXISTS idx_exam_answers_result ON exam_answers (result_id, question_id)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_log_user_time ON audit_log (user_id, timestamp)"
+    ],
+    # 3: server-side exam sessions for the sqlite session backend
+    [
+        """
+        CREATE TABLE IF NOT EXISTS exam_sessions (
+            user_id TEXT PRIMARY KEY,
+            question_ids TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_exam_sessions_expires ON exam_sessions (expires_at)"
+    ],
+    # 4: per-user attempt summary, maintained with every new exam result
+    [
+        """
+        CREATE TABLE IF NOT EXISTS user_exam_summary (
+            user_id TEXT PRIMARY KEY,
+            attempt_count INTEGER NOT NULL DEFAULT 0,
+            failed_count INTEGER NOT NULL DEFAULT 0,
+            best_score INTEGER,
+            last_exam_date TIMESTAMP
+        )
+        """,
+        """
+        INSERT OR REPLACE INTO user_exam_summary
+            (user_id, attempt_count, failed_count, best_score, last_exam_date)
+        SELECT user_id, COUNT(*), SUM(CASE WHEN passed THEN 0 ELSE 1 END), MAX(score), MAX(exam_date)
+        FROM exam_results
+        GROUP BY user_id
+        """
+    ],
+    # 5: one packed row of answers per exam result
+    [
+        """
+        CREATE TABLE IF NOT EXISTS exam_answer_packs (
+            result_id INTEGER PRIMARY KEY,
+            question_ids BLOB NOT NULL,
+            user_answers BLOB NOT NULL,
+            correct_answers BLOB NOT NULL,
+            correct_bitmap BLOB NOT NULL,
+            FOREIGN KEY (result_id) REFERENCES exam_results(id)
+        )
+        """
+    ],
+    # 6: running aggregates for item analysis, advanced past a result id watermark
+    [
+        """
+        CREATE TABLE IF NOT EXISTS item_statistics (
+            question_id INTEGER PRIMARY KEY,
+            responses INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0,
+            score_sum_correct REAL NOT NULL DEFAULT 0,
+            score_sum_squares REAL NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS item_option_counts (
+            question_id INTEGER NOT NULL,
+            option TEXT NOT NULL,
+            responses INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (question_id, option)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS category_statistics (
+            category TEXT PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            passed INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS analytics_watermark (
+            name TEXT PRIMARY KEY,
+            last_result_id INTEGER NOT NULL
+        )
+        """
+    ],
+    # 7: keyset pagination over the whole audit log and by action, newest first
+    [
+        "CREATE INDEX IF NOT EXISTS idx_audit_log_time ON audit_log (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_log_action_time ON audit_log (action, timestamp)"
+    ],
+    # 8: monthly audit_log partitions, and the view reading them together with audit_log
+    [
+        """
+        CREATE TABLE IF NOT EXISTS audit_log_partitions (
+            period TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            archive_path TEXT,
+            archived_rows INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE VIEW IF NOT EXISTS audit_log_all AS
+        SELECT id, user_id, action, timestamp, details FROM audit_log
+        """
+    ],
+    # 9: pre-generated exam forms, and the form each session and result used
+    [
+        """
+        CREATE TABLE IF NOT EXISTS exam_forms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            version TEXT NOT NULL,
+            question_ids TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            claimed_at TIMESTAMP,
+            user_id TEXT
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_exam_forms_available
+        ON exam_forms (version, id) WHERE claimed_at IS NULL
+        """,
+        "ALTER TABLE exam_results ADD COLUMN form_id INTEGER REFERENCES exam_forms(id)",
+        "ALTER TABLE exam_sessions ADD COLUMN form_id INTEGER"
+    ],
+    # 10: category pass rates are kept per question category; rebuild the item
+    # analysis aggregates from every result on the next refresh
+    [
+        "DELETE FROM item_statistics",
+        "DELETE FROM item_option_counts",
+        "DELETE FROM category_statistics",
+        "DELETE FROM analytics_watermark"
+    ],
+    # 11: size of each audit archive as of its last committed write
+    [
+        "ALTER TABLE audit_log_partitions ADD COLUMN archive_bytes INTEGER"
+    ],
+    # 12: unused exam forms per version, kept with every refill, claim and release
+    [
+        """
+        CREATE TABLE IF NOT EXISTS exam_form_stock (
+            version TEXT PRIMARY KEY,
+            available INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        INSERT INTO exam_form_stock (version, available)
+        SELECT version, COUNT(*) FROM exam_forms WHERE claimed_at IS NULL GROUP BY version
+        """
+    ]
+]
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+
+
+# SQLite limits bound parameters per statement, so IN lists are split up
+IN_CLAUSE_CHUNK_SIZE = 500
+
+
+def _chunks(items, size):
+    """Yield successive slices of a list"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _placeholders(items):
+    """Return a "?, ?, ..." parameter list for an IN clause"""
+    return ", ".join("?" * len(items))
+
+
+def encode_page_cursor(sort_value, row_id):
+    """Return an opaque cursor for the position after (sort_value, row_id)"""
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_page_cursor(cursor):
+    """Return the (sort_value, row_id) position stored in a cursor"""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid page cursor")
+    return sort_value, row_id
+
+
+def _page_size(limit):
+    """Clamp a requested page size to PAGINATION_CONFIG"""
+    if limit is None:
+        return PAGINATION_CONFIG['default_page_size']
+    return max(1, min(int(limit), PAGINATION_CONFIG['max_page_size']))
+
+
+def _dict_row(cursor, row):
+    """Row factory: return a row as a dict keyed by column name"""
+    return dict(zip([col[0] for col in cursor.description], row))
+
+
+def _option_code(answer):
+    """Return the byte for a single-character answer, or None if it has none"""
+    if isinstance(answer, str) and len(answer) == 1 and 0 < ord(answer) < 256:
+        return ord(answer)
+    return None
+
+
+def pack_answers(answers):
+    """Pack graded answers into (question ids, user answers, correct answers, bitmap) blobs
+    
+    Question ids are little-endian int64s, answers are one byte each and the
+    bitmap holds one is_correct bit per answer. Returns None when an answer
+    is not a single character, since it would not round-trip.
+    """
+    user_codes = [_option_code(answer['user_answer']) for answer in answers]
+    correct_codes = [_option_code(answer['correct_answer']) for answer in answers]
+    if None in user_codes or None in correct_codes:
+        return None
+    bitmap = sum(1 << index for index, answer in enumerate(answers) if answer['is_correct'])
+    return (
+        struct.pack(f"<{len(answers)}q", *(answer['question_id'] for answer in answers)),
+        bytes(user_codes),
+        bytes(correct_codes),
+        bitmap.to_bytes((len(answers) + 7) // 8, "little")
+    )
+
+
+def unpack_answers(result_id, question_ids, user_answers, correct_answers, bitmap):
+    """Unpack a packed answer row into ExamAnswer records"""
+    count = len(user_answers)
+    bits = int.from_bytes(bitmap, "little")
+    return [
+        ExamAnswer(result_id, question_id, chr(user_answers[index]),
+                   chr(correct_answers[index]), bool(bits >> index & 1))
+        for index, question_id in enumerate(struct.unpack(f"<{count}q", question_ids))
+    ]
+
+
+class Database:
+    """Database management class"""
+    
+    def __init__(self, db_path=DATABASE_PATH, pool_size=DATABASE_POOL_SIZE,
+                 answer_storage=EXAM_ANSWER_STORAGE):
+        self.db_path = db_path
+        self.answer_storage = answer_storage
+        # The schema is checked when the first connection is opened, not here
+        self.pool = ConnectionPool(db_path, pool_size, initializer=self._migrate)
+        self.audit = AuditLogWriter(self.pool)
+        self.application_cache = LRUCache(**READ_CACHE_CONFIG['applications'])
+        self.history_cache = LRUCache(**READ_CACHE_CONFIG['exam_history'])
+        self._local = threading.local()
+    
+    @contextmanager
+    def transaction(self, user_ids=None):
+        """Run the block in a single transaction, rolling back on error
+        
+        A transaction opened while this thread already has one becomes a
+        savepoint inside it: a failing inner block is undone on its own, and
+        nothing commits until the outermost block finishes. ``user_ids``
+        matches ShardedDatabase.transaction; one file has one transaction.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield from self._savepoint(conn)
+            return
+        
+        with self.pool.connection() as conn:
+            conn.pending_audit = []
+            conn.pending_invalidations = set()
+            self._local.conn = conn
+            self._local.depth = 0
+            try:
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    yield conn
+            finally:
+                self._local.conn = None
+            invalidations, audit_entries = conn.pending_invalidations, conn.pending_audit
+        # Caches are invalidated and async audit entries queued only once the
+        # change has committed, and after the connection is back in the pool:
+        # a full audit queue blocks here, and the writer needs a connection to
+        # drain it
+        for cache, key in invalidations:
+            cache.invalidate(key)
+        if audit_entries:
+            self.audit.submit(audit_entries)
+    
+    def _savepoint(self, conn):
+        """Run a nested transaction block as a savepoint"""
+        self._local.depth += 1
+        name = f"nested_{self._local.depth}"
+        audit_mark = len(conn.pending_audit)
+        conn.execute(f"SAVEPOINT {name}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+            del conn.pending_audit[audit_mark:]
+            raise
+        else:
+            conn.execute(f"RELEASE {name}")
+        finally:
+            self._local.depth -= 1
+    
+    @contextmanager
+    def connection(self):
+        """Use this thread's open transaction if there is one, else a pooled connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+        else:
+            with self.pool.connection() as conn:
+                yield conn
+    
+    def _cache_get(self, cache, key):
+        """Read a cache, ignoring keys this thread's open transaction has changed"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and (cache, key) in conn.pending_invalidations:
+            return MISSING
+        return cache.get(key)
+    
+    def _cache_set(self, cache, key, value, version):
+        """Cache a value unless it is an uncommitted change from this thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or (cache, key) not in conn.pending_invalidations:
+            cache.set(key, value, version)
+    
+    @property
+    def shards(self):
+        """Return the databases that hold data; a single file is its own only shard"""
+        return [self]
+    
+    def shard_for(self, user_id):
+        """Return the database holding a user's rows"""
+        return self
+    
+    def init_database(self):
+        """Open a connection now, bringing the schema up to date, instead of on first use"""
+        with self.pool.connection():
+            pass
+    
+    def _migrate(self, conn):
+        """Run any pending migrations on the pool's first connection"""
+        # A file left behind by a reshard must not take writes the new layout never sees
+        retired = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'resharded_to'"
+        ).fetchone()
+        if retired:
+            shards = conn.execute("SELECT shard_count FROM resharded_to").fetchone()[0]
+            raise ValueError(f"{self.db_path} was resharded into {shards} shards; "
+                             f"set DATABASE_SHARDS = {shards}")
+        
+        # Fast path: nothing to do once the schema is current
+        if self._schema_version(conn) >= SCHEMA_VERSION:
+            return
+        
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-check under the write lock in case another process migrated first
+            version = self._schema_version(conn)
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                for statement in SCHEMA_MIGRATIONS[target - 1]:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        conn.execute("PRAGMA optimize")
+    
+    def _schema_version(self, conn):
+        """Return the schema version recorded in the database file"""
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    def add_application(self, user_id, name, email):
+        """Add a new application"""
+        try:
+            with self.transaction() as conn:
+                conn.execute("""
+                    INSERT INTO applications (user_id, name, email, status)
+                    VALUES (?, ?, ?, 'DRAFT')
+                """, (user_id, name, email))
+                conn.pending_invalidations.add((self.application_cache, user_id))
+                self._log(conn, user_id, "APPLICATION_CREATED", f"Application created for {name}")
+        except sqlite3.IntegrityError:
+            return False
+        return True
+    
+    def add_applications(self, applications):
+        """Add many (user_id, name, email) applications in one transaction
+        
+        Returns the set of user ids that were skipped: ids that already had
+        an application, and ids repeated in the list, whose first row is
+        inserted. A conflict never fails the rest of the batch.
+        """
+        applications = list(applications)
+        if not applications:
+            return set()
+        with self.transaction() as conn:
+            skipped = set()
+            for chunk in _chunks([app[0] for app in applications], IN_CLAUSE_CHUNK_SIZE):
+                skipped.update(row[0] for row in conn.execute(f"""
+                    SELECT user_id FROM applications WHERE user_id IN ({_placeholders(chunk)})
+                """, chunk))
+            new = {}
+            for app in applications:
+                if app[0] in skipped or app[0] in new:
+                    skipped.add(app[0])
+                else:
+                    new[app[0]] = app
+            new = list(new.values())
+            conn.executemany("""
+                INSERT INTO applications (user_id, name, email, status)
+                VALUES (?, ?, ?, 'DRAFT')
+                ON CONFLICT(user_id) DO NOTHING
+            """, new)
+            conn.pending_invalidations.update((self.application_cache, app[0]) for app in new)
+            self._log_many(conn, "APPLICATION_CREATED",
+                           [(app[0], f"Application created for {app[1]}") for app in new])
+        return skipped
+    
+    def get_application(self, user_id):
+        """Retrieve an application as an Application record, or None"""
+        cached = self._cache_get(self.application_cache, user_id)
+        if cached is not MISSING:
+            return cached
+        
+        version = self.application_cache.version
+        with self.connection() as conn:
+            cursor = conn.execute(f"""
+                SELECT {Application.select_list()} FROM applications WHERE user_id = ?
+            """, (user_id,))
+            cursor.row_factory = Application.from_row
+            app = cursor.fetchone()
+        self._cache_set(self.application_cache, user_id, app, version)
+        return app
+    
+    def get_applications(self, user_ids):
+        """Retrieve many Application records with bulk queries, priming the read cache"""
+        user_ids = list(dict.fromkeys(user_ids))
+        version = self.application_cache.version
+        apps = {}
+        with self.connection() as conn:
+            for chunk in _chunks(user_ids, IN_CLAUSE_CHUNK_SIZE):
+                cursor = conn.execute(f"""
+                    SELECT {Application.select_list()} FROM applications
+                    WHERE user_id IN ({_placeholders(chunk)})
+                """, chunk)
+                cursor.row_factory = Application.from_row
+                for app in cursor:
+                    apps[app.user_id] = app
+        for user_id in user_ids:
+            self._cache_set(self.application_cache, user_id, apps.get(user_id), version)
+        return apps
+    
+    def update_application_status(self, user_id, status):
+        """Update application status"""
+        with self.transaction() as conn:
+            self._set_status(conn, user_id, status)
+    
+    def transition_applications(self, user_ids, statuses, from_states=None, action=None, details=None):
+        """Move many applications through ``statuses`` in one transaction
+        
+        Only applications currently in one of ``from_states`` (any state when
+        None) are changed. Each application is updated once, straight to the
+        last status, and gets a STATUS_UPDATED audit entry per step plus an
+        optional ``action`` entry. Returns the set of user ids that changed.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        condition = f" AND status IN ({_placeholders(from_states)})" if from_states else ""
+        changed = []
+        with self.transaction() as conn:
+            for chunk in _chunks(user_ids, IN_CLAUSE_CHUNK_SIZE):
+                changed.extend(row[0] for row in conn.execute(f"""
+                    UPDATE applications
+                    SET status = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE user_id IN ({_placeholders(chunk)}){condition}
+                    RETURNING user_id
+                """, [statuses[-1], *chunk, *(from_states or [])]))
+            conn.pending_invalidations.update((self.application_cache, user_id) for user_id in changed)
+            for status in statuses:
+                self._log_many(conn, "STATUS_UPDATED",
+                               [(user_id, f"Status changed to {status}") for user_id in changed])
+            if action:
+                self._log_many(conn, action, [(user_id, details) for user_id in changed])
+        return set(changed)
+    
+    def save_exam_result(self, user_id, score, passed, time_taken, attempt_num, category):
+        """Save exam result; pass attempt_num=None to number it from the user's summary"""
+        with self.transaction() as conn:
+            return self._insert_exam_result(
+                conn, user_id, score, passed, time_taken, attempt_num, category
+            )
+    
+    def save_exam_answers(self, result_id, answers, user_id=None):
+        """Save exam answers; user_id picks the shard when the database is sharded"""
+        with self.transaction() as conn:
+            self._insert_exam_answers(conn, result_id, answers)
+    
+    def save_exam_submission(self, user_id, score, passed, time_taken, attempt_num, category,
+                             answers, new_status=None, form_id=None):
+        """Save a graded exam, its answers and any status change with a single commit"""
+        with self.transaction() as conn:
+            result_id = self._insert_exam_result(
+                conn, user_id, score, passed, time_taken, attempt_num, category, form_id
+            )
+            self._insert_exam_answers(conn, result_id, answers)
+            if new_status:
+                self._set_status(conn, user_id, new_status)
+        return result_id
+    
+    def get_exam_history(self, user_id):
+        """Get a user's ExamResult records, newest first"""
+        cached = self._cache_get(self.history_cache, user_id)
+        if cached is not MISSING:
+            return list(cached)
+        
+        version = self.history_cache.version
+        with self.connection() as conn:
+            cursor = conn.execute(f"""
+                SELECT {ExamResult.select_list()} FROM exam_results
+                WHERE user_id = ?
+                ORDER BY exam_date DESC
+            """, (user_id,))
+            cursor.row_factory = ExamResult.from_row
+            history = tuple(cursor)
+        self._cache_set(self.history_cache, user_id, history, version)
+        return list(history)
+    
+    def get_exam_history_page(self, user_id, cursor=None, limit=None, passed=None):
+        """Get one page of a user's exam history, newest first
+        
+        Pages are keyed on (exam_date, id), so every page costs the same no
+        matter how deep it is. Pass the returned ``next_cursor`` to get the
+        following page; it is None on the last page.
+        """
+        filters = ["user_id = ?"]
+        params = [user_id]
+        if passed is not None:
+            filters.append("passed = ?")
+            params.append(1 if passed else 0)
+        return self._keyset_page("exam_results", "exam_date", filters, params, cursor, limit,
+                                 ExamResult)
+    
+    def get_audit_log_page(self, user_id=None, cursor=None, limit=None, action=None):
+        """Get one page of the audit log, newest first, keyed on (timestamp, id)
+        
+        Reads through the audit_log_all view, so entries moved into monthly
+        partitions are included; archived partitions are not.
+        """
+        filters = []
+        params = []
+        if user_id is not None:
+            filters.append("user_id = ?")
+            params.append(user_id)
+        if action is not None:
+            filters.append("action = ?")
+            params.append(action)
+        return self._keyset_page("audit_log_all", "timestamp", filters, params, cursor, limit)
+    
+    def _keyset_page(self, table, sort_column, filters, params, cursor, limit, record=None):
+        """Return rows after cursor in (sort_column, id) descending order
+        
+        Rows are ``record`` instances when a record type is given, else dicts.
+        """
+        limit = _page_size(limit)
+        filters = list(filters)
+        params = list(params)
+        if cursor is not None:
+            filters.append(f"({sort_column}, id) < (?, ?)")
+            params.extend(decode_page_cursor(cursor))
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        selected = record.select_list() if record else "*"
+        with self.connection() as conn:
+            # Fetch one extra row to learn whether another page follows
+            result = conn.execute(f"""
+                SELECT {selected} FROM {table} {where}
+                ORDER BY {sort_column} DESC, id DESC
+                LIMIT ?
+            """, (*params, limit + 1))
+            result.row_factory = record.from_row if record else _dict_row
+            items = result.fetchall()
+        next_cursor = None
+        if len(items) > limit:
+            del items[limit:]
+            last = items[-1] if record is None else items[-1].to_dict()
+            next_cursor = encode_page_cursor(last[sort_column], last['id'])
+        return {"items": items, "next_cursor": next_cursor}
+    
+    def get_exam_histories(self, user_ids):
+        """Get ExamResult records for many users with bulk queries, priming the read cache"""
+        user_ids = list(dict.fromkeys(user_ids))
+        version = self.history_cache.version
+        histories = {user_id: [] for user_id in user_ids}
+        with self.connection() as conn:
+            for chunk in _chunks(user_ids, IN_CLAUSE_CHUNK_SIZE):
+                cursor = conn.execute(f"""
+                    SELECT {ExamResult.select_list()} FROM exam_results
+                    WHERE user_id IN ({_placeholders(chunk)})
+                    ORDER BY exam_date DESC
+                """, chunk)
+                cursor.row_factory = ExamResult.from_row
+                for result in cursor:
+                    histories[result.user_id].append(result)
+        for user_id, history in histories.items():
+            self._cache_set(self.history_cache, user_id, tuple(history), version)
+        return histories
+    
+    def get_exam_answers(self, result_id, user_id=None):
+        """Get the ExamAnswer records of one exam result, whichever way they were stored
+        
+        Result ids are only unique within a shard, so a sharded database also
+        needs the result's user_id; a single database ignores it.
+        """
+        with self.connection() as conn:
+            pack = conn.execute("""
+                SELECT question_ids, user_answers, correct_answers, correct_bitmap
+                FROM exam_answer_packs WHERE result_id = ?
+            """, (result_id,)).fetchone()
+            if pack:
+                return unpack_answers(result_id, *pack)
+            cursor = conn.execute(f"""
+                SELECT {ExamAnswer.select_list()}
+                FROM exam_answers WHERE result_id = ? ORDER BY id
+            """, (result_id,))
+            cursor.row_factory = ExamAnswer.from_row
+            return cursor.fetchall()
+    
+    def get_exam_summary(self, user_id):
+        """Get a user's attempt count, failed count, best score and last exam date"""
+        with self.connection() as conn:
+            cursor = conn.execute("SELECT * FROM user_exam_summary WHERE user_id = ?", (user_id,))
+            row = cursor.fetchone()
+            if row:
+                columns = [col[0] for col in cursor.description]
+                return dict(zip(columns, row))
+        return None
+    
+    def cache_stats(self):
+        """Return hit and miss counters for the read caches"""
+        return {
+            "applications": self.application_cache.stats(),
+            "exam_history": self.history_cache.stats()
+        }
+    
+    def log_action(self, user_id, action, details):
+        """Log an action"""
+        # Outside a transaction an async entry can be queued straight away
+        if self.audit.durability(action) == "async" and getattr(self._local, 'conn', None) is None:
+            self.audit.submit([self.audit.entry(user_id, action, details)])
+            return
+        with self.transaction() as conn:
+            self._log(conn, user_id, action, details)
+    
+    def flush_audit_log(self):
+        """Wait until all queued audit entries are written"""
+        self.audit.flush()
+    
+    def _set_status(self, conn, user_id, status):
+        """Update application status inside an open transaction"""
+        conn.execute("""
+            UPDATE applications
+            SET status = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = ?
+        """, (status, user_id))
+        conn.pending_invalidations.add((self.application_cache, user_id))
+        self._log(conn, user_id, "STATUS_UPDATED", f"Status changed to {status}")
+    
+    def _insert_exam_result(self, conn, user_id, score, passed, time_taken, attempt_num, category,
+                            form_id=None):
+        """Insert an exam result row and update the user's summary inside an open transaction"""
+        attempt_count = conn.execute("""
+            INSERT INTO user_exam_summary (user_id, attempt_count, failed_count, best_score, last_exam_date)
+            VALUES (?, 1, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_id) DO UPDATE SET
+                attempt_count = attempt_count + 1,
+                failed_count = failed_count + excluded.failed_count,
+                best_score = MAX(COALESCE(best_score, excluded.best_score), excluded.best_score),
+                last_exam_date = excluded.last_exam_date
+            RETURNING attempt_count
+        """, (user_id, 0 if passed else 1, score)).fetchone()[0]
+        if attempt_num is None:
+            attempt_num = attempt_count
+        
+        cursor = conn.execute("""
+            INSERT INTO exam_results
+                (user_id, score, passed, time_taken_minutes, attempt_number, category, form_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (user_id, score, passed, time_taken, attempt_num, category, form_id))
+        conn.pending_invalidations.add((self.history_cache, user_id))
+        
+        status = "PASSED" if passed else "FAILED"
+        self._log(conn, user_id, "EXAM_COMPLETED", f"Exam completed with score {score} - {status}")
+        
+        return cursor.lastrowid
+    
+    def _insert_exam_answers(self, conn, result_id, answers):
+        """Insert all answers for a result inside an open transaction
+        
+        In "packed" storage mode the answers become a single exam_answer_packs
+        row; answers that cannot be packed fall back to one row each.
+        """
+        if self.answer_storage == "packed":
+            pack = pack_answers(answers)
+            if pack is not None:
+                conn.execute("""
+                    INSERT INTO exam_answer_packs
+                        (result_id, question_ids, user_answers, correct_answers, correct_bitmap)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (result_id, *pack))
+                return
+        conn.executemany("""
+            INSERT INTO exam_answers (result_id, question_id, user_answer, correct_answer, is_correct)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(result_id, answer['question_id'], answer['user_answer'],
+               answer['correct_answer'], answer['is_correct']) for answer in answers])
+    
+    def _log(self, conn, user_id, action, details):
+        """Record an audit entry for the open transaction"""
+        if self.audit.durability(action) == "async":
+            conn.pending_audit.append(self.audit.entry(user_id, action, details))
+            return
+        conn.execute("""
+            INSERT INTO audit_log (user_id, action, details)
+            VALUES (?, ?, ?)
+        """, (user_id, action, details))
+    
+    def _log_many(self, conn, action, entries):
+        """Record (user_id, details) audit entries sharing one action for the open transaction"""
+        if self.audit.durability(action) == "async":
+            conn.pending_audit.extend(self.audit.entry(user_id, action, details)
+                                      for user_id, details in entries)
+            return
+        conn.executemany("""
+            INSERT INTO audit_log (user_id, action, details)
+            VALUES (?, ?, ?)
+        """, [(user_id, action, details) for user_id, details in entries])
+    
+    def close(self):
+        """Flush the audit log and close all pooled database connections"""
+        self.audit.close()
+        self.pool.close()
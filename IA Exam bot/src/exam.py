@@ -1,186 +1,281 @@
-"""
-IA Exam management for DHS IA Exam Bot
-"""
-
-import random
-from datetime import datetime, timedelta
-from database import Database
-from config.settings import IA_EXAM_CONFIG, EXAM_CATEGORIES
-
-
-class IAExam:
-    """Information Assurance Exam Management"""
-    
-    def __init__(self):
-        self.db = Database()
-        self.exam_questions = self._load_sample_questions()
-    
-    def _load_sample_questions(self):
-        """Load sample exam questions"""
-        return [
-            {
-                "id": 1,
-                "category": "Security Fundamentals",
-                "question": "What is the primary goal of information security?",
-                "options": [
-                    "A) To encrypt all data",
-                    "B) To ensure confidentiality, integrity, and availability of information",
-                    "C) To prevent all access to systems",
-                    "D) To maximize system performance"
-                ],
-                "correct_answer": "B",
-                "difficulty": "Easy"
-            },
-            {
-                "id": 2,
-                "category": "Network Security",
-                "question": "What does a firewall primarily protect against?",
-                "options": [
-                    "A) Virus infections",
-                    "B) Unauthorized network access",
-                    "C) Hardware failures",
-                    "D) Power outages"
-                ],
-                "correct_answer": "B",
-                "difficulty": "Easy"
-            },
-            {
-                "id": 3,
-                "category": "Cryptography",
-                "question": "Which of the following is a symmetric encryption algorithm?",
-                "options": [
-                    "A) RSA",
-                    "B) ECC",
-                    "C) AES",
-                    "D) DSA"
-                ],
-                "correct_answer": "C",
-                "difficulty": "Medium"
-            },
-            {
-                "id": 4,
-                "category": "Access Control",
-                "question": "What is the principle of least privilege?",
-                "options": [
-                    "A) Give users maximum access",
-                    "B) Grant users only the access they need to perform their job",
-                    "C) Allow all system access",
-                    "D) Restrict all access"
-                ],
-                "correct_answer": "B",
-                "difficulty": "Easy"
-            },
-            {
-                "id": 5,
-                "category": "Incident Response",
-                "question": "What is the first step in incident response?",
-                "options": [
-                    "A) Eradication",
-                    "B) Detection and analysis",
-                    "C) Recovery",
-                    "D) Post-incident activities"
-                ],
-                "correct_answer": "B",
-                "difficulty": "Medium"
-            }
-        ]
-    
-    def start_exam(self, user_id):
-        """Start a new exam session"""
-        app = self.db.get_application(user_id)
-        if not app:
-            return {"success": False, "message": "Application not found"}
-        
-        if app['status'] != 'PENDING_EXAM':
-            return {"success": False, "message": "User not eligible for exam"}
-        
-        # Check if user has exceeded max attempts
-        exam_history = self.db.get_exam_history(user_id)
-        failed_attempts = sum(1 for exam in exam_history if not exam['passed'])
-        
-        if failed_attempts >= IA_EXAM_CONFIG['max_attempts']:
-            return {"success": False, "message": "Maximum exam attempts exceeded"}
-        
-        # Select random questions for the exam
-        selected_questions = random.sample(self.exam_questions, min(5, len(self.exam_questions)))
-        
-        return {
-            "success": True,
-            "message": "Exam started",
-            "exam_session": {
-                "user_id": user_id,
-                "start_time": datetime.now().isoformat(),
-                "time_limit_minutes": IA_EXAM_CONFIG['time_limit_minutes'],
-                "questions": selected_questions
-            }
-        }
-    
-    def submit_exam(self, user_id, answers):
-        """Submit exam answers and calculate score"""
-        if not answers:
-            return {"success": False, "message": "No answers provided"}
-        
-        # Calculate score
-        correct = 0
-        detailed_answers = []
-        
-        for answer in answers:
-            question_id = answer['question_id']
-            user_answer = answer['answer']
-            
-            # Find correct answer
-            question = next((q for q in self.exam_questions if q['id'] == question_id), None)
-            if not question:
-                continue
-            
-            correct_answer = question['correct_answer']
-            is_correct = user_answer == correct_answer
-            
-            if is_correct:
-                correct += 1
-            
-            detailed_answers.append({
-                "question_id": question_id,
-                "user_answer": user_answer,
-                "correct_answer": correct_answer,
-                "is_correct": is_correct
-            })
-        
-        # Calculate percentage
-        total_questions = len(detailed_answers)
-        score = int((correct / total_questions * 100)) if total_questions > 0 else 0
-        passed = score >= IA_EXAM_CONFIG['min_passing_score']
-        
-        # Get attempt number
-        exam_history = self.db.get_exam_history(user_id)
-        attempt_num = len(exam_history) + 1
-        
-        # Save results
-        result_id = self.db.save_exam_result(
-            user_id, score, passed, 0, attempt_num, "General"
-        )
-        self.db.save_exam_answers(result_id, detailed_answers)
-        
-        # Update application status if passed
-        if passed:
-            self.db.update_application_status(user_id, 'APPROVED')
-        
-        return {
-            "success": True,
-            "score": score,
-            "passed": passed,
-            "correct_answers": correct,
-            "total_questions": total_questions,
-            "message": "Exam passed!" if passed else "Exam failed. Please review and try again."
-        }
-    
-    def get_exam_results(self, user_id):
-        """Get exam results for a user"""
-        results = self.db.get_exam_history(user_id)
-        if results:
-            return {"success": True, "results": results}
-        return {"success": False, "message": "No exam results found"}
-    
-    def close(self):
-        """Close database connection"""
-        self.db.close()
+"""
+IA Exam management for DHS IA Exam Bot
+"""
+
+import math
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from sharding import open_database
+from question_bank import QuestionBank, load_question_bank
+from sessions import ExamSession, create_session_store
+from forms import ExamFormPool
+from config.settings import IA_EXAM_CONFIG, EXAM_CATEGORIES, EXAM_FORM_CONFIG, QUESTION_BANK_PATH
+
+# Built-in questions, used when no packed bank file has been generated
+SAMPLE_QUESTIONS = [
+    {
+        "id": 1,
+        "category": "Security Fundamentals",
+        "question": "What is the primary goal of information security?",
+        "options": [
+            "A) To encrypt all data",
+            "B) To ensure confidentiality, integrity, and availability of information",
+            "C) To prevent all access to systems",
+            "D) To maximize system performance"
+        ],
+        "correct_answer": "B",
+        "difficulty": "Easy"
+    },
+    {
+        "id": 2,
+        "category": "Network Security",
+        "question": "What does a firewall primarily protect against?",
+        "options": [
+            "A) Virus infections",
+            "B) Unauthorized network access",
+            "C) Hardware failures",
+            "D) Power outages"
+        ],
+        "correct_answer": "B",
+        "difficulty": "Easy"
+    },
+    {
+        "id": 3,
+        "category": "Cryptography",
+        "question": "Which of the following is a symmetric encryption algorithm?",
+        "options": [
+            "A) RSA",
+            "B) ECC",
+            "C) AES",
+            "D) DSA"
+        ],
+        "correct_answer": "C",
+        "difficulty": "Medium"
+    },
+    {
+        "id": 4,
+        "category": "Access Control",
+        "question": "What is the principle of least privilege?",
+        "options": [
+            "A) Give users maximum access",
+            "B) Grant users only the access they need to perform their job",
+            "C) Allow all system access",
+            "D) Restrict all access"
+        ],
+        "correct_answer": "B",
+        "difficulty": "Easy"
+    },
+    {
+        "id": 5,
+        "category": "Incident Response",
+        "question": "What is the first step in incident response?",
+        "options": [
+            "A) Eradication",
+            "B) Detection and analysis",
+            "C) Recovery",
+            "D) Post-incident activities"
+        ],
+        "correct_answer": "B",
+        "difficulty": "Medium"
+    }
+]
+
+_sample_bank = None
+
+
+def get_question_bank(path=QUESTION_BANK_PATH):
+    """Return the process-wide question bank, preferring the packed bank file"""
+    global _sample_bank
+    if os.path.exists(path):
+        return load_question_bank(path)
+    if _sample_bank is None:
+        _sample_bank = QuestionBank(SAMPLE_QUESTIONS)
+    return _sample_bank
+
+
+class IAExam:
+    """Information Assurance Exam Management"""
+    
+    def __init__(self, db=None, question_bank=None, session_store=None):
+        # A shared Database can be injected; otherwise this exam owns its own
+        self._owns_db = db is None
+        self.db = db if db is not None else open_database()
+        self.sessions = session_store if session_store is not None else create_session_store(self.db)
+        self._question_bank = question_bank
+        self._grader = None
+        self._forms = None
+    
+    @property
+    def question_bank(self):
+        """Question bank, loaded on first use"""
+        if self._question_bank is None:
+            self._question_bank = get_question_bank()
+        return self._question_bank
+    
+    @property
+    def grader(self):
+        """Batch grader over the question bank's answer key, built on first use"""
+        if self._grader is None:
+            # NumPy is only imported once something is graded
+            from grading import BatchGrader
+            self._grader = BatchGrader(self.question_bank)
+        return self._grader
+    
+    @property
+    def forms(self):
+        """Pool of pre-generated exam forms, opened on first use"""
+        if self._forms is None:
+            self._forms = ExamFormPool(self.db, self.question_bank)
+        return self._forms
+    
+    def start_exam(self, user_id):
+        """Start a new exam session"""
+        app = self.db.get_application(user_id)
+        if not app:
+            return {"success": False, "message": "Application not found"}
+        
+        if app.status != 'PENDING_EXAM':
+            return {"success": False, "message": "User not eligible for exam"}
+        
+        # Check if user has exceeded max attempts
+        summary = self.db.get_exam_summary(user_id)
+        failed_attempts = summary['failed_count'] if summary else 0
+        
+        if failed_attempts >= IA_EXAM_CONFIG['max_attempts']:
+            return {"success": False, "message": "Maximum exam attempts exceeded"}
+        
+        # Resume an exam already in progress rather than serving new questions
+        session = self.sessions.get(user_id)
+        if session is not None:
+            selected_questions = [self.question_bank.get(qid) for qid in session.question_ids]
+            message = "Exam resumed"
+        else:
+            # Serve the next pre-generated form, balanced across categories and
+            # difficulty levels, or sample one now when the pool is disabled
+            if EXAM_FORM_CONFIG['enabled']:
+                form_id, question_ids = self.forms.take(user_id)
+            else:
+                form_id, question_ids = None, self.question_bank.sample_ids(IA_EXAM_CONFIG['total_questions'])
+            session = ExamSession(user_id, question_ids, form_id=form_id)
+            if not self.sessions.put(session):
+                if form_id is not None:
+                    self.forms.release(user_id, form_id)
+                return {"success": False, "message": "Too many exams in progress. Please try again later"}
+            selected_questions = [self.question_bank.get(qid) for qid in question_ids]
+            message = "Exam started"
+        
+        return {
+            "success": True,
+            "message": message,
+            "exam_session": {
+                "user_id": user_id,
+                "start_time": datetime.fromtimestamp(session.started_at).isoformat(),
+                "time_limit_minutes": IA_EXAM_CONFIG['time_limit_minutes'],
+                "questions": selected_questions
+            }
+        }
+    
+    def submit_exam(self, user_id, answers):
+        """Submit exam answers and calculate score"""
+        if not answers:
+            return {"success": False, "message": "No answers provided"}
+        
+        session = self.sessions.get(user_id)
+        if session is None:
+            return {"success": False, "message": "No active exam session or time limit exceeded"}
+        
+        # Only questions served in this session are graded, once each
+        graded = self.grader.grade([answers], served=[session.question_ids])
+        result = graded.result(0)
+        
+        # Save result, answers and status change (if passed) atomically; the
+        # attempt number comes from the user's summary in the same transaction
+        time_taken = math.ceil(session.elapsed_seconds() / 60)
+        self.db.save_exam_submission(
+            user_id, result['score'], result['passed'], time_taken, None, "General",
+            graded.detailed_answers(0), new_status='APPROVED' if result['passed'] else None,
+            form_id=session.form_id
+        )
+        self.sessions.pop(user_id)
+        
+        result['success'] = True
+        result['message'] = "Exam passed!" if result['passed'] else "Exam failed. Please review and try again."
+        return result
+    
+    def grade_answer_sheets(self, sheets, category="General"):
+        """Grade and record a batch of offline answer sheets
+        
+        Each sheet is a dict with ``user_id``, ``answers`` and optionally
+        ``question_ids`` (the questions on that paper) and ``time_taken`` in
+        minutes. Sheets for users who are not eligible, have used up their
+        attempts or hand in more than one sheet are skipped; the rest are
+        graded together and saved in one transaction.
+        """
+        user_ids = [sheet['user_id'] for sheet in sheets]
+        sheet_counts = Counter(user_ids)
+        apps = self.db.get_applications(user_ids)
+        histories = self.db.get_exam_histories(user_ids)
+        results = {}
+        eligible = []
+        for sheet in sheets:
+            app = apps.get(sheet['user_id'])
+            failed_attempts = sum(not result.passed for result in histories.get(sheet['user_id'], ()))
+            if sheet_counts[sheet['user_id']] > 1:
+                results[sheet['user_id']] = {"success": False, "message": "More than one answer sheet for user"}
+            elif not app:
+                results[sheet['user_id']] = {"success": False, "message": "Application not found"}
+            elif app.status != 'PENDING_EXAM':
+                results[sheet['user_id']] = {"success": False, "message": "User not eligible for exam"}
+            elif failed_attempts >= IA_EXAM_CONFIG['max_attempts']:
+                results[sheet['user_id']] = {"success": False, "message": "Maximum exam attempts exceeded"}
+            elif not all(qid in self.question_bank for qid in sheet.get('question_ids', ())):
+                results[sheet['user_id']] = {"success": False, "message": "Unknown question on answer sheet"}
+            else:
+                eligible.append(sheet)
+        
+        # Sheets without question_ids are graded on every answer they give
+        served = None
+        if any('question_ids' in sheet for sheet in eligible):
+            served = [sheet.get('question_ids') for sheet in eligible]
+        graded = self.grader.grade([sheet['answers'] for sheet in eligible], served)
+        
+        with self.db.transaction([sheet['user_id'] for sheet in eligible]):
+            for index, sheet in enumerate(eligible):
+                result = graded.result(index)
+                self.db.save_exam_submission(
+                    sheet['user_id'], result['score'], result['passed'], sheet.get('time_taken'),
+                    None, category, graded.detailed_answers(index),
+                    new_status='APPROVED' if result['passed'] else None
+                )
+                result['success'] = True
+                results[sheet['user_id']] = result
+        
+        return {"success": True, "graded": len(eligible), "results": results}
+    
+    def get_exam_results(self, user_id):
+        """Get exam results for a user"""
+        results = self.db.get_exam_history(user_id)
+        if results:
+            return {"success": True, "results": [result.to_dict() for result in results]}
+        return {"success": False, "message": "No exam results found"}
+    
+    def get_exam_results_page(self, user_id, cursor=None, limit=None, status=None):
+        """Get one page of exam results, newest first, optionally only passed or failed ones"""
+        if status not in (None, "passed", "failed"):
+            return {"success": False, "message": f"Unknown result status: {status}"}
+        try:
+            page = self.db.get_exam_history_page(
+                user_id, cursor, limit, None if status is None else status == "passed"
+            )
+        except ValueError as exc:
+            return {"success": False, "message": str(exc)}
+        return {"success": True, "results": [result.to_dict() for result in page['items']],
+                "next_cursor": page['next_cursor']}
+    
+    def close(self):
+        """Close database connection if this exam owns it"""
+        if self._forms is not None:
+            self._forms.close()
+        if self._owns_db:
+            self.db.close()
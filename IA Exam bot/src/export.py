@@ -0,0 +1,290 @@
+"""
+Streaming export of exam results, answers and the audit log for DHS IA Exam Bot
+"""
+
+import csv
+import json
+import os
+from database import IN_CLAUSE_CHUNK_SIZE, _chunks, _placeholders, unpack_answers
+from models import ExamAnswer, ExamResult
+from config.settings import EXPORT_CONFIG
+
+# table -> (columns, date column); exam_answers is filtered through its result
+# and audit_log is read with its monthly partitions
+EXPORT_TABLES = {
+    "exam_results": (list(ExamResult._fields), "exam_date"),
+    "exam_answers": (list(ExamAnswer._fields), "exam_date"),
+    "audit_log": (
+        ["id", "user_id", "action", "timestamp", "details"],
+        "timestamp"
+    )
+}
+
+
+def export_table(db, table, destination, file_format=None, since=None, until=None,
+                 status=None, after_id=None, page_size=None, after_shard=0):
+    """Stream a table to a CSV or JSONL file, one keyset page at a time
+    
+    Rows are exported in id order (result id for exam_answers), read with
+    fetchmany and written as they arrive, so memory use does not grow with
+    the table. ``since``/``until`` bound the row's date (until is exclusive)
+    and ``status`` keeps rows for applicants in that application status.
+    Passing ``after_id`` appends to an existing file starting after that
+    id; ``after_id="resume"`` reads it from the file. Resuming exam_answers
+    drops the rows of the file's last result and exports that result again,
+    since an interrupted export may have written only some of its answers.
+    A sharded database is
+    exported one shard after another with a leading "shard" column, and
+    ``after_shard`` says which shard ``after_id`` belongs to. Returns the
+    number of rows written and the last shard and id exported.
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown export table: {table}")
+    file_format = file_format or ("jsonl" if str(destination).endswith(".jsonl") else "csv")
+    page_size = page_size or EXPORT_CONFIG['page_size']
+    including = False
+    if after_id == "resume":
+        _trim_partial_line(destination)
+        if table == "exam_answers":
+            position = _trim_last_result(destination, file_format)
+            including = position is not None
+        else:
+            position = last_exported_position(destination, table, file_format)
+        after_shard, after_id = position or (0, None)
+    columns, _ = EXPORT_TABLES[table]
+    shards = db.shards
+    header = ["shard", *columns] if len(shards) > 1 else columns
+    
+    appending = after_id is not None and os.path.exists(destination)
+    last_shard, last_id = after_shard, after_id or 0
+    written = 0
+    with open(destination, "a" if appending else "w", newline="", encoding="utf-8") as handle:
+        writer = None
+        if file_format == "csv":
+            writer = csv.writer(handle)
+            if not appending:
+                writer.writerow(header)
+        for index in range(after_shard, len(shards)):
+            if index != last_shard:
+                last_shard, last_id = index, 0
+            prefix = (index,) if len(shards) > 1 else ()
+            while True:
+                with shards[index].connection() as conn:
+                    rows, page_last_id = _read_page(conn, table, last_id, since, until, status,
+                                                    page_size, including)
+                    including = False
+                    for row in rows:
+                        if writer is not None:
+                            writer.writerow(prefix + row)
+                        else:
+                            record = dict(zip(header, prefix + row))
+                            handle.write(json.dumps(record, default=str) + "\n")
+                        written += 1
+                        if table != "exam_answers":
+                            page_last_id = row[0]
+                # Flush each page so an interrupted export can resume after the last whole row
+                handle.flush()
+                if page_last_id is None:
+                    break
+                last_id = page_last_id
+    
+    return {"success": True, "table": table, "rows": written, "last_shard": last_shard,
+            "last_id": last_id}
+
+
+def last_exported_id(path, table, file_format=None):
+    """Return the id of the last row in an export file, or None if it has no rows"""
+    position = last_exported_position(path, table, file_format)
+    return None if position is None else position[1]
+
+
+def last_exported_position(path, table, file_format=None):
+    """Return the (shard, id) of the last row in an export file, or None if it has no rows
+    
+    Files exported from a single database have no shard column; their rows
+    are in shard 0.
+    """
+    if not os.path.exists(path):
+        return None
+    file_format = file_format or ("jsonl" if str(path).endswith(".jsonl") else "csv")
+    key = "result_id" if table == "exam_answers" else "id"
+    if file_format == "jsonl":
+        line = _last_line(path)
+        if not line:
+            return None
+        record = json.loads(line)
+        return record.get("shard", 0), record[key]
+    
+    # Quoted CSV fields may span lines, so read forward rather than from the end
+    header = None
+    last = None
+    with open(path, newline="", encoding="utf-8") as handle:
+        for row in csv.reader(handle):
+            if header is None:
+                header = row
+            last = row
+    if last is None or last is header:
+        return None
+    shard = int(last[0]) if header[0] == "shard" else 0
+    return shard, int(last[header.index(key)])
+
+
+def _read_page(conn, table, after_id, since, until, status, page_size, including=False):
+    """Return the next page of rows after after_id (or from it, if including), read lazily
+    
+    For exam_answers the page is a page of results, and the last result id
+    is returned with the rows; other tables continue from the last row's id.
+    """
+    columns, date_column = EXPORT_TABLES[table]
+    source = {"exam_answers": "exam_results", "audit_log": "audit_log_all"}.get(table, table)
+    filters = ["t.id >= ?" if including else "t.id > ?"]
+    params = [after_id]
+    if since:
+        filters.append(f"t.{date_column} >= ?")
+        params.append(since)
+    if until:
+        filters.append(f"t.{date_column} < ?")
+        params.append(until)
+    if status:
+        filters.append("t.user_id IN (SELECT user_id FROM applications WHERE status = ?)")
+        params.append(status)
+    selected = "t.id" if table == "exam_answers" else ", ".join(f"t.{column}" for column in columns)
+    
+    cursor = conn.execute(f"""
+        SELECT {selected} FROM {source} t
+        WHERE {" AND ".join(filters)}
+        ORDER BY t.id LIMIT ?
+    """, (*params, page_size))
+    if table != "exam_answers":
+        return _fetch(cursor), None
+    result_ids = [row[0] for row in cursor]
+    return _answer_rows(conn, result_ids), (result_ids[-1] if result_ids else None)
+
+
+def _fetch(cursor):
+    """Yield a cursor's rows, fetching them in batches"""
+    while True:
+        batch = cursor.fetchmany(EXPORT_CONFIG['fetch_size'])
+        if not batch:
+            return
+        yield from batch
+
+
+def _answer_rows(conn, result_ids):
+    """Yield the ExamAnswer records of some results in result order, packed or not"""
+    for chunk in _chunks(result_ids, IN_CLAUSE_CHUNK_SIZE):
+        answers = {}
+        for result_id, *pack in conn.execute(f"""
+            SELECT result_id, question_ids, user_answers, correct_answers, correct_bitmap
+            FROM exam_answer_packs WHERE result_id IN ({_placeholders(chunk)})
+        """, chunk):
+            answers[result_id] = unpack_answers(result_id, *pack)
+        cursor = conn.execute(f"""
+            SELECT {ExamAnswer.select_list()}
+            FROM exam_answers WHERE result_id IN ({_placeholders(chunk)}) ORDER BY id
+        """, chunk)
+        cursor.row_factory = ExamAnswer.from_row
+        for answer in cursor:
+            answers.setdefault(answer.result_id, []).append(answer)
+        for result_id in chunk:
+            yield from answers.get(result_id, ())
+
+
+def _trim_last_result(path, file_format):
+    """Drop every row of the last result in an exam_answers export file
+    
+    Returns that result's (shard, result_id), or None if the file has no rows.
+    """
+    if not os.path.exists(path):
+        return None
+    last = None
+    cut = None
+    with open(path, "rb+") as handle:
+        if file_format == "jsonl":
+            for offset, line in _reverse_lines(handle):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                position = (record.get("shard", 0), record["result_id"])
+                if last is not None and position != last:
+                    break
+                last, cut = position, offset
+        else:
+            # Quoted CSV fields may span lines, so track each row's end offset
+            # while csv reads forward
+            consumed = [0]
+            
+            def lines():
+                for raw in handle:
+                    consumed[0] += len(raw)
+                    yield raw.decode("utf-8")
+            
+            header = None
+            row_start = 0
+            for row in csv.reader(lines()):
+                if header is None:
+                    header = row
+                else:
+                    shard = int(row[0]) if header[0] == "shard" else 0
+                    position = (shard, int(row[header.index("result_id")]))
+                    if position != last:
+                        last, cut = position, row_start
+                row_start = consumed[0]
+        if last is not None:
+            handle.truncate(cut)
+    return last
+
+
+def _reverse_lines(handle):
+    """Yield (offset, line) for the lines of a binary file, last line first"""
+    position = handle.seek(0, os.SEEK_END)
+    head = b""
+    while position > 0:
+        step = min(4096, position)
+        position -= step
+        handle.seek(position)
+        lines = (handle.read(step) + head).split(b"\n")
+        head = lines[0]
+        offset = position + len(head) + 1
+        complete = []
+        for line in lines[1:]:
+            complete.append((offset, line))
+            offset += len(line) + 1
+        yield from reversed(complete)
+    if head:
+        yield 0, head
+
+
+def _trim_partial_line(path):
+    """Drop a partly written last line left by an interrupted export"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as handle:
+        size = handle.seek(0, os.SEEK_END)
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            handle.seek(position - step)
+            block = handle.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position != size:
+            handle.truncate(position)
+
+
+def _last_line(path):
+    """Return the last non-empty line of a text file without reading all of it"""
+    with open(path, "rb") as handle:
+        handle.seek(0, os.SEEK_END)
+        position = handle.tell()
+        tail = b""
+        while position > 0 and tail.count(b"\n") < 2:
+            step = min(4096, position)
+            position -= step
+            handle.seek(position)
+            tail = handle.read(step) + tail
+    lines = [line for line in tail.splitlines() if line.strip()]
+    return lines[-1].decode("utf-8") if lines else ""
@@ -0,0 +1,164 @@
+"""
+Pre-generated exam forms for DHS IA Exam Bot
+
+A form is the ordered list of questions one applicant is served. Forms
+are sampled ahead of time and stored in exam_forms, so starting an exam
+only claims the oldest unused one. Each form records the version of the
+question bank and exam blueprint it was drawn from; forms from an older
+version are never served and are cleared on the next refill.
+"""
+
+import hashlib
+import json
+import threading
+from config.settings import (
+    EXAM_CATEGORIES, EXAM_DIFFICULTY_DISTRIBUTION, EXAM_FORM_CONFIG, IA_EXAM_CONFIG
+)
+
+
+def form_version(question_bank):
+    """Return a short fingerprint of the bank's questions and the exam blueprint"""
+    digest = hashlib.sha1(json.dumps([
+        IA_EXAM_CONFIG['total_questions'], EXAM_CATEGORIES, EXAM_DIFFICULTY_DISTRIBUTION
+    ]).encode("utf-8"))
+    ids, _ = question_bank.answer_columns()
+    digest.update(bytes(ids))
+    for category in question_bank.categories():
+        digest.update(category.encode("utf-8"))
+        digest.update(bytes(question_bank.ids_in_category(category)))
+    for difficulty in EXAM_DIFFICULTY_DISTRIBUTION:
+        digest.update(bytes(question_bank.ids_with_difficulty(difficulty)))
+    return digest.hexdigest()[:16]
+
+
+class ExamFormPool:
+    """Pool of ready-made exam forms in each shard
+    
+    Nothing is generated unless asked: ``refill`` fills the pools, and after
+    ``start`` a claim that leaves fewer than low_water_mark forms in its
+    shard starts a background refill.
+    """
+    
+    def __init__(self, db, question_bank, config=None):
+        self.db = db
+        self.question_bank = question_bank
+        self.config = dict(EXAM_FORM_CONFIG, **(config or {}))
+        self.version = form_version(question_bank)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+    
+    def start(self):
+        """Refill pools in the background from now on, as a long-running bot should"""
+        self._started = True
+    
+    def take(self, user_id):
+        """Claim the next unused form for a user and return (form_id, question_ids)
+        
+        When the pool is empty a form is sampled on the spot, so an exam can
+        always start. Once started, falling below low_water_mark starts a
+        background refill.
+        """
+        with self.db.shard_for(user_id).transaction() as conn:
+            row = conn.execute("""
+                UPDATE exam_forms SET claimed_at = CURRENT_TIMESTAMP, user_id = ?
+                WHERE id = (
+                    SELECT id FROM exam_forms
+                    WHERE version = ? AND claimed_at IS NULL
+                    ORDER BY id LIMIT 1
+                )
+                RETURNING id, question_ids
+            """, (user_id, self.version)).fetchone()
+            if row is not None:
+                form_id, question_ids = row[0], json.loads(row[1])
+                left = self._add_stock(conn, -1)
+            else:
+                question_ids = self._generate()
+                form_id = conn.execute("""
+                    INSERT INTO exam_forms (version, question_ids, claimed_at, user_id)
+                    VALUES (?, ?, CURRENT_TIMESTAMP, ?)
+                """, (self.version, json.dumps(question_ids), user_id)).lastrowid
+                left = 0
+        if self._started and left < self.config['low_water_mark']:
+            self.refill_in_background()
+        return form_id, question_ids
+    
+    def release(self, user_id, form_id):
+        """Return a claimed form to the pool, e.g. when its exam could not start"""
+        with self.db.shard_for(user_id).transaction() as conn:
+            released = conn.execute("""
+                UPDATE exam_forms SET claimed_at = NULL, user_id = NULL
+                WHERE id = ? AND user_id = ? AND version = ?
+            """, (form_id, user_id, self.version)).rowcount
+            if released:
+                self._add_stock(conn, released)
+    
+    def available(self):
+        """Return how many unused forms of the current version each shard holds"""
+        counts = []
+        for shard in self.db.shards:
+            with shard.connection() as conn:
+                counts.append(self._available(conn))
+        return counts
+    
+    def refill(self):
+        """Top every shard's pool up to pool_size; return how many forms were added
+        
+        Unused forms from older versions are deleted first. Forms are written
+        in batches so exams can start while the pool fills.
+        """
+        added = 0
+        for shard in self.db.shards:
+            with shard.transaction() as conn:
+                conn.execute("DELETE FROM exam_forms WHERE version != ? AND claimed_at IS NULL",
+                             (self.version,))
+                conn.execute("DELETE FROM exam_form_stock WHERE version != ?", (self.version,))
+                missing = self.config['pool_size'] - self._available(conn)
+            while missing > 0 and not self._closed:
+                batch = [(self.version, json.dumps(self._generate()))
+                         for _ in range(min(missing, self.config['batch_size']))]
+                # Each batch commits with its stock count, so a refill cut
+                # short loses at most the batch in progress
+                with shard.transaction() as conn:
+                    conn.executemany(
+                        "INSERT INTO exam_forms (version, question_ids) VALUES (?, ?)", batch
+                    )
+                    self._add_stock(conn, len(batch))
+                missing -= len(batch)
+                added += len(batch)
+        return added
+    
+    def refill_in_background(self):
+        """Start a refill thread unless one is already running"""
+        with self._lock:
+            if self._closed or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self.refill, name="exam-form-pool", daemon=True)
+            self._thread.start()
+    
+    def close(self):
+        """Stop refilling and wait for a running refill to finish its batch"""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+    
+    def _available(self, conn):
+        """Return the number of unused forms of the current version"""
+        row = conn.execute("SELECT available FROM exam_form_stock WHERE version = ?",
+                           (self.version,)).fetchone()
+        return row[0] if row else 0
+    
+    def _add_stock(self, conn, count):
+        """Change the unused form count of the current version; return the new count"""
+        return conn.execute("""
+            INSERT INTO exam_form_stock (version, available) VALUES (?, ?)
+            ON CONFLICT(version) DO UPDATE SET available = available + excluded.available
+            RETURNING available
+        """, (self.version, count)).fetchone()[0]
+    
+    def _generate(self):
+        """Sample the question ids of one balanced form"""
+        return self.question_bank.sample_ids(IA_EXAM_CONFIG['total_questions'])
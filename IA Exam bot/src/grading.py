@@ -0,0 +1,135 @@
+"""
+Batch exam grading for DHS IA Exam Bot
+"""
+
+import numpy as np
+from config.settings import IA_EXAM_CONFIG
+
+
+def score_percentage(correct, total):
+    """Return the whole-number percentage score for correct out of total answers"""
+    return correct * 100 // total if total else 0
+
+
+class BatchGrader:
+    """Grades many answer sheets at once against a question bank's answer key"""
+    
+    def __init__(self, question_bank, min_passing_score=None):
+        self.min_passing_score = (IA_EXAM_CONFIG['min_passing_score']
+                                  if min_passing_score is None else min_passing_score)
+        ids, answers = question_bank.answer_columns()
+        ids = np.asarray(ids, dtype=np.int64)
+        # Sorted question ids and their answers, so ids are looked up with a
+        # binary search and sparse ids cost no more memory than dense ones
+        order = np.argsort(ids, kind="stable")
+        self.ids = ids[order]
+        self.key = np.frombuffer(answers, dtype=np.uint8).astype(np.int16)[order]
+    
+    def _positions(self, question_ids):
+        """Return each id's position in the answer key and whether it is there at all"""
+        positions = np.searchsorted(self.ids, question_ids)
+        found = positions < len(self.ids)
+        found[found] = self.ids[positions[found]] == question_ids[found]
+        return np.where(found, positions, 0), found
+    
+    def grade(self, sheets, served=None):
+        """Grade a list of answer sheets in one vectorized pass
+        
+        Each sheet is a list of ``{"question_id", "answer"}`` dicts. When
+        ``served`` gives the question ids each sheet was served, answers to
+        other questions are ignored; a ``None`` entry leaves that sheet
+        unfiltered. Within a sheet only the first answer to a question counts,
+        and questions missing from the bank are skipped. Served ids outside
+        the answer key raise ValueError.
+        """
+        lengths = np.fromiter((len(sheet) for sheet in sheets), dtype=np.int64, count=len(sheets))
+        answers = [answer for sheet in sheets for answer in sheet]
+        question_ids = np.fromiter((answer['question_id'] for answer in answers),
+                                   dtype=np.int64, count=len(answers))
+        responses = np.fromiter((_answer_code(answer['answer']) for answer in answers),
+                                dtype=np.int16, count=len(answers))
+        sheet_index = np.repeat(np.arange(len(sheets)), lengths)
+        
+        positions, in_bank = self._positions(question_ids)
+        keep = in_bank
+        
+        # A (sheet, key position) pair as one integer, for de-duplication and served checks
+        width = len(self.key)
+        pairs = sheet_index * width + positions
+        if served is not None:
+            unfiltered = np.fromiter((ids is None for ids in served), dtype=bool, count=len(served))
+            served_lengths = np.fromiter((len(ids or ()) for ids in served), dtype=np.int64,
+                                         count=len(served))
+            served_ids = np.fromiter((qid for ids in served for qid in ids or ()), dtype=np.int64,
+                                     count=int(served_lengths.sum()))
+            served_positions, found = self._positions(served_ids)
+            if not found.all():
+                raise ValueError("Served question ids must be in the question bank")
+            served_pairs = np.repeat(np.arange(len(served)), served_lengths) * width + served_positions
+            keep = keep & (unfiltered[sheet_index] | np.isin(pairs, served_pairs))
+        
+        kept = np.flatnonzero(keep)
+        _, first = np.unique(pairs[kept], return_index=True)
+        kept = np.sort(kept[first])
+        
+        keys = self.key[positions[kept]]
+        is_correct = responses[kept] == keys
+        totals = np.bincount(sheet_index[kept], minlength=len(sheets))
+        correct = np.bincount(sheet_index[kept], weights=is_correct, minlength=len(sheets))
+        correct = correct.astype(np.int64)
+        scores = np.where(totals > 0, correct * 100 // np.maximum(totals, 1), 0)
+        
+        return GradedBatch(
+            scores, scores >= self.min_passing_score, correct, totals,
+            sheet_index[kept], kept, question_ids[kept], keys, is_correct, answers
+        )
+
+
+class GradedBatch:
+    """Scores for a batch of answer sheets plus per-answer correctness"""
+    
+    def __init__(self, scores, passed, correct, totals, sheet_index, answer_index,
+                 question_ids, keys, is_correct, answers):
+        self.scores = scores
+        self.passed = passed
+        self.correct = correct
+        self.totals = totals
+        self.sheet_index = sheet_index
+        self.question_ids = question_ids
+        self.keys = keys
+        self.is_correct = is_correct
+        self._answer_index = answer_index
+        self._answers = answers
+        self._bounds = np.searchsorted(sheet_index, np.arange(len(scores) + 1))
+    
+    def __len__(self):
+        return len(self.scores)
+    
+    def result(self, sheet):
+        """Return the score fields for one sheet"""
+        return {
+            "score": int(self.scores[sheet]),
+            "passed": bool(self.passed[sheet]),
+            "correct_answers": int(self.correct[sheet]),
+            "total_questions": int(self.totals[sheet])
+        }
+    
+    def detailed_answers(self, sheet):
+        """Return one sheet's graded answers in the form the database stores"""
+        start, end = self._bounds[sheet], self._bounds[sheet + 1]
+        return [
+            {
+                "question_id": int(self.question_ids[row]),
+                "user_answer": self._answers[self._answer_index[row]]['answer'],
+                "correct_answer": chr(self.keys[row]),
+                "is_correct": bool(self.is_correct[row])
+            }
+            for row in range(start, end)
+        ]
+
+
+def _answer_code(answer):
+    """Encode a single-letter answer as its character code; anything else never matches"""
+    if isinstance(answer, str) and len(answer) == 1 and ord(answer) < 256:
+        return ord(answer)
+    return -1
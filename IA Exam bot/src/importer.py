@@ -0,0 +1,125 @@
+"""
+Bulk application import for DHS IA Exam Bot
+"""
+
+import csv
+import json
+import time
+from config.settings import IMPORT_CONFIG
+
+REJECT_FIELDS = ["line", "user_id", "name", "email", "reason"]
+
+
+class ApplicationImporter:
+    """Streams applicants from a CSV or JSONL file into the database in chunks"""
+    
+    def __init__(self, db, validate_email, chunk_size=None):
+        self.db = db
+        self.validate_email = validate_email
+        self.chunk_size = chunk_size or IMPORT_CONFIG['chunk_size']
+    
+    def run(self, source, reject_path=None, file_format=None):
+        """Import every row of source and return counts and throughput
+        
+        Only one chunk is held in memory at a time. Rows with missing fields or
+        invalid emails, and user ids that already exist or repeat within the
+        file, are written to reject_path (CSV) when one is given.
+        """
+        file_format = file_format or ("jsonl" if str(source).endswith(".jsonl") else "csv")
+        started = time.perf_counter()
+        stats = {"rows": 0, "imported": 0, "rejected": 0}
+        reject_file = None
+        rejects = None
+        
+        try:
+            with open(source, newline="", encoding="utf-8") as handle:
+                rows = self._read_csv(handle) if file_format == "csv" else self._read_jsonl(handle)
+                for chunk in self._chunks(rows):
+                    rejected = self._import_chunk(chunk, stats)
+                    if rejected and reject_path:
+                        if rejects is None:
+                            reject_file = open(reject_path, "w", newline="", encoding="utf-8")
+                            rejects = csv.DictWriter(reject_file, fieldnames=REJECT_FIELDS)
+                            rejects.writeheader()
+                        rejects.writerows(rejected)
+        finally:
+            if reject_file is not None:
+                reject_file.close()
+        
+        elapsed = time.perf_counter() - started
+        stats['seconds'] = round(elapsed, 3)
+        stats['rows_per_second'] = round(stats['rows'] / elapsed) if elapsed > 0 else stats['rows']
+        stats['success'] = True
+        return stats
+    
+    def _chunks(self, rows):
+        """Group a row stream into lists of at most chunk_size rows"""
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    def _import_chunk(self, chunk, stats):
+        """Validate and insert one chunk in a single transaction; return its rejects"""
+        rejected = []
+        valid = []
+        seen = set()
+        for row in chunk:
+            reason = row.pop('error', None)
+            if reason is None:
+                if not row['user_id'] or not row['name'] or not row['email']:
+                    reason = "Missing field"
+                elif not self.validate_email(row['email']):
+                    reason = "Invalid email format"
+                elif row['user_id'] in seen:
+                    reason = "Duplicate user_id in file"
+            if reason is not None:
+                rejected.append(dict(row, reason=reason))
+                continue
+            seen.add(row['user_id'])
+            valid.append(row)
+        
+        duplicates = self.db.add_applications(
+            [(row['user_id'], row['name'], row['email']) for row in valid]
+        )
+        for row in valid:
+            if row['user_id'] in duplicates:
+                rejected.append(dict(row, reason="User already has an application"))
+        
+        stats['rows'] += len(chunk)
+        stats['imported'] += len(valid) - len(duplicates)
+        stats['rejected'] += len(rejected)
+        return rejected
+    
+    def _read_csv(self, handle):
+        """Yield normalized rows from a CSV file with a header line"""
+        for line, record in enumerate(csv.DictReader(handle), start=2):
+            yield self._normalize(line, record)
+    
+    def _read_jsonl(self, handle):
+        """Yield normalized rows from a JSONL file, flagging lines that do not parse"""
+        for line, text in enumerate(handle, start=1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError:
+                yield {"line": line, "user_id": "", "name": "", "email": "",
+                       "error": "Malformed JSON"}
+                continue
+            if not isinstance(record, dict):
+                record = {}
+            yield self._normalize(line, record)
+    
+    def _normalize(self, line, record):
+        """Keep the fields an application needs, stripped of whitespace"""
+        return {
+            "line": line,
+            "user_id": str(record.get('user_id') or "").strip(),
+            "name": str(record.get('name') or "").strip(),
+            "email": str(record.get('email') or "").strip()
+        }
@@ -1,134 +1,302 @@
-"""
-Main entry point for DHS IA Exam Bot
-"""
-
-import sys
-from bot import DHSBot
-from config.settings import APP_NAME, APP_VERSION
-
-
-def print_welcome():
-    """Print welcome message"""
-    print(f"\n{'='*60}")
-    print(f"Welcome to {APP_NAME} v{APP_VERSION}")
-    print(f"{'='*60}\n")
-
-
-def print_menu():
-    """Print main menu"""
-    print("\nAvailable Commands:")
-    print("1. create_application - Create a new application")
-    print("2. get_application - View your application")
-    print("3. submit_application - Submit your application")
-    print("4. get_status - Check application status")
-    print("5. start_exam - Begin the IA exam")
-    print("6. submit_exam - Submit exam answers")
-    print("7. get_exam_results - View exam results")
-    print("8. help - Show available commands")
-    print("9. exit - Exit the bot")
-    print()
-
-
-def interactive_mode():
-    """Run bot in interactive mode"""
-    bot = DHSBot()
-    print_welcome()
-    
-    try:
-        while True:
-            print_menu()
-            choice = input("Enter command (1-9): ").strip()
-            
-            if choice == "1":
-                # Create application
-                user_id = input("Enter user ID: ").strip()
-                name = input("Enter your name: ").strip()
-                email = input("Enter your email: ").strip()
-                result = bot.process_user_request("create_application", user_id, name=name, email=email)
-                print(f"\nResult: {result['message']}")
-            
-            elif choice == "2":
-                # Get application
-                user_id = input("Enter user ID: ").strip()
-                result = bot.process_user_request("get_application", user_id)
-                if result['success']:
-                    print(f"\nApplication Details:")
-                    for key, value in result['data'].items():
-                        print(f"  {key}: {value}")
-                else:
-                    print(f"\nError: {result['message']}")
-            
-            elif choice == "3":
-                # Submit application
-                user_id = input("Enter user ID: ").strip()
-                result = bot.process_user_request("submit_application", user_id)
-                print(f"\nResult: {result['message']}")
-            
-            elif choice == "4":
-                # Get status
-                user_id = input("Enter user ID: ").strip()
-                result = bot.process_user_request("get_status", user_id)
-                if result['success']:
-                    print(f"\nApplication Status: {result['status']}")
-                else:
-                    print(f"\nError: {result['message']}")
-            
-            elif choice == "5":
-                # Start exam
-                user_id = input("Enter user ID: ").strip()
-                result = bot.process_user_request("start_exam", user_id)
-                if result['success']:
-                    print(f"\nExam Started!")
-                    print(f"Time Limit: {result['exam_session']['time_limit_minutes']} minutes")
-                    print(f"Number of Questions: {len(result['exam_session']['questions'])}")
-                else:
-                    print(f"\nError: {result['message']}")
-            
-            elif choice == "6":
-                # Submit exam
-                user_id = input("Enter user ID: ").strip()
-                # Demo: submit sample answers
-                answers = [
-                    {"question_id": 1, "answer": "B"},
-                    {"question_id": 2, "answer": "B"},
-                    {"question_id": 3, "answer": "C"}
-                ]
-                result = bot.process_user_request("submit_exam", user_id, answers=answers)
-                print(f"\nExam Results:")
-                print(f"  Score: {result.get('score', 'N/A')}%")
-                print(f"  Passed: {result.get('passed', False)}")
-                print(f"  Correct: {result.get('correct_answers', 0)}/{result.get('total_questions', 0)}")
-                print(f"  Message: {result['message']}")
-            
-            elif choice == "7":
-                # Get exam results
-                user_id = input("Enter user ID: ").strip()
-                result = bot.process_user_request("get_exam_results", user_id)
-                if result['success']:
-                    print(f"\nExam Results:")
-                    for exam in result['results']:
-                        print(f"  Score: {exam['score']}% | Passed: {exam['passed']} | Attempt: {exam['attempt_number']}")
-                else:
-                    print(f"\nError: {result['message']}")
-            
-            elif choice == "8":
-                # Help
-                help_info = bot.get_bot_help()
-                print("\nAvailable Commands:")
-                for cmd, desc in help_info['commands'].items():
-                    print(f"  {cmd}: {desc}")
-            
-            elif choice == "9":
-                # Exit
-                print("\nThank you for using DHS IA Exam Bot. Goodbye!")
-                break
-            
-            else:
-                print("\nInvalid choice. Please try again.")
-    
-    finally:
-        bot.close()
-
-
-if __name__ == "__main__":
-    interactive_mode()
+"""
+Main entry point for DHS IA Exam Bot
+"""
+
+import argparse
+import json
+import sys
+from application import ApplicationManager
+from audit_archive import AuditLogArchiver
+from bot import DHSBot
+from exam import get_question_bank
+from forms import ExamFormPool
+from sharding import open_database, reshard
+from export import EXPORT_TABLES, export_table
+from question_bank import write_question_bank
+from config.settings import (
+    APP_NAME, APP_VERSION, DATABASE_SHARDS, EXAM_FORM_CONFIG, QUESTION_BANK_PATH,
+    ensure_directories
+)
+
+
+def print_welcome():
+    """Print welcome message"""
+    print(f"\n{'='*60}")
+    print(f"Welcome to {APP_NAME} v{APP_VERSION}")
+    print(f"{'='*60}\n")
+
+
+def print_menu():
+    """Print main menu"""
+    print("\nAvailable Commands:")
+    print("1. create_application - Create a new application")
+    print("2. get_application - View your application")
+    print("3. submit_application - Submit your application")
+    print("4. get_status - Check application status")
+    print("5. start_exam - Begin the IA exam")
+    print("6. submit_exam - Submit exam answers")
+    print("7. get_exam_results - View exam results")
+    print("8. help - Show available commands")
+    print("9. exit - Exit the bot")
+    print()
+
+
+def interactive_mode():
+    """Run bot in interactive mode"""
+    bot = DHSBot()
+    if EXAM_FORM_CONFIG['enabled']:
+        bot.exam.forms.start()
+    print_welcome()
+    
+    try:
+        while True:
+            print_menu()
+            choice = input("Enter command (1-9): ").strip()
+            
+            if choice == "1":
+                # Create application
+                user_id = input("Enter user ID: ").strip()
+                name = input("Enter your name: ").strip()
+                email = input("Enter your email: ").strip()
+                result = bot.process_user_request("create_application", user_id, name=name, email=email)
+                print(f"\nResult: {result['message']}")
+            
+            elif choice == "2":
+                # Get application
+                user_id = input("Enter user ID: ").strip()
+                result = bot.process_user_request("get_application", user_id)
+                if result['success']:
+                    print(f"\nApplication Details:")
+                    for key, value in result['data'].items():
+                        print(f"  {key}: {value}")
+                else:
+                    print(f"\nError: {result['message']}")
+            
+            elif choice == "3":
+                # Submit application
+                user_id = input("Enter user ID: ").strip()
+                result = bot.process_user_request("submit_application", user_id)
+                print(f"\nResult: {result['message']}")
+            
+            elif choice == "4":
+                # Get status
+                user_id = input("Enter user ID: ").strip()
+                result = bot.process_user_request("get_status", user_id)
+                if result['success']:
+                    print(f"\nApplication Status: {result['status']}")
+                else:
+                    print(f"\nError: {result['message']}")
+            
+            elif choice == "5":
+                # Start exam
+                user_id = input("Enter user ID: ").strip()
+                result = bot.process_user_request("start_exam", user_id)
+                if result['success']:
+                    print(f"\nExam Started!")
+                    print(f"Time Limit: {result['exam_session']['time_limit_minutes']} minutes")
+                    print(f"Number of Questions: {len(result['exam_session']['questions'])}")
+                else:
+                    print(f"\nError: {result['message']}")
+            
+            elif choice == "6":
+                # Submit exam
+                user_id = input("Enter user ID: ").strip()
+                # Demo: submit sample answers
+                answers = [
+                    {"question_id": 1, "answer": "B"},
+                    {"question_id": 2, "answer": "B"},
+                    {"question_id": 3, "answer": "C"}
+                ]
+                result = bot.process_user_request("submit_exam", user_id, answers=answers)
+                print(f"\nExam Results:")
+                print(f"  Score: {result.get('score', 'N/A')}%")
+                print(f"  Passed: {result.get('passed', False)}")
+                print(f"  Correct: {result.get('correct_answers', 0)}/{result.get('total_questions', 0)}")
+                print(f"  Message: {result['message']}")
+            
+            elif choice == "7":
+                # Get exam results
+                user_id = input("Enter user ID: ").strip()
+                result = bot.process_user_request("get_exam_results", user_id)
+                if result['success']:
+                    print(f"\nExam Results:")
+                    for exam in result['results']:
+                        print(f"  Score: {exam['score']}% | Passed: {exam['passed']} | Attempt: {exam['attempt_number']}")
+                else:
+                    print(f"\nError: {result['message']}")
+            
+            elif choice == "8":
+                # Help
+                help_info = bot.get_bot_help()
+                print("\nAvailable Commands:")
+                for cmd, desc in help_info['commands'].items():
+                    print(f"  {cmd}: {desc}")
+            
+            elif choice == "9":
+                # Exit
+                print("\nThank you for using DHS IA Exam Bot. Goodbye!")
+                break
+            
+            else:
+                print("\nInvalid choice. Please try again.")
+    
+    finally:
+        bot.close()
+
+
+def build_question_bank(source, destination=QUESTION_BANK_PATH):
+    """Pack a JSON or JSONL file of questions into the bank file format"""
+    with open(source, encoding="utf-8") as handle:
+        if str(source).endswith(".jsonl"):
+            questions = [json.loads(line) for line in handle if line.strip()]
+        else:
+            questions = json.load(handle)
+    write_question_bank(questions, destination)
+    print(f"Wrote {len(questions)} questions to {destination}")
+
+
+def import_applications(source, reject_path=None):
+    """Load applications from a CSV or JSONL file into the database"""
+    manager = ApplicationManager()
+    try:
+        result = manager.import_applications(source, reject_path)
+    finally:
+        manager.close()
+    print(f"Imported {result['imported']} of {result['rows']} rows "
+          f"({result['rows_per_second']} rows/s), rejected {result['rejected']}")
+    if result['rejected'] and reject_path:
+        print(f"Rejected rows written to {reject_path}")
+
+
+def item_analysis():
+    """Update the item statistics with new exam results and print a report"""
+    # Imported here so other commands do not pay for loading NumPy
+    from analytics import ItemAnalysis
+    db = open_database()
+    try:
+        analysis = ItemAnalysis(db)
+        added = analysis.refresh()
+        stats = analysis.item_statistics()
+        categories = analysis.category_pass_rates()
+    finally:
+        db.close()
+    
+    print(f"Added {added} new exam results")
+    print(f"\n{'Question':>8}  {'Responses':>9}  {'P-value':>7}  {'Discrim.':>8}  Options")
+    for question_id, item in stats.items():
+        p_value = f"{item['p_value']:.2f}" if item['p_value'] is not None else "-"
+        discrimination = f"{item['discrimination']:.2f}" if item['discrimination'] is not None else "-"
+        options = " ".join(f"{option}:{count}" for option, count in item['options'].items())
+        print(f"{question_id:>8}  {item['responses']:>9}  {p_value:>7}  {discrimination:>8}  {options}")
+    print()
+    for category, rate in categories.items():
+        print(f"{category}: {rate['passed']}/{rate['attempts']} passed ({rate['pass_rate']:.0%})")
+
+
+def export(table, destination, since=None, until=None, status=None, after_id=None, after_shard=0):
+    """Stream a table to a CSV or JSONL file"""
+    db = open_database()
+    try:
+        result = export_table(db, table, destination, since=since, until=until,
+                              status=status, after_id=after_id, after_shard=after_shard)
+    finally:
+        db.close()
+    print(f"Exported {result['rows']} {table} rows to {destination} "
+          f"(last shard {result['last_shard']}, id {result['last_id']})")
+
+
+def audit_maintenance():
+    """Move old audit entries into monthly partitions and archive expired ones"""
+    db = open_database()
+    try:
+        result = AuditLogArchiver(db).run()
+    finally:
+        db.close()
+    print(f"Moved {result['moved']} audit entries into monthly partitions")
+    print(f"Archived {result['archived_partitions']} partitions ({result['archived_rows']} entries), "
+          f"deleted {result['deleted_archives']} expired archives")
+
+
+def generate_forms():
+    """Fill the exam form pool of every shard up to its configured size"""
+    db = open_database()
+    try:
+        pool = ExamFormPool(db, get_question_bank())
+        added = pool.refill()
+        available = pool.available()
+    finally:
+        db.close()
+    print(f"Generated {added} exam forms (version {pool.version}), "
+          f"{sum(available)} ready across {len(available)} shards")
+
+
+def reshard_database(shards, current=DATABASE_SHARDS):
+    """Copy the database into a new number of shard files"""
+    copied = reshard(old_count=current, new_count=shards)
+    for table, rows in copied.items():
+        print(f"{table}: {rows} rows copied")
+    print(f"The old shard files are marked as resharded and can no longer be opened. "
+          f"Set DATABASE_SHARDS = {shards} in config/settings.py, then remove them")
+
+
+def main(argv=None):
+    """Run a maintenance command, or the interactive bot when none is given"""
+    parser = argparse.ArgumentParser(description=APP_NAME)
+    commands = parser.add_subparsers(dest="command")
+    
+    bank_parser = commands.add_parser("build-question-bank", help="Pack a question file for the exam")
+    bank_parser.add_argument("source", help="JSON list or JSONL file of questions")
+    bank_parser.add_argument("--output", default=QUESTION_BANK_PATH, help="Bank file to write")
+    
+    import_parser = commands.add_parser("import-applications", help="Bulk-load applications")
+    import_parser.add_argument("source", help="CSV (user_id,name,email header) or JSONL file")
+    import_parser.add_argument("--rejects", help="CSV file to write rejected rows to")
+    
+    commands.add_parser("item-analysis", help="Report question difficulty and discrimination")
+    
+    export_parser = commands.add_parser("export", help="Export a table to CSV or JSONL")
+    export_parser.add_argument("table", choices=sorted(EXPORT_TABLES))
+    export_parser.add_argument("destination", help="Output file; .jsonl for JSON lines, else CSV")
+    export_parser.add_argument("--since", help="Only rows on or after this date (YYYY-MM-DD)")
+    export_parser.add_argument("--until", help="Only rows before this date (YYYY-MM-DD)")
+    export_parser.add_argument("--status", help="Only rows for applicants in this application status")
+    resume = export_parser.add_mutually_exclusive_group()
+    resume.add_argument("--after-id", type=int, help="Append rows after this id")
+    resume.add_argument("--resume", action="store_const", const="resume", dest="after_id",
+                        help="Append rows after the last id already in the file")
+    export_parser.add_argument("--after-shard", type=int, default=0,
+                               help="Shard that --after-id belongs to in a sharded database")
+    
+    commands.add_parser("audit-maintenance", help="Partition and archive the audit log")
+    
+    commands.add_parser("generate-forms", help="Pre-generate exam forms up to the pool size")
+    
+    reshard_parser = commands.add_parser("reshard", help="Copy the database into N shard files "
+                                                         "(stop the bot first)")
+    reshard_parser.add_argument("--shards", type=int, required=True, help="New number of shards")
+    reshard_parser.add_argument("--current", type=int, default=DATABASE_SHARDS,
+                                help="Current number of shards")
+    
+    args = parser.parse_args(argv)
+    ensure_directories()
+    if args.command == "build-question-bank":
+        build_question_bank(args.source, args.output)
+    elif args.command == "import-applications":
+        import_applications(args.source, args.rejects)
+    elif args.command == "item-analysis":
+        item_analysis()
+    elif args.command == "export":
+        export(args.table, args.destination, args.since, args.until, args.status, args.after_id,
+               args.after_shard)
+    elif args.command == "audit-maintenance":
+        audit_maintenance()
+    elif args.command == "generate-forms":
+        generate_forms()
+    elif args.command == "reshard":
+        reshard_database(args.shards, args.current)
+    else:
+        interactive_mode()
+
+
+if __name__ == "__main__":
+    main()
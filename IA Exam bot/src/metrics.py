@@ -0,0 +1,218 @@
+"""
+Request and SQL metrics for DHS IA Exam Bot
+"""
+
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from config.settings import METRICS_CONFIG
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Reduce a statement to its shape: literals become ? and IN lists collapse"""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style"""
+    
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value):
+        """Record one observation"""
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+    
+    def cumulative(self):
+        """Return (upper bound, observations at or below it) pairs"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+    
+    def snapshot(self):
+        """Return the histogram as a plain dict"""
+        return {
+            "count": self.count,
+            "sum_seconds": self.sum,
+            "buckets": {str(bound): count for bound, count in self.cumulative()}
+        }
+
+
+class MetricsRegistry:
+    """Process-wide request, statement and commit metrics"""
+    
+    def __init__(self, buckets=None, enabled=True):
+        self.buckets = list(buckets or METRICS_CONFIG['latency_buckets'])
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+    
+    def reset(self):
+        """Drop everything recorded so far"""
+        with self._lock:
+            self._requests = {}
+            self._outcomes = {}
+            self._request_commits = {}
+            self._statements = {}
+            self._commits = Histogram(self.buckets)
+            self._audit_dropped = 0
+    
+    @contextmanager
+    def track_request(self, request_type):
+        """Time a request and count the commits made on this thread while it runs
+        
+        The block should set ``outcome['success']``; a block that raises
+        counts as a failure.
+        """
+        outcome = {"success": False}
+        if not self.enabled:
+            yield outcome
+            return
+        previous = getattr(self._local, 'commits', None)
+        self._local.commits = 0
+        started = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            elapsed = time.perf_counter() - started
+            commits = self._local.commits
+            self._local.commits = previous
+            result = "success" if outcome['success'] else "failure"
+            with self._lock:
+                histogram = self._requests.get(request_type)
+                if histogram is None:
+                    histogram = self._requests[request_type] = Histogram(self.buckets)
+                histogram.observe(elapsed)
+                key = (request_type, result)
+                self._outcomes[key] = self._outcomes.get(key, 0) + 1
+                self._request_commits[request_type] = (
+                    self._request_commits.get(request_type, 0) + commits
+                )
+    
+    def observe_statement(self, sql, seconds):
+        """Record one executed statement"""
+        statement = normalize_sql(sql)
+        with self._lock:
+            stats = self._statements.get(statement)
+            if stats is None:
+                stats = self._statements[statement] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+    
+    def observe_commit(self, seconds):
+        """Record one commit, crediting it to the request running on this thread"""
+        if getattr(self._local, 'commits', None) is not None:
+            self._local.commits += 1
+        with self._lock:
+            self._commits.observe(seconds)
+    
+    def observe_audit_dropped(self, count):
+        """Record audit entries the background writer could not write"""
+        with self._lock:
+            self._audit_dropped += count
+    
+    def snapshot(self):
+        """Return every metric as nested plain dicts"""
+        with self._lock:
+            requests = {}
+            for request_type, histogram in self._requests.items():
+                requests[request_type] = dict(
+                    histogram.snapshot(),
+                    success=self._outcomes.get((request_type, "success"), 0),
+                    failure=self._outcomes.get((request_type, "failure"), 0),
+                    commits=self._request_commits.get(request_type, 0)
+                )
+            statements = {
+                statement: {"count": count, "total_seconds": total, "max_seconds": longest}
+                for statement, (count, total, longest) in self._statements.items()
+            }
+            return {"requests": requests, "statements": statements,
+                    "commits": self._commits.snapshot(), "audit_dropped": self._audit_dropped}
+    
+    def prometheus(self):
+        """Return every metric in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP dhs_bot_request_duration_seconds Time spent handling bot requests.",
+            "# TYPE dhs_bot_request_duration_seconds histogram"
+        ]
+        for request_type, stats in sorted(snapshot['requests'].items()):
+            labels = f'request_type="{_escape(request_type)}"'
+            lines.extend(_histogram_lines("dhs_bot_request_duration_seconds", labels, stats))
+        
+        lines.append("# HELP dhs_bot_requests_total Bot requests by outcome.")
+        lines.append("# TYPE dhs_bot_requests_total counter")
+        for request_type, stats in sorted(snapshot['requests'].items()):
+            for result in ("success", "failure"):
+                lines.append(f'dhs_bot_requests_total{{request_type="{_escape(request_type)}",'
+                             f'outcome="{result}"}} {stats[result]}')
+        
+        lines.append("# HELP dhs_bot_request_commits_total Commits made while handling requests.")
+        lines.append("# TYPE dhs_bot_request_commits_total counter")
+        for request_type, stats in sorted(snapshot['requests'].items()):
+            lines.append(f'dhs_bot_request_commits_total{{request_type="{_escape(request_type)}"}} '
+                         f'{stats["commits"]}')
+        
+        lines.append("# HELP dhs_bot_sql_statements_total SQL statements executed, by normalized text.")
+        lines.append("# TYPE dhs_bot_sql_statements_total counter")
+        for statement, stats in sorted(snapshot['statements'].items()):
+            lines.append(f'dhs_bot_sql_statements_total{{statement="{_escape(statement)}"}} {stats["count"]}')
+        lines.append("# HELP dhs_bot_sql_statement_seconds_total Time spent executing SQL statements.")
+        lines.append("# TYPE dhs_bot_sql_statement_seconds_total counter")
+        for statement, stats in sorted(snapshot['statements'].items()):
+            lines.append(f'dhs_bot_sql_statement_seconds_total{{statement="{_escape(statement)}"}} '
+                         f'{stats["total_seconds"]:.9f}')
+        
+        lines.append("# HELP dhs_bot_sql_commit_duration_seconds Time spent committing transactions.")
+        lines.append("# TYPE dhs_bot_sql_commit_duration_seconds histogram")
+        lines.extend(_histogram_lines("dhs_bot_sql_commit_duration_seconds", "", snapshot['commits']))
+        
+        lines.append("# HELP dhs_bot_audit_entries_dropped_total Audit entries the background writer dropped.")
+        lines.append("# TYPE dhs_bot_audit_entries_dropped_total counter")
+        lines.append(f"dhs_bot_audit_entries_dropped_total {snapshot['audit_dropped']}")
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name, labels, stats):
+    """Return the _bucket, _sum and _count lines of one histogram"""
+    prefix = f"{labels}," if labels else ""
+    lines = [f'{name}_bucket{{{prefix}le="{bound}"}} {count}'
+             for bound, count in stats['buckets'].items()]
+    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {stats["count"]}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {stats['sum_seconds']:.9f}")
+    lines.append(f"{name}_count{suffix} {stats['count']}")
+    return lines
+
+
+def _escape(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Shared by every Database and DHSBot in the process
+METRICS = MetricsRegistry(enabled=METRICS_CONFIG['enabled'])
@@ -0,0 +1,60 @@
+"""
+Row records for DHS IA Exam Bot
+
+Database reads return these named tuples instead of dicts. They are built
+straight from result rows by a cursor row factory, take no per-row dict,
+and are immutable, so cached records can be handed out without copying.
+``to_dict()`` gives the plain dict used in bot responses.
+"""
+
+from collections import namedtuple
+
+
+class _Record:
+    """Row factory and dict conversion shared by the record types"""
+    
+    __slots__ = ()
+    
+    @classmethod
+    def from_row(cls, cursor, row):
+        """Row factory: build a record from a row selected in field order"""
+        return tuple.__new__(cls, row)
+    
+    @classmethod
+    def select_list(cls):
+        """Return the column list to select for this record"""
+        return ", ".join(cls._fields)
+    
+    def to_dict(self):
+        """Return the record as a dict keyed by column name"""
+        return dict(zip(self._fields, self))
+
+
+class Application(_Record, namedtuple("Application", [
+    "id", "user_id", "name", "email", "status", "created_at", "updated_at", "submission_date"
+])):
+    """A row of the applications table"""
+    
+    __slots__ = ()
+
+
+class ExamResult(_Record, namedtuple("ExamResult", [
+    "id", "user_id", "exam_date", "score", "passed", "time_taken_minutes", "attempt_number",
+    "category", "form_id"
+])):
+    """A row of the exam_results table"""
+    
+    __slots__ = ()
+
+
+class ExamAnswer(_Record, namedtuple("ExamAnswer", [
+    "result_id", "question_id", "user_answer", "correct_answer", "is_correct"
+])):
+    """One graded answer of an exam result, stored packed or as its own row"""
+    
+    __slots__ = ()
+    
+    @classmethod
+    def from_row(cls, cursor, row):
+        """Row factory: build an answer, turning the stored is_correct flag into a bool"""
+        return tuple.__new__(cls, (row[0], row[1], row[2], row[3], bool(row[4])))
@@ -0,0 +1,325 @@
+"""
+Question bank for DHS IA Exam Bot
+
+Questions are held in a packed columnar layout: ids, category codes,
+difficulty codes and answer keys sit in flat arrays, rows are grouped by
+(category, difficulty) cell, and question and option text is only decoded
+when a question is served. The same layout is used in memory and on disk,
+so a bank file can be memory-mapped and shared between processes.
+"""
+
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+from array import array
+from config.settings import EXAM_CATEGORIES, EXAM_DIFFICULTY_DISTRIBUTION
+
+MAGIC = b"IAQB"
+FORMAT_VERSION = 1
+
+# magic, version, flags, question count, category count, difficulty count,
+# then offset of each section: names, cell offsets, ids, category codes,
+# difficulty codes, answer keys, text offsets, text
+_HEADER = struct.Struct("<4sHHIHH8Q")
+
+
+class QuestionBank:
+    """Question store with O(1) lookup by id and precomputed sampling indexes"""
+    
+    def __init__(self, questions):
+        self._attach(pack_questions(questions))
+    
+    @classmethod
+    def from_buffer(cls, buffer):
+        """Create a bank over packed bytes without copying them"""
+        bank = cls.__new__(cls)
+        bank._attach(buffer)
+        return bank
+    
+    @classmethod
+    def from_file(cls, path):
+        """Memory-map a packed bank file"""
+        with open(path, "rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_buffer(mapped)
+    
+    def _attach(self, buffer):
+        """Point the column views at a packed buffer"""
+        view = memoryview(buffer)
+        (magic, version, _flags, count, n_categories, n_difficulties,
+         names_at, cells_at, ids_at, categories_at, difficulties_at,
+         answers_at, text_offsets_at, text_at) = _HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a supported question bank file")
+        
+        # The names section is followed by alignment padding
+        names = json.loads(bytes(view[names_at:cells_at]).rstrip(b"\0"))
+        self._buffer = buffer
+        self._count = count
+        self._category_names = names['categories']
+        self._difficulty_names = names['difficulties']
+        self._n_difficulties = n_difficulties
+        self._cells = _column(view, cells_at, n_categories * n_difficulties + 1, 'I')
+        self._ids = _column(view, ids_at, count, 'q')
+        self._category_codes = view[categories_at:categories_at + count]
+        self._difficulty_codes = view[difficulties_at:difficulties_at + count]
+        self._answers = view[answers_at:answers_at + count]
+        self._text_offsets = _column(view, text_offsets_at, count + 1, 'Q')
+        self._text = view[text_at:]
+        self._positions = None
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return self._count
+    
+    def __contains__(self, question_id):
+        return question_id in self._position_index()
+    
+    def _position_index(self):
+        """Return the id -> row mapping, building it on first use"""
+        if self._positions is None:
+            with self._lock:
+                if self._positions is None:
+                    self._positions = dict(zip(self._ids, range(self._count)))
+        return self._positions
+    
+    def _materialize(self, position):
+        """Decode one row into the question dict served to applicants"""
+        start, end = self._text_offsets[position], self._text_offsets[position + 1]
+        text = json.loads(bytes(self._text[start:end]))
+        return {
+            "id": self._ids[position],
+            "category": self._category_names[self._category_codes[position]],
+            "question": text['question'],
+            "options": text['options'],
+            "correct_answer": chr(self._answers[position]),
+            "difficulty": self._difficulty_names[self._difficulty_codes[position]]
+        }
+    
+    def get(self, question_id):
+        """Return a question by id, or None"""
+        position = self._position_index().get(question_id)
+        return None if position is None else self._materialize(position)
+    
+    def answer_key(self, question_id):
+        """Return the correct answer for a question, or None"""
+        position = self._position_index().get(question_id)
+        return None if position is None else chr(self._answers[position])
+    
+    def answer_columns(self):
+        """Return the id and answer-key columns as parallel sequences"""
+        return self._ids, self._answers
+    
+    def categories(self):
+        """Return the categories present in the bank"""
+        return [name for name, (start, end) in zip(self._category_names, self._category_ranges())
+                if end > start]
+    
+    def ids_in_category(self, category):
+        """Return the ids of all questions in a category"""
+        if category not in self._category_names:
+            return array('q')
+        start, end = self._category_ranges()[self._category_names.index(category)]
+        return self._ids[start:end]
+    
+    def ids_with_difficulty(self, difficulty):
+        """Return the ids of all questions at a difficulty level"""
+        if difficulty not in self._difficulty_names:
+            return array('q')
+        code = self._difficulty_names.index(difficulty)
+        ids = array('q')
+        for category_code in range(len(self._category_names)):
+            start, end = self._cell_range(category_code, code)
+            ids.extend(self._ids[start:end])
+        return ids
+    
+    def _cell_range(self, category_code, difficulty_code):
+        """Return the row range of one (category, difficulty) cell"""
+        cell = category_code * self._n_difficulties + difficulty_code
+        return self._cells[cell], self._cells[cell + 1]
+    
+    def _category_ranges(self):
+        """Return the row range of every category"""
+        width = self._n_difficulties
+        return [(self._cells[code * width], self._cells[(code + 1) * width])
+                for code in range(len(self._category_names))]
+    
+    def sample(self, total, category_weights=None, difficulty_weights=None, rng=None):
+        """Draw a stratified sample of questions meeting category and difficulty quotas
+        
+        Categories are weighted equally across EXAM_CATEGORIES unless weights are
+        given, and each category's quota is split across difficulty levels by
+        EXAM_DIFFICULTY_DISTRIBUTION. Quotas a stratum cannot fill are moved to
+        the strata that still have questions, so the sample only comes up short
+        when the whole bank is smaller than ``total``.
+        """
+        positions = self._sample_positions(total, category_weights, difficulty_weights, rng)
+        return [self._materialize(position) for position in positions]
+    
+    def sample_ids(self, total, category_weights=None, difficulty_weights=None, rng=None):
+        """Draw a stratified sample like ``sample`` but return only the question ids"""
+        positions = self._sample_positions(total, category_weights, difficulty_weights, rng)
+        return [self._ids[position] for position in positions]
+    
+    def _sample_positions(self, total, category_weights, difficulty_weights, rng):
+        """Return the shuffled rows of a stratified sample"""
+        rng = rng or random
+        if category_weights is None:
+            category_weights = {category: 1 for category in EXAM_CATEGORIES}
+        if difficulty_weights is None:
+            difficulty_weights = EXAM_DIFFICULTY_DISTRIBUTION
+        
+        category_quotas = _apportion(
+            total, category_weights,
+            {name: end - start
+             for name, (start, end) in zip(self._category_names, self._category_ranges())}
+        )
+        
+        selected = []
+        for category_code, category in enumerate(self._category_names):
+            quota = category_quotas[category]
+            if not quota:
+                continue
+            cells = {}
+            for difficulty_code, difficulty in enumerate(self._difficulty_names):
+                start, end = self._cell_range(category_code, difficulty_code)
+                cells[difficulty] = end - start
+            quotas = _apportion(quota, difficulty_weights, cells)
+            for difficulty_code, difficulty in enumerate(self._difficulty_names):
+                if quotas[difficulty]:
+                    start, end = self._cell_range(category_code, difficulty_code)
+                    selected.extend(rng.sample(range(start, end), quotas[difficulty]))
+        
+        rng.shuffle(selected)
+        return selected
+
+
+def pack_questions(questions):
+    """Pack question dicts into the bank layout and return the bytes"""
+    categories = []
+    difficulties = []
+    for question in questions:
+        if question['category'] not in categories:
+            categories.append(question['category'])
+        if question['difficulty'] not in difficulties:
+            difficulties.append(question['difficulty'])
+    
+    # Group rows by cell so every stratum is a contiguous range
+    rows = sorted(questions, key=lambda q: (categories.index(q['category']),
+                                            difficulties.index(q['difficulty'])))
+    cell_counts = [0] * (len(categories) * len(difficulties))
+    ids = array('q')
+    category_codes = bytearray()
+    difficulty_codes = bytearray()
+    answers = bytearray()
+    text_offsets = array('Q', [0])
+    text = bytearray()
+    for question in rows:
+        category_code = categories.index(question['category'])
+        difficulty_code = difficulties.index(question['difficulty'])
+        cell_counts[category_code * len(difficulties) + difficulty_code] += 1
+        ids.append(question['id'])
+        category_codes.append(category_code)
+        difficulty_codes.append(difficulty_code)
+        answers.extend(question['correct_answer'].encode("ascii"))
+        text.extend(json.dumps({"question": question['question'],
+                                "options": question['options']}).encode("utf-8"))
+        text_offsets.append(len(text))
+    
+    cells = array('I', [0])
+    for count in cell_counts:
+        cells.append(cells[-1] + count)
+    
+    names = json.dumps({"categories": categories, "difficulties": difficulties}).encode("utf-8")
+    sections = [names, _little_endian(cells), _little_endian(ids), category_codes,
+                difficulty_codes, answers, _little_endian(text_offsets), text]
+    
+    offsets = []
+    body = bytearray()
+    for section in sections:
+        # Keep every section 8-byte aligned so it can be viewed as an array in place
+        body.extend(b"\0" * (-(_HEADER.size + len(body)) % 8))
+        offsets.append(_HEADER.size + len(body))
+        body.extend(section)
+    
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(rows), len(categories),
+                          len(difficulties), *offsets)
+    return header + bytes(body)
+
+
+def write_question_bank(questions, path):
+    """Write a packed bank file, replacing any existing one atomically"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as handle:
+        handle.write(pack_questions(questions))
+    os.replace(temp_path, path)
+
+
+_loaded_banks = {}
+_loaded_lock = threading.Lock()
+
+
+def load_question_bank(path):
+    """Return the memory-mapped bank at path, shared by every caller in the process"""
+    stat = os.stat(path)
+    key = os.fspath(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _loaded_lock:
+        cached = _loaded_banks.get(key)
+        if cached is None or cached[0] != signature:
+            cached = (signature, QuestionBank.from_file(path))
+            _loaded_banks[key] = cached
+    return cached[1]
+
+
+def _column(view, offset, count, typecode):
+    """View a packed little-endian column as a sequence of numbers"""
+    size = array(typecode).itemsize
+    column = view[offset:offset + count * size]
+    if sys.byteorder == "little":
+        return column.cast(typecode)
+    values = array(typecode, column.tobytes())
+    values.byteswap()
+    return values
+
+
+def _little_endian(values):
+    """Return an array's bytes in little-endian order"""
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _apportion(total, weights, capacities):
+    """Split ``total`` across keys by weight without exceeding each key's capacity
+    
+    Uses the largest-remainder method and hands any share a key cannot hold to
+    the keys that still have room. Keys without a weight only receive a share
+    once every weighted key is full.
+    """
+    quotas = {key: 0 for key in capacities}
+    remaining = min(total, sum(capacities.values()))
+    
+    while remaining > 0:
+        open_keys = [key for key in capacities if quotas[key] < capacities[key]]
+        active = [key for key in open_keys if weights.get(key, 0) > 0] or open_keys
+        key_weights = {key: weights.get(key, 0) or 1 for key in active}
+        weight_sum = sum(key_weights.values())
+        
+        shares = {key: remaining * weight / weight_sum for key, weight in key_weights.items()}
+        whole = {key: int(share) for key, share in shares.items()}
+        leftover = remaining - sum(whole.values())
+        for key in sorted(active, key=lambda k: shares[k] - whole[k], reverse=True)[:leftover]:
+            whole[key] += 1
+        
+        for key, share in whole.items():
+            granted = min(share, capacities[key] - quotas[key])
+            quotas[key] += granted
+            remaining -= granted
+    
+    return quotas
@@ -0,0 +1,164 @@
+"""
+Exam session storage for DHS IA Exam Bot
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from config.settings import IA_EXAM_CONFIG, EXAM_SESSION_CONFIG
+
+
+class ExamSession:
+    """The questions served to a user, the form they came from and when the exam started"""
+    
+    def __init__(self, user_id, question_ids, started_at=None, expires_at=None, form_id=None):
+        self.user_id = user_id
+        self.question_ids = tuple(question_ids)
+        self.form_id = form_id
+        self.started_at = time.time() if started_at is None else started_at
+        self.expires_at = self.started_at + session_ttl_seconds() if expires_at is None else expires_at
+    
+    def is_expired(self, now=None):
+        """Return True once the time limit and grace period have passed"""
+        return (time.time() if now is None else now) >= self.expires_at
+    
+    def elapsed_seconds(self, now=None):
+        """Return how long the exam has been running"""
+        return (time.time() if now is None else now) - self.started_at
+
+
+def session_ttl_seconds():
+    """Return how long a session stays valid after it starts"""
+    minutes = IA_EXAM_CONFIG['time_limit_minutes'] + EXAM_SESSION_CONFIG['grace_minutes']
+    return minutes * 60
+
+
+class MemorySessionStore:
+    """In-process session store with expiry-based eviction and a size cap"""
+    
+    def __init__(self, max_sessions=None):
+        self.max_sessions = max_sessions or EXAM_SESSION_CONFIG['max_sessions']
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def put(self, session):
+        """Store a session; returns False when the store is full"""
+        with self._lock:
+            self._purge_expired(time.time())
+            if session.user_id not in self._sessions and len(self._sessions) >= self.max_sessions:
+                return False
+            self._sessions.pop(session.user_id, None)
+            self._sessions[session.user_id] = session
+            return True
+    
+    def get(self, user_id):
+        """Return the user's active session, or None"""
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None and session.is_expired():
+                del self._sessions[user_id]
+                return None
+            return session
+    
+    def pop(self, user_id):
+        """Remove and return the user's session, or None"""
+        with self._lock:
+            return self._sessions.pop(user_id, None)
+    
+    def purge_expired(self):
+        """Drop every expired session"""
+        with self._lock:
+            self._purge_expired(time.time())
+    
+    def __len__(self):
+        return len(self._sessions)
+    
+    def _purge_expired(self, now):
+        """Drop expired sessions from the front; they are kept in start order"""
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if not session.is_expired(now):
+                break
+            del self._sessions[user_id]
+
+
+class SQLiteSessionStore:
+    """Session store in the exam_sessions table so sessions survive restarts
+    
+    Each session is kept in the shard of its user; the size cap applies to
+    all shards together.
+    """
+    
+    def __init__(self, db, max_sessions=None):
+        self.db = db
+        self.max_sessions = max_sessions or EXAM_SESSION_CONFIG['max_sessions']
+    
+    def put(self, session):
+        """Store a session; returns False when the store is full"""
+        shard = self.db.shard_for(session.user_id)
+        now = time.time()
+        count = 0
+        for other in self.db.shards:
+            if other is not shard:
+                with other.connection() as conn:
+                    count += conn.execute("SELECT COUNT(*) FROM exam_sessions WHERE expires_at > ?",
+                                          (now,)).fetchone()[0]
+        with shard.transaction() as conn:
+            conn.execute("DELETE FROM exam_sessions WHERE expires_at <= ?", (now,))
+            count += conn.execute("SELECT COUNT(*) FROM exam_sessions WHERE user_id != ?",
+                                  (session.user_id,)).fetchone()[0]
+            if count >= self.max_sessions:
+                return False
+            conn.execute("""
+                INSERT OR REPLACE INTO exam_sessions
+                    (user_id, question_ids, started_at, expires_at, form_id)
+                VALUES (?, ?, ?, ?, ?)
+            """, (session.user_id, json.dumps(session.question_ids),
+                  session.started_at, session.expires_at, session.form_id))
+        return True
+    
+    def get(self, user_id):
+        """Return the user's active session, or None"""
+        with self.db.shard_for(user_id).connection() as conn:
+            row = conn.execute("""
+                SELECT question_ids, started_at, expires_at, form_id FROM exam_sessions
+                WHERE user_id = ? AND expires_at > ?
+            """, (user_id, time.time())).fetchone()
+        if row is None:
+            return None
+        return ExamSession(user_id, json.loads(row[0]), row[1], row[2], row[3])
+    
+    def pop(self, user_id):
+        """Remove and return the user's session, or None"""
+        with self.db.shard_for(user_id).transaction() as conn:
+            row = conn.execute("""
+                DELETE FROM exam_sessions WHERE user_id = ?
+                RETURNING question_ids, started_at, expires_at, form_id
+            """, (user_id,)).fetchone()
+        if row is None or row[2] <= time.time():
+            return None
+        return ExamSession(user_id, json.loads(row[0]), row[1], row[2], row[3])
+    
+    def purge_expired(self):
+        """Drop every expired session"""
+        for shard in self.db.shards:
+            with shard.transaction() as conn:
+                conn.execute("DELETE FROM exam_sessions WHERE expires_at <= ?", (time.time(),))
+    
+    def __len__(self):
+        count = 0
+        for shard in self.db.shards:
+            with shard.connection() as conn:
+                count += conn.execute("SELECT COUNT(*) FROM exam_sessions").fetchone()[0]
+        return count
+
+
+def create_session_store(db, backend=None):
+    """Build the session store selected in EXAM_SESSION_CONFIG"""
+    backend = backend or EXAM_SESSION_CONFIG['backend']
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(db)
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,406 @@
+"""
+Sharded SQLite storage for DHS IA Exam Bot
+
+Applicants are spread across several database files by a stable hash of
+their user_id. Everything about one applicant (application, exam results
+and answers, summary, sessions and audit entries) lives in the same shard,
+so per-user operations touch one file and keep their single-commit
+transactions. Admin queries over many users fan out and merge.
+"""
+
+import base64
+import heapq
+import json
+import zlib
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+from pathlib import Path
+from database import (
+    Database, IN_CLAUSE_CHUNK_SIZE, _chunks, _page_size, _placeholders, encode_page_cursor
+)
+from config.settings import (
+    DATABASE_PATH, DATABASE_POOL_SIZE, DATABASE_SHARDS, EXAM_ANSWER_STORAGE
+)
+
+# Rows read from a source shard per batch while resharding
+RESHARD_BATCH_SIZE = 1000
+
+# Per-user tables copied as they are by reshard; exam results and their
+# answers are copied separately because result ids change. The audit log is
+# read with its partitions and lands in each new shard's audit_log. Sessions
+# in progress lose their form id; unclaimed forms are regenerated per shard.
+RESHARD_TABLES = {
+    "applications": ["user_id", "name", "email", "status", "created_at", "updated_at",
+                     "submission_date"],
+    "user_exam_summary": ["user_id", "attempt_count", "failed_count", "best_score",
+                          "last_exam_date"],
+    "exam_sessions": ["user_id", "question_ids", "started_at", "expires_at"],
+    "audit_log": ["user_id", "action", "timestamp", "details"]
+}
+
+
+def shard_index(user_id, count):
+    """Return the shard a user belongs to; the hash is stable across processes"""
+    if count == 1 or user_id is None:
+        return 0
+    return zlib.crc32(str(user_id).encode("utf-8")) % count
+
+
+def shard_paths(db_path, count):
+    """Return the file of each shard; a single shard keeps the plain path"""
+    db_path = Path(db_path)
+    if count == 1:
+        return [db_path]
+    return [db_path.with_name(f"{db_path.stem}.{index}-of-{count}{db_path.suffix}")
+            for index in range(1, count + 1)]
+
+
+def open_database(db_path=DATABASE_PATH, shards=DATABASE_SHARDS, pool_size=DATABASE_POOL_SIZE,
+                  answer_storage=EXAM_ANSWER_STORAGE):
+    """Return a Database, or a ShardedDatabase when there is more than one shard"""
+    if shards == 1:
+        return Database(db_path, pool_size, answer_storage)
+    return ShardedDatabase(shard_paths(db_path, shards), pool_size, answer_storage)
+
+
+class ShardedDatabase:
+    """Database facade that routes each user to one of several SQLite files"""
+    
+    def __init__(self, paths, pool_size=DATABASE_POOL_SIZE, answer_storage=EXAM_ANSWER_STORAGE):
+        self.paths = [Path(path) for path in paths]
+        self._shards = [Database(path, pool_size, answer_storage) for path in self.paths]
+    
+    @property
+    def shards(self):
+        """Return the per-shard databases in shard order"""
+        return list(self._shards)
+    
+    def shard_for(self, user_id):
+        """Return the database holding a user's rows"""
+        return self._shards[shard_index(user_id, len(self._shards))]
+    
+    def _group(self, items, key=lambda item: item):
+        """Split items by the shard of their user id, keeping their order"""
+        groups = {}
+        for item in items:
+            groups.setdefault(shard_index(key(item), len(self._shards)), []).append(item)
+        return groups
+    
+    @contextmanager
+    def transaction(self, user_ids=None):
+        """Open a transaction on the shards of some users, or on every shard, for the block
+        
+        Per-user writes inside the block join their shard's transaction;
+        shards no user touches stay free for other writers. Shards are locked
+        in shard order, so two blocks never wait on each other. Each shard
+        commits or rolls back as a unit, but the shards commit one after
+        another, so a crash part way through can leave some committed.
+        """
+        if user_ids is None:
+            shards = self._shards
+        else:
+            shards = [self._shards[index] for index in sorted(self._group(user_ids))]
+        with ExitStack() as stack:
+            yield [stack.enter_context(shard.transaction()) for shard in shards]
+    
+    def init_database(self):
+        """Bring every shard's schema up to date now instead of on first use"""
+        for shard in self._shards:
+            shard.init_database()
+    
+    def add_application(self, user_id, name, email):
+        """Add a new application"""
+        return self.shard_for(user_id).add_application(user_id, name, email)
+    
+    def add_applications(self, applications):
+        """Add many (user_id, name, email) applications with one transaction per shard"""
+        skipped = set()
+        for index, group in self._group(applications, key=lambda app: app[0]).items():
+            skipped |= self._shards[index].add_applications(group)
+        return skipped
+    
+    def get_application(self, user_id):
+        """Retrieve an application"""
+        return self.shard_for(user_id).get_application(user_id)
+    
+    def get_applications(self, user_ids):
+        """Retrieve many applications with bulk queries on each shard"""
+        apps = {}
+        for index, group in self._group(dict.fromkeys(user_ids)).items():
+            apps.update(self._shards[index].get_applications(group))
+        return apps
+    
+    def update_application_status(self, user_id, status):
+        """Update application status"""
+        self.shard_for(user_id).update_application_status(user_id, status)
+    
+    def transition_applications(self, user_ids, statuses, from_states=None, action=None, details=None):
+        """Move many applications through ``statuses`` with one transaction per shard"""
+        changed = set()
+        for index, group in self._group(dict.fromkeys(user_ids)).items():
+            changed |= self._shards[index].transition_applications(
+                group, statuses, from_states, action, details
+            )
+        return changed
+    
+    def save_exam_result(self, user_id, score, passed, time_taken, attempt_num, category):
+        """Save exam result; pass attempt_num=None to number it from the user's summary"""
+        return self.shard_for(user_id).save_exam_result(
+            user_id, score, passed, time_taken, attempt_num, category
+        )
+    
+    def save_exam_answers(self, result_id, answers, user_id=None):
+        """Save exam answers in the shard of the result's user"""
+        self._result_shard(user_id).save_exam_answers(result_id, answers)
+    
+    def save_exam_submission(self, user_id, score, passed, time_taken, attempt_num, category,
+                             answers, new_status=None, form_id=None):
+        """Save a graded exam, its answers and any status change with a single commit"""
+        return self.shard_for(user_id).save_exam_submission(
+            user_id, score, passed, time_taken, attempt_num, category, answers, new_status, form_id
+        )
+    
+    def get_exam_history(self, user_id):
+        """Get exam history for a user"""
+        return self.shard_for(user_id).get_exam_history(user_id)
+    
+    def get_exam_history_page(self, user_id, cursor=None, limit=None, passed=None):
+        """Get one page of a user's exam history, newest first"""
+        return self.shard_for(user_id).get_exam_history_page(user_id, cursor, limit, passed)
+    
+    def get_exam_histories(self, user_ids):
+        """Get exam history for many users with bulk queries on each shard"""
+        histories = {}
+        for index, group in self._group(dict.fromkeys(user_ids)).items():
+            histories.update(self._shards[index].get_exam_histories(group))
+        return histories
+    
+    def get_exam_answers(self, result_id, user_id=None):
+        """Get the graded answers of one exam result from the shard of its user"""
+        return self._result_shard(user_id).get_exam_answers(result_id)
+    
+    def _result_shard(self, user_id):
+        """Return the shard of a result's user; result ids alone are ambiguous"""
+        if user_id is None:
+            raise ValueError("user_id is required to find an exam result in a sharded database")
+        return self.shard_for(user_id)
+    
+    def get_exam_summary(self, user_id):
+        """Get a user's attempt count, failed count, best score and last exam date"""
+        return self.shard_for(user_id).get_exam_summary(user_id)
+    
+    def get_audit_log_page(self, user_id=None, cursor=None, limit=None, action=None):
+        """Get one page of the audit log, newest first
+        
+        A user's log is read from their shard. The whole log is merged from
+        a page of every shard, ordered by (timestamp, id), and each item
+        carries its shard number because ids repeat across shards. The
+        cursor records how far each shard has been read.
+        """
+        if user_id is not None:
+            return self.shard_for(user_id).get_audit_log_page(user_id, cursor, limit, action)
+        
+        limit = _page_size(limit)
+        positions = _decode_positions(cursor, len(self._shards))
+        pages = []
+        for index, (shard, position) in enumerate(zip(self._shards, positions)):
+            if position == "done":
+                pages.append(([], False))
+                continue
+            page = shard.get_audit_log_page(
+                None, encode_page_cursor(*position) if position else None, limit, action
+            )
+            for item in page['items']:
+                item['shard'] = index
+            pages.append((page['items'], page['next_cursor'] is not None))
+        
+        merged = heapq.merge(*(items for items, _ in pages),
+                             key=lambda item: (item['timestamp'], item['id']), reverse=True)
+        items = list(islice(merged, limit))
+        
+        taken = {}
+        for item in items:
+            taken[item['shard']] = taken.get(item['shard'], 0) + 1
+            positions[item['shard']] = [item['timestamp'], item['id']]
+        for index, (shard_items, more) in enumerate(pages):
+            if not more and taken.get(index, 0) == len(shard_items):
+                positions[index] = "done"
+        
+        next_cursor = None
+        if any(position != "done" for position in positions):
+            next_cursor = _encode_positions(positions)
+        return {"items": items, "next_cursor": next_cursor}
+    
+    def cache_stats(self):
+        """Return hit and miss counters for the read caches, summed over shards"""
+        totals = {}
+        for shard in self._shards:
+            for name, stats in shard.cache_stats().items():
+                total = totals.setdefault(name, {"hits": 0, "misses": 0, "size": 0, "maxsize": 0})
+                for counter in total:
+                    total[counter] += stats[counter]
+        for total in totals.values():
+            lookups = total['hits'] + total['misses']
+            total['hit_rate'] = total['hits'] / lookups if lookups else 0.0
+        return totals
+    
+    def log_action(self, user_id, action, details):
+        """Log an action in the user's shard"""
+        self.shard_for(user_id).log_action(user_id, action, details)
+    
+    def flush_audit_log(self):
+        """Wait until all queued audit entries are written"""
+        for shard in self._shards:
+            shard.flush_audit_log()
+    
+    def close(self):
+        """Flush the audit logs and close every shard's connections"""
+        for shard in self._shards:
+            shard.close()
+
+
+def _encode_positions(positions):
+    """Return an opaque cursor holding each shard's position in a merged page"""
+    return base64.urlsafe_b64encode(json.dumps(positions).encode("utf-8")).decode("ascii")
+
+
+def _decode_positions(cursor, count):
+    """Return the per-shard positions in a merged-page cursor; None means not started"""
+    if cursor is None:
+        return [None] * count
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid page cursor")
+    if not isinstance(positions, list) or len(positions) != count:
+        raise ValueError("Invalid page cursor")
+    return positions
+
+
+def reshard(db_path=DATABASE_PATH, old_count=DATABASE_SHARDS, new_count=1, batch_size=None):
+    """Copy a database spread over old_count shards into new_count shard files
+    
+    This is an offline tool: stop the bot first. The old files are left in
+    place but marked as resharded, so opening them fails; once the copy
+    finishes, set DATABASE_SHARDS to new_count and remove them. Exam results get new ids in their new shard and their
+    answers follow them. Item analysis aggregates are not copied; the next
+    refresh rebuilds them from the results. Partitioned audit entries are
+    copied into audit_log and re-partitioned by the next audit maintenance
+    run; archive files are left as they are. Returns the rows copied per table.
+    """
+    if old_count == new_count:
+        raise ValueError("The database already has that many shards")
+    sources = shard_paths(db_path, old_count)
+    targets = shard_paths(db_path, new_count)
+    for path in sources:
+        if not path.exists():
+            raise ValueError(f"Shard not found: {path}")
+    for path in targets:
+        if path.exists():
+            raise ValueError(f"Target shard already exists: {path}")
+    
+    batch_size = batch_size or RESHARD_BATCH_SIZE
+    copied = dict.fromkeys([*RESHARD_TABLES, "exam_results", "exam_answers"], 0)
+    source = ShardedDatabase(sources)
+    target = ShardedDatabase(targets)
+    try:
+        for shard in source.shards:
+            with shard.connection() as conn:
+                for table, columns in RESHARD_TABLES.items():
+                    copied[table] += _copy_rows(conn, target, table, columns, batch_size)
+                results, answers = _copy_results(conn, target, batch_size)
+                copied['exam_results'] += results
+                copied['exam_answers'] += answers
+        # Only a finished copy retires the old layout
+        for shard in source.shards:
+            with shard.transaction() as conn:
+                conn.execute("CREATE TABLE resharded_to (shard_count INTEGER NOT NULL, "
+                             "resharded_at TEXT DEFAULT CURRENT_TIMESTAMP)")
+                conn.execute("INSERT INTO resharded_to (shard_count) VALUES (?)", (new_count,))
+    finally:
+        source.close()
+        target.close()
+    return copied
+
+
+def _copy_rows(conn, target, table, columns, batch_size):
+    """Copy a table's rows to the target shard of their user_id, in id order"""
+    insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({_placeholders(columns)})"
+    source, order = ("audit_log_all", "ORDER BY id") if table == "audit_log" else (table, "")
+    cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {source} {order}")
+    copied = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return copied
+        for index, group in target._group(rows, key=lambda row: row[0]).items():
+            with target.shards[index].transaction() as target_conn:
+                target_conn.executemany(insert, group)
+        copied += len(rows)
+
+
+def _copy_results(conn, target, batch_size):
+    """Copy exam results, their answers and their forms, mapping each to its new id"""
+    cursor = conn.execute("""
+        SELECT id, user_id, exam_date, score, passed, time_taken_minutes, attempt_number, category,
+               form_id
+        FROM exam_results ORDER BY id
+    """)
+    results = answers = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return results, answers
+        for index, group in target._group(rows, key=lambda row: row[1]).items():
+            with target.shards[index].transaction() as target_conn:
+                new_ids = {}
+                new_forms = _copy_forms(conn, target_conn, {row[8] for row in group} - {None})
+                for row in group:
+                    new_ids[row[0]] = target_conn.execute("""
+                        INSERT INTO exam_results
+                            (user_id, exam_date, score, passed, time_taken_minutes,
+                             attempt_number, category, form_id)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (*row[1:8], new_forms.get(row[8]))).lastrowid
+                answers += _copy_answers(conn, target_conn, new_ids)
+        results += len(rows)
+
+
+def _copy_forms(conn, target_conn, form_ids):
+    """Copy the claimed forms of some results; return their new ids by old id"""
+    new_ids = {}
+    for chunk in _chunks(sorted(form_ids), IN_CLAUSE_CHUNK_SIZE):
+        for row in conn.execute(f"""
+            SELECT id, version, question_ids, created_at, claimed_at, user_id
+            FROM exam_forms WHERE id IN ({_placeholders(chunk)})
+        """, chunk):
+            new_ids[row[0]] = target_conn.execute("""
+                INSERT INTO exam_forms (version, question_ids, created_at, claimed_at, user_id)
+                VALUES (?, ?, ?, ?, ?)
+            """, row[1:]).lastrowid
+    return new_ids
+
+
+def _copy_answers(conn, target_conn, new_ids):
+    """Copy the packed and row-stored answers of some results under their new ids"""
+    copied = 0
+    for chunk in _chunks(list(new_ids), IN_CLAUSE_CHUNK_SIZE):
+        packs = conn.execute(f"""
+            SELECT result_id, question_ids, user_answers, correct_answers, correct_bitmap
+            FROM exam_answer_packs WHERE result_id IN ({_placeholders(chunk)})
+        """, chunk).fetchall()
+        target_conn.executemany("""
+            INSERT INTO exam_answer_packs
+                (result_id, question_ids, user_answers, correct_answers, correct_bitmap)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(new_ids[pack[0]], *pack[1:]) for pack in packs])
+        rows = conn.execute(f"""
+            SELECT result_id, question_id, user_answer, correct_answer, is_correct
+            FROM exam_answers WHERE result_id IN ({_placeholders(chunk)}) ORDER BY id
+        """, chunk).fetchall()
+        target_conn.executemany("""
+            INSERT INTO exam_answers (result_id, question_id, user_answer, correct_answer, is_correct)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(new_ids[row[0]], *row[1:]) for row in rows])
+        copied += len(packs) + len({row[0] for row in rows})
+    return copied
@@ -0,0 +1,32 @@
+"""
+Shared pytest fixtures for DHS IA Exam Bot tests
+"""
+
+import sys
+import os
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import database
+import sharding
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path of a fresh database file in the test's own temporary directory"""
+    return str(tmp_path / "test.db")
+
+
+@pytest.fixture(autouse=True)
+def default_database(tmp_path, monkeypatch):
+    """Open the default database in the test's temporary directory instead of data/
+    
+    Tests that build a bot, exam or manager without a database would otherwise
+    share one file across tests and runs.
+    """
+    path = tmp_path / "default" / "dhs_bot.db"
+    for function in (sharding.open_database, database.Database.__init__):
+        monkeypatch.setattr(function, "__defaults__", (path, *function.__defaults__[1:]))
+    return path
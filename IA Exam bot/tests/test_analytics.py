@@ -0,0 +1,168 @@
+"""
+Unit tests for item analysis
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import numpy as np
+from pathlib import Path
+
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from analytics import ItemAnalysis
+from database import Database
+from question_bank import QuestionBank
+from sharding import open_database
+
+# Questions 1-2 are Security Fundamentals and 3-4 Network Security; the key is always 'A'
+BANK = QuestionBank([
+    {"id": qid, "category": "Security Fundamentals" if qid <= 2 else "Network Security",
+     "difficulty": "Easy", "question": f"Question {qid}", "options": ["A) One", "B) Two"],
+     "correct_answer": "A"}
+    for qid in range(1, 5)
+])
+
+
+def _submit(db, user_id, responses, category="General"):
+    """Save a result for answers to questions 1..n, where the key is always 'A'"""
+    answers = [
+        {"question_id": qid, "user_answer": answer, "correct_answer": "A", "is_correct": answer == "A"}
+        for qid, answer in enumerate(responses, start=1)
+    ]
+    score = sum(answer['is_correct'] for answer in answers) * 100 // len(answers)
+    db.add_application(user_id, "Analytics", f"{user_id}@example.com")
+    db.save_exam_submission(user_id, score, score >= 70, 10, None, category, answers)
+    return score
+
+
+def test_item_statistics(db_path):
+    """Test p-values, discrimination and option counts match a direct computation"""
+    db = Database(db_path)
+    sheets = ["AAAA", "AAAB", "AABC", "ABCD", "BAAA", "AAAA"]
+    scores = [_submit(db, f"item{i}", sheet) for i, sheet in enumerate(sheets)]
+    
+    analysis = ItemAnalysis(db, question_bank=BANK)
+    assert analysis.refresh() == len(sheets)
+    stats = analysis.item_statistics()
+    
+    correct = np.array([[answer == "A" for answer in sheet] for sheet in sheets], dtype=float)
+    for qid in range(1, 5):
+        assert stats[qid]['responses'] == len(sheets)
+        assert abs(stats[qid]['p_value'] - correct[:, qid - 1].mean()) < 1e-9
+        expected = np.corrcoef(correct[:, qid - 1], scores)[0, 1]
+        assert abs(stats[qid]['discrimination'] - expected) < 1e-9
+    assert stats[4]['options'] == {"A": 3, "B": 1, "C": 1, "D": 1}
+    db.close()
+
+
+def test_refresh_is_incremental(db_path):
+    """Test only results past the watermark are folded in"""
+    db = Database(db_path)
+    analysis = ItemAnalysis(db, batch_size=2, question_bank=BANK)
+    for i in range(3):
+        _submit(db, f"inc{i}", "AAAA", category="Paper")
+    assert analysis.refresh() == 3
+    assert analysis.refresh() == 0
+    
+    # Row-stored answers are analysed too
+    db.answer_storage = "rows"
+    _submit(db, "inc3", "BBBB", category="Paper")
+    assert analysis.refresh() == 1
+    
+    stats = analysis.item_statistics()
+    assert stats[1]['responses'] == 4
+    assert stats[1]['p_value'] == 0.75
+    assert analysis.category_pass_rates() == {
+        "Security Fundamentals": {"attempts": 4, "passed": 3, "pass_rate": 0.75},
+        "Network Security": {"attempts": 4, "passed": 3, "pass_rate": 0.75}
+    }
+    db.close()
+
+
+def test_category_pass_rates_use_question_categories(db_path):
+    """Test each result passes or fails every question category it answered on its own"""
+    db = Database(db_path)
+    for i, sheet in enumerate(["AABB", "BBAA", "ABAA"]):
+        _submit(db, f"cat{i}", sheet)
+    _submit(db, "cat3", "AA")
+    analysis = ItemAnalysis(db, question_bank=BANK)
+    analysis.refresh()
+    assert analysis.category_pass_rates() == {
+        "Security Fundamentals": {"attempts": 4, "passed": 2, "pass_rate": 0.5},
+        "Network Security": {"attempts": 3, "passed": 2, "pass_rate": 2 / 3}
+    }
+    db.close()
+
+
+def test_category_pass_rates_with_sparse_question_ids(db_path):
+    """Test categories are found for large, scattered ids and unknown ids are ignored"""
+    sparse = {7: "Security Fundamentals", 900_000: "Network Security",
+              2_000_000_000: "Network Security"}
+    bank = QuestionBank([
+        {"id": qid, "category": category, "difficulty": "Easy", "question": f"Question {qid}",
+         "options": ["A) One", "B) Two"], "correct_answer": "A"}
+        for qid, category in sparse.items()
+    ])
+    db = Database(db_path)
+    for user_id, responses in (("sparse0", "AAAA"), ("sparse1", "ABBA")):
+        answers = [
+            {"question_id": qid, "user_answer": answer, "correct_answer": "A",
+             "is_correct": answer == "A"}
+            for qid, answer in zip([7, 900_000, 2_000_000_000, 8], responses)
+        ]
+        db.add_application(user_id, "Analytics", f"{user_id}@example.com")
+        db.save_exam_submission(user_id, 50, False, 10, None, "General", answers)
+    analysis = ItemAnalysis(db, question_bank=bank)
+    assert analysis.refresh() == 2
+    assert len(analysis._category_codes()[0]) == 3
+    assert analysis.category_pass_rates() == {
+        "Security Fundamentals": {"attempts": 2, "passed": 2, "pass_rate": 1.0},
+        "Network Security": {"attempts": 2, "passed": 1, "pass_rate": 0.5}
+    }
+    db.close()
+
+
+def test_sharded_statistics_match_single_database(tmp_path):
+    """Test aggregates kept per shard add up to the single-database figures"""
+    sheets = ["AAAA", "AAAB", "AABC", "ABCD", "BAAA", "AAAA", "ABAA", "CAAA"]
+    reports = []
+    for shards in (1, 3):
+        db = open_database(str(tmp_path / f"test{shards}.db"), shards=shards)
+        for i, sheet in enumerate(sheets):
+            _submit(db, f"shard{i}", sheet)
+        analysis = ItemAnalysis(db, question_bank=BANK)
+        assert analysis.refresh() == len(sheets)
+        reports.append((analysis.item_statistics(), analysis.category_pass_rates()))
+        db.close()
+    
+    (single, single_rates), (sharded, sharded_rates) = reports
+    assert sharded_rates == single_rates
+    for qid, item in single.items():
+        assert sharded[qid]['options'] == item['options']
+        assert abs(sharded[qid]['discrimination'] - item['discrimination']) < 1e-9
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_item_statistics(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_item_statistics passed")
+    
+    test_refresh_is_incremental(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_refresh_is_incremental passed")
+    
+    test_category_pass_rates_use_question_categories(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_category_pass_rates_use_question_categories passed")
+    
+    test_category_pass_rates_with_sparse_question_ids(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_category_pass_rates_with_sparse_question_ids passed")
+    
+    test_sharded_statistics_match_single_database(Path(tempfile.mkdtemp(dir=directory)))
+    print("✓ test_sharded_statistics_match_single_database passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll analytics tests passed!")
@@ -1,77 +1,186 @@
-"""
-Unit tests for Application Management
-"""
-
-import sys
-import os
-
-# Add src to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-from application import ApplicationManager
-
-
-def test_create_application():
-    """Test creating a new application"""
-    app_mgr = ApplicationManager()
-    result = app_mgr.create_application("user001", "John Doe", "john@example.com")
-    assert result['success'] == True
-    assert result['user_id'] == "user001"
-    app_mgr.close()
-
-
-def test_invalid_email():
-    """Test application creation with invalid email"""
-    app_mgr = ApplicationManager()
-    result = app_mgr.create_application("user002", "Jane Doe", "invalid-email")
-    assert result['success'] == False
-    app_mgr.close()
-
-
-def test_duplicate_user():
-    """Test creating duplicate application"""
-    app_mgr = ApplicationManager()
-    # Create first
-    app_mgr.create_application("user003", "Test User", "test@example.com")
-    # Try to create duplicate
-    result = app_mgr.create_application("user003", "Another User", "another@example.com")
-    assert result['success'] == False
-    app_mgr.close()
-
-
-def test_submit_application():
-    """Test submitting an application"""
-    app_mgr = ApplicationManager()
-    app_mgr.create_application("user004", "Submit Test", "submit@example.com")
-    result = app_mgr.submit_application("user004")
-    assert result['success'] == True
-    app_mgr.close()
-
-
-def test_get_application_status():
-    """Test getting application status"""
-    app_mgr = ApplicationManager()
-    app_mgr.create_application("user005", "Status Test", "status@example.com")
-    result = app_mgr.get_application_status("user005")
-    assert result['success'] == True
-    assert result['status'] == 'DRAFT'
-    app_mgr.close()
-
-
-if __name__ == "__main__":
-    test_create_application()
-    print("✓ test_create_application passed")
-    
-    test_invalid_email()
-    print("✓ test_invalid_email passed")
-    
-    test_duplicate_user()
-    print("✓ test_duplicate_user passed")
-    
-    test_submit_application()
-    print("✓ test_submit_application passed")
-    
-    test_get_application_status()
-    print("✓ test_get_application_status passed")
-    
-    print("\nAll tests passed!")
+"""
+Unit tests for Application Management
+"""
+
+import sys
+import os
+import shutil
+import csv
+import json
+import tempfile
+from pathlib import Path
+
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from application import ApplicationManager
+from database import Database
+from sharding import open_database
+
+
+def test_create_application():
+    """Test creating a new application"""
+    app_mgr = ApplicationManager()
+    result = app_mgr.create_application("user001", "John Doe", "john@example.com")
+    assert result['success'] == True
+    assert result['user_id'] == "user001"
+    app_mgr.close()
+
+
+def test_invalid_email():
+    """Test application creation with invalid email"""
+    app_mgr = ApplicationManager()
+    result = app_mgr.create_application("user002", "Jane Doe", "invalid-email")
+    assert result['success'] == False
+    app_mgr.close()
+
+
+def test_duplicate_user():
+    """Test creating duplicate application"""
+    app_mgr = ApplicationManager()
+    # Create first
+    app_mgr.create_application("user003", "Test User", "test@example.com")
+    # Try to create duplicate
+    result = app_mgr.create_application("user003", "Another User", "another@example.com")
+    assert result['success'] == False
+    app_mgr.close()
+
+
+def test_submit_application():
+    """Test submitting an application"""
+    app_mgr = ApplicationManager()
+    app_mgr.create_application("user004", "Submit Test", "submit@example.com")
+    result = app_mgr.submit_application("user004")
+    assert result['success'] == True
+    app_mgr.close()
+
+
+def test_get_application_status():
+    """Test getting application status"""
+    app_mgr = ApplicationManager()
+    app_mgr.create_application("user005", "Status Test", "status@example.com")
+    result = app_mgr.get_application_status("user005")
+    assert result['success'] == True
+    assert result['status'] == 'DRAFT'
+    app_mgr.close()
+
+
+def test_import_applications(tmp_path):
+    """Test bulk import skips bad rows, duplicates and existing users"""
+    source = os.path.join(tmp_path, "applicants.csv")
+    rejects = os.path.join(tmp_path, "rejects.csv")
+    with open(source, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["user_id", "name", "email"])
+        for i in range(25):
+            writer.writerow([f"bulk{i}", f"Bulk {i}", f"bulk{i}@example.com"])
+        writer.writerow(["bulk3", "Repeat", "repeat@example.com"])
+        writer.writerow(["bad", "Bad Email", "not-an-email"])
+        writer.writerow(["taken", "Taken", "taken@example.com"])
+    
+    app_mgr = ApplicationManager(Database(os.path.join(tmp_path, "test.db")))
+    app_mgr.create_application("taken", "Existing", "existing@example.com")
+    result = app_mgr.import_applications(source, rejects, chunk_size=10)
+    assert result['imported'] == 25
+    assert result['rejected'] == 3
+    assert app_mgr.get_application_status("bulk24")['status'] == 'DRAFT'
+    assert app_mgr.get_application("taken")['data']['name'] == "Existing"
+    with open(rejects, newline="") as handle:
+        reasons = {row['user_id']: row['reason'] for row in csv.DictReader(handle)}
+    assert reasons == {
+        "bulk3": "User already has an application",
+        "bad": "Invalid email format",
+        "taken": "User already has an application"
+    }
+    app_mgr.db.close()
+
+
+def test_import_duplicates_across_chunks(tmp_path):
+    """Test a user id repeated in a later chunk is reported without losing that chunk"""
+    source = os.path.join(tmp_path, "applicants.jsonl")
+    rejects = os.path.join(tmp_path, "rejects.csv")
+    user_ids = ["chunk0", "chunk1", "chunk0", "chunk2", "chunk3", "chunk1"]
+    with open(source, "w") as handle:
+        for user_id in user_ids:
+            handle.write(json.dumps({"user_id": user_id, "name": user_id,
+                                     "email": f"{user_id}@example.com"}) + "\n")
+    
+    for shards in (1, 2):
+        db = open_database(os.path.join(tmp_path, f"chunks{shards}.db"), shards=shards)
+        app_mgr = ApplicationManager(db)
+        result = app_mgr.import_applications(source, rejects, chunk_size=2)
+        assert result['imported'] == 4
+        assert result['rejected'] == 2
+        for user_id in ("chunk0", "chunk1", "chunk2", "chunk3"):
+            assert app_mgr.get_application(user_id)['success'] == True
+        with open(rejects, newline="") as handle:
+            assert [(row['line'], row['user_id']) for row in csv.DictReader(handle)] == [
+                ("3", "chunk0"), ("6", "chunk1")
+            ]
+        
+        # Repeats within one batch keep the first row and report the id
+        assert db.add_applications([("chunk9", "First", "first@example.com"),
+                                    ("chunk9", "Second", "second@example.com"),
+                                    ("chunk3", "Again", "again@example.com")]) == {"chunk9", "chunk3"}
+        assert db.get_application("chunk9").name == "First"
+        db.close()
+
+
+def test_bulk_review(db_path):
+    """Test bulk approve and reject only change submitted applications"""
+    app_mgr = ApplicationManager(Database(db_path))
+    for i in range(4):
+        app_mgr.create_application(f"cohort{i}", f"Cohort {i}", f"cohort{i}@example.com")
+        if i < 3:
+            app_mgr.submit_application(f"cohort{i}")
+    
+    result = app_mgr.approve_applications(["cohort0", "cohort1", "cohort3", "missing"])
+    assert result['updated'] == 2
+    assert result['results']['cohort0']['success'] == True
+    assert result['results']['cohort3']['message'] == "Cannot approve application in DRAFT state"
+    assert result['results']['missing']['message'] == "Application not found"
+    assert app_mgr.get_application_status("cohort1")['status'] == 'PENDING_EXAM'
+    
+    result = app_mgr.reject_applications(["cohort1", "cohort2"], "Cohort closed")
+    assert result['updated'] == 1
+    assert result['results']['cohort1']['success'] == False
+    assert app_mgr.get_application_status("cohort2")['status'] == 'REJECTED'
+    
+    with app_mgr.db.connection() as conn:
+        reasons = conn.execute(
+            "SELECT user_id, details FROM audit_log WHERE action = 'APPLICATION_REJECTED'"
+        ).fetchall()
+    assert reasons == [("cohort2", "Cohort closed")]
+    app_mgr.db.close()
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_create_application()
+    print("✓ test_create_application passed")
+    
+    test_invalid_email()
+    print("✓ test_invalid_email passed")
+    
+    test_duplicate_user()
+    print("✓ test_duplicate_user passed")
+    
+    test_submit_application()
+    print("✓ test_submit_application passed")
+    
+    test_get_application_status()
+    print("✓ test_get_application_status passed")
+    
+    test_import_applications(Path(tempfile.mkdtemp(dir=directory)))
+    print("✓ test_import_applications passed")
+    
+    test_import_duplicates_across_chunks(Path(tempfile.mkdtemp(dir=directory)))
+    print("✓ test_import_duplicates_across_chunks passed")
+    
+    test_bulk_review(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_bulk_review passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll tests passed!")
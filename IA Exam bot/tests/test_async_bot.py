@@ -0,0 +1,112 @@
+"""
+Unit tests for the Async DHS Bot
+"""
+
+import sys
+import os
+import shutil
+import asyncio
+import tempfile
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from async_bot import AsyncDHSBot
+from bot import DHSBot
+from database import Database
+
+
+class SlowBot:
+    """Stand-in bot whose requests take a fixed time"""
+    
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+    
+    def process_user_request(self, request_type, user_id, **kwargs):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        self.calls.append((request_type, user_id))
+        self.running -= 1
+        return {"success": True, "message": request_type}
+
+
+def test_concurrent_requests(db_path):
+    """Test many applicants are served concurrently with the usual responses"""
+    db = Database(db_path)
+    
+    async def run():
+        async with AsyncDHSBot(DHSBot(db)) as bot:
+            created = await asyncio.gather(*(
+                bot.process_user_request("create_application", f"async{i:03d}",
+                                         name="Async User", email="async@example.com")
+                for i in range(20)
+            ))
+            statuses = await asyncio.gather(*(
+                bot.process_user_request("get_status", f"async{i:03d}") for i in range(20)
+            ))
+        return created, statuses
+    
+    created, statuses = asyncio.run(run())
+    assert all(result['success'] for result in created)
+    assert all(result['status'] == 'DRAFT' for result in statuses)
+    db.close()
+
+
+def test_request_timeout():
+    """Test a request that cannot start in time is reported and never runs"""
+    slow_bot = SlowBot(0.3)
+    
+    async def run():
+        bot = AsyncDHSBot(slow_bot, max_workers=1)
+        first = asyncio.create_task(bot.process_user_request("get_status", "slow001"))
+        await asyncio.sleep(0.05)
+        second = await bot.process_user_request("get_status", "slow002", timeout=0.05)
+        await first
+        await bot.close()
+        return second
+    
+    result = asyncio.run(run())
+    assert result['success'] == False
+    assert "timed out" in result['message']
+    assert slow_bot.calls == [("get_status", "slow001")]
+
+
+def test_timed_out_request_keeps_user_lock():
+    """Test a request that times out while running still blocks the user's next one"""
+    slow_bot = SlowBot(0.3)
+    
+    async def run():
+        bot = AsyncDHSBot(slow_bot, max_workers=2)
+        first = await bot.process_user_request("submit_exam", "slow003", timeout=0.05)
+        calls_at_reply = list(slow_bot.calls)
+        second = await bot.process_user_request("get_status", "slow003")
+        await bot.close()
+        return first, calls_at_reply, second
+    
+    first, calls_at_reply, second = asyncio.run(run())
+    assert "outcome is unknown" in first['message']
+    assert calls_at_reply == []
+    assert second['success'] == True
+    assert slow_bot.max_running == 1
+    assert slow_bot.calls == [("submit_exam", "slow003"), ("get_status", "slow003")]
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_concurrent_requests(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_concurrent_requests passed")
+    
+    test_request_timeout()
+    print("✓ test_request_timeout passed")
+    
+    test_timed_out_request_keeps_user_lock()
+    print("✓ test_timed_out_request_keeps_user_lock passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll async bot tests passed!")
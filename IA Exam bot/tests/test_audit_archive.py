@@ -0,0 +1,173 @@
+"""
+Unit tests for audit log partitioning and archival
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import audit_archive
+from audit_archive import AuditLogArchiver, read_audit_archive
+from database import Database
+from sharding import open_database
+
+NOW = datetime(2026, 10, 15, tzinfo=timezone.utc)
+
+
+def _database_with_history(db):
+    """Add two entries a month from 2025-08 to 2026-10 for two users"""
+    for shard in db.shards:
+        shard.init_database()
+    for month in range(15):
+        year, index = divmod(2025 * 12 + 7 + month, 12)
+        timestamp = f"{year:04d}-{index + 1:02d}-10 12:00:00"
+        for user_id in ("hist1", "hist2"):
+            with db.shard_for(user_id).transaction() as conn:
+                conn.execute("""
+                    INSERT INTO audit_log (user_id, action, timestamp, details)
+                    VALUES (?, 'NOTE', ?, ?)
+                """, (user_id, timestamp, f"{user_id} {timestamp[:7]}"))
+    return db
+
+
+def _all_pages(db, **filters):
+    """Read every page of the audit log"""
+    items = []
+    cursor = None
+    while True:
+        page = db.get_audit_log_page(cursor=cursor, limit=7, **filters)
+        items.extend(page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return items
+
+
+def test_partitions_keep_hot_table_small(db_path):
+    """Test old months move to partitions and reads still see every entry"""
+    db = _database_with_history(Database(db_path))
+    before = _all_pages(db)
+    archiver = AuditLogArchiver(db, {"archive_after_months": 24})
+    
+    result = archiver.run(NOW)
+    assert result['moved'] == 28
+    assert result['archived_partitions'] == 0
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0] == 2
+    assert len(archiver.partitions()) == 14
+    assert _all_pages(db) == before
+    assert [item['details'] for item in _all_pages(db, user_id="hist1")][:2] == [
+        "hist1 2026-10", "hist1 2026-09"
+    ]
+    
+    # Running again has nothing left to move
+    assert archiver.run(NOW)['moved'] == 0
+    db.close()
+
+
+def test_old_partitions_are_archived_and_expired(tmp_path):
+    """Test partitions past retention become gzip files and expire later"""
+    db = _database_with_history(Database(os.path.join(tmp_path, "test.db")))
+    archiver = AuditLogArchiver(db, {"archive_after_months": 6, "delete_after_months": 12})
+    
+    result = archiver.run(NOW)
+    assert result['archived_partitions'] == 8
+    assert result['archived_rows'] == 16
+    assert result['deleted_archives'] == 2
+    assert len(_all_pages(db)) == 14
+    
+    archived = [p for p in archiver.partitions() if p['archive_path']]
+    assert [p['period'] for p in archived] == [f"2025-{m:02d}" for m in (10, 11, 12)] + [
+        f"2026-{m:02d}" for m in (1, 2, 3)
+    ]
+    entries = list(read_audit_archive(archived[0]['archive_path']))
+    assert [entry['details'] for entry in entries] == ["hist1 2025-10", "hist2 2025-10"]
+    assert not os.path.exists(os.path.join(tmp_path, "audit_archive", "test.audit_log_p202508.jsonl.gz"))
+    
+    # A late entry for an archived month is appended to its archive
+    with db.transaction() as conn:
+        conn.execute("""
+            INSERT INTO audit_log (user_id, action, timestamp, details)
+            VALUES ('hist1', 'NOTE', '2025-10-20 08:00:00', 'late')
+        """)
+    archiver.run(NOW)
+    entries = list(read_audit_archive(archived[0]['archive_path']))
+    assert [entry['details'] for entry in entries][-1] == "late"
+    db.close()
+
+
+def _archive_with_crash(archiver, now):
+    """Run the archive step, failing after the file is written but before the table is dropped"""
+    rebuild_view = audit_archive._rebuild_view
+    
+    def crash(conn):
+        raise RuntimeError("crashed")
+    
+    audit_archive._rebuild_view = crash
+    try:
+        archiver.run(now)
+        assert False, "the archive step should have failed"
+    except RuntimeError:
+        pass
+    finally:
+        audit_archive._rebuild_view = rebuild_view
+
+
+def test_interrupted_archive_is_not_duplicated(db_path):
+    """Test re-running after a crash between writing an archive and dropping its table"""
+    db = _database_with_history(Database(db_path))
+    AuditLogArchiver(db, {"archive_after_months": 24}).run(NOW)
+    archiver = AuditLogArchiver(db, {"archive_after_months": 13})
+    
+    _archive_with_crash(archiver, NOW)
+    assert archiver.run(NOW)['archived_rows'] == 2
+    archived = [p for p in archiver.partitions() if p['archive_path']]
+    entries = list(read_audit_archive(archived[0]['archive_path']))
+    assert [entry['details'] for entry in entries] == ["hist1 2025-08", "hist2 2025-08"]
+    
+    # The same holds for late entries appended to an existing archive
+    with db.transaction() as conn:
+        conn.execute("""
+            INSERT INTO audit_log (user_id, action, timestamp, details)
+            VALUES ('hist1', 'NOTE', '2025-08-20 08:00:00', 'late')
+        """)
+    AuditLogArchiver(db, {"archive_after_months": 24}).run(NOW)
+    _archive_with_crash(archiver, NOW)
+    archiver.run(NOW)
+    entries = list(read_audit_archive(archived[0]['archive_path']))
+    assert [entry['details'] for entry in entries] == ["hist1 2025-08", "hist2 2025-08", "late"]
+    db.close()
+
+
+def test_sharded_audit_log_partitions(db_path):
+    """Test every shard is partitioned and merged pages still cover all entries"""
+    db = _database_with_history(open_database(db_path, shards=2))
+    before = sorted((item['shard'], item['id']) for item in _all_pages(db))
+    assert AuditLogArchiver(db, {"archive_after_months": 24}).run(NOW)['moved'] == 28
+    assert sorted((item['shard'], item['id']) for item in _all_pages(db)) == before
+    db.close()
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_partitions_keep_hot_table_small(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_partitions_keep_hot_table_small passed")
+    
+    test_old_partitions_are_archived_and_expired(Path(tempfile.mkdtemp(dir=directory)))
+    print("✓ test_old_partitions_are_archived_and_expired passed")
+    
+    test_interrupted_archive_is_not_duplicated(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_interrupted_archive_is_not_duplicated passed")
+    
+    test_sharded_audit_log_partitions(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_sharded_audit_log_partitions passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll audit archive tests passed!")
@@ -1,67 +1,151 @@
-"""
-Unit tests for DHS Bot
-"""
-
-import sys
-import os
-
-# Add src to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-from bot import DHSBot
-
-
-def test_bot_initialization():
-    """Test bot initialization"""
-    bot = DHSBot()
-    assert bot is not None
-    assert bot.app_manager is not None
-    assert bot.exam is not None
-    bot.close()
-
-
-def test_process_create_application():
-    """Test bot processing create application request"""
-    bot = DHSBot()
-    result = bot.process_user_request(
-        "create_application", 
-        "bot_user001",
-        name="Bot Test User",
-        email="bottest@example.com"
-    )
-    assert result['success'] == True
-    bot.close()
-
-
-def test_process_unknown_request():
-    """Test bot processing unknown request"""
-    bot = DHSBot()
-    result = bot.process_user_request("unknown_request", "user001")
-    assert result['success'] == False
-    assert "Unknown" in result['message']
-    bot.close()
-
-
-def test_get_bot_help():
-    """Test getting bot help"""
-    bot = DHSBot()
-    help_info = bot.get_bot_help()
-    assert 'commands' in help_info
-    assert 'create_application' in help_info['commands']
-    bot.close()
-
-
-if __name__ == "__main__":
-    test_bot_initialization()
-    print("✓ test_bot_initialization passed")
-    
-    test_process_create_application()
-    print("✓ test_process_create_application passed")
-    
-    test_process_unknown_request()
-    print("✓ test_process_unknown_request passed")
-    
-    test_get_bot_help()
-    print("✓ test_get_bot_help passed")
-    
-    print("\nAll bot tests passed!")
+"""
+Unit tests for DHS Bot
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bot import DHSBot
+from database import Database
+
+
+def test_bot_initialization():
+    """Test bot initialization"""
+    bot = DHSBot()
+    assert bot is not None
+    assert bot.app_manager is not None
+    assert bot.exam is not None
+    bot.close()
+
+
+def test_bot_shares_database():
+    """Test the managers share the bot's database pool"""
+    bot = DHSBot()
+    assert bot.app_manager.db is bot.db
+    assert bot.exam.db is bot.db
+    bot.close()
+
+
+def test_process_create_application():
+    """Test bot processing create application request"""
+    bot = DHSBot()
+    result = bot.process_user_request(
+        "create_application", 
+        "bot_user001",
+        name="Bot Test User",
+        email="bottest@example.com"
+    )
+    assert result['success'] == True
+    bot.close()
+
+
+def test_process_unknown_request():
+    """Test bot processing unknown request"""
+    bot = DHSBot()
+    result = bot.process_user_request("unknown_request", "user001")
+    assert result['success'] == False
+    assert "Unknown" in result['message']
+    bot.close()
+
+
+def test_get_bot_help():
+    """Test getting bot help"""
+    bot = DHSBot()
+    help_info = bot.get_bot_help()
+    assert 'commands' in help_info
+    assert 'create_application' in help_info['commands']
+    bot.close()
+
+
+def test_process_batch(db_path):
+    """Test a mixed batch is answered in input order with bulk reads"""
+    db = Database(db_path)
+    bot = DHSBot(db)
+    creates = [
+        {"request_type": "create_application", "user_id": f"batch{i:02d}",
+         "name": "Batch User", "email": "batch@example.com"}
+        for i in range(5)
+    ]
+    results = bot.process_batch(creates + [
+        {"request_type": "create_application", "user_id": "batch00",
+         "name": "Duplicate", "email": "dup@example.com"},
+        {"request_type": "unknown_request", "user_id": "batch01"},
+        {"request_type": "submit_application", "user_id": "batch01"}
+    ])
+    assert [r['success'] for r in results] == [True] * 5 + [False, False, True]
+    
+    statuses = bot.process_batch([
+        {"request_type": "get_status", "user_id": f"batch{i:02d}"} for i in range(5)
+    ] + [{"request_type": "get_status", "user_id": "missing"}])
+    assert [r.get('status') for r in statuses] == ['DRAFT', 'SUBMITTED', 'DRAFT', 'DRAFT', 'DRAFT', None]
+    assert db.cache_stats()['applications']['hits'] >= 6
+    bot.close()
+    db.close()
+
+
+def test_paged_requests(db_path):
+    """Test exam results and audit trail pages walk every row once"""
+    db = Database(db_path)
+    bot = DHSBot(db)
+    bot.process_user_request("create_application", "pager", name="Pager", email="pager@example.com")
+    for attempt in range(5):
+        db.save_exam_result("pager", 50 + attempt * 10, attempt >= 2, 10, None, "General")
+    
+    seen = []
+    cursor = None
+    while True:
+        page = bot.process_user_request("get_exam_results_page", "pager", cursor=cursor, limit=2)
+        assert page['success'] == True
+        seen.extend(result['score'] for result in page['results'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == [90, 80, 70, 60, 50]
+    
+    failed = bot.process_user_request("get_exam_results_page", "pager", status="failed")
+    assert [result['score'] for result in failed['results']] == [60, 50]
+    
+    trail = bot.process_user_request("get_audit_trail", "pager", action="EXAM_COMPLETED", limit=3)
+    assert len(trail['entries']) == 3
+    assert trail['next_cursor'] is not None
+    rest = bot.process_user_request("get_audit_trail", "pager", action="EXAM_COMPLETED",
+                                    cursor=trail['next_cursor'])
+    assert len(rest['entries']) == 2 and rest['next_cursor'] is None
+    
+    bad = bot.process_user_request("get_audit_trail", "pager", cursor="not-a-cursor")
+    assert bad['success'] == False
+    bot.close()
+    db.close()
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_bot_initialization()
+    print("✓ test_bot_initialization passed")
+    
+    test_bot_shares_database()
+    print("✓ test_bot_shares_database passed")
+    
+    test_process_create_application()
+    print("✓ test_process_create_application passed")
+    
+    test_process_unknown_request()
+    print("✓ test_process_unknown_request passed")
+    
+    test_get_bot_help()
+    print("✓ test_get_bot_help passed")
+    
+    test_process_batch(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_process_batch passed")
+    
+    test_paged_requests(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_paged_requests passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll bot tests passed!")
@@ -0,0 +1,291 @@
+"""
+Unit tests for Database operations
+"""
+
+import sys
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from audit import AuditLogWriter
+from database import Database, SCHEMA_VERSION
+from metrics import METRICS
+
+
+def test_pool_uses_wal_journal(db_path):
+    """Test pooled connections are configured for WAL"""
+    db = Database(db_path)
+    with db.pool.connection() as conn:
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    assert mode == "wal"
+    assert synchronous == 1  # NORMAL
+    db.close()
+
+
+def test_concurrent_writers(db_path):
+    """Test the pool can be shared across threads"""
+    db = Database(db_path, pool_size=3)
+    errors = []
+    
+    def worker(n):
+        try:
+            for i in range(10):
+                db.add_application(f"thread{n}_{i}", "Thread User", "thread@example.com")
+        except Exception as exc:
+            errors.append(exc)
+    
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    assert db.get_application("thread5_9") is not None
+    db.close()
+
+
+def test_failed_insert_releases_lock(db_path):
+    """Test a duplicate insert does not leave a write lock behind"""
+    db = Database(db_path)
+    assert db.add_application("dup001", "First", "first@example.com") == True
+    assert db.add_application("dup001", "Second", "second@example.com") == False
+    db.update_application_status("dup001", "SUBMITTED")
+    assert db.get_application("dup001").status == 'SUBMITTED'
+    db.close()
+
+
+def test_save_exam_submission(db_path):
+    """Test a submission writes result, answers, status and audit in one transaction"""
+    db = Database(db_path)
+    db.add_application("sub001", "Submitter", "sub@example.com")
+    answers = [
+        {"question_id": 1, "user_answer": "B", "correct_answer": "B", "is_correct": True},
+        {"question_id": 2, "user_answer": "A", "correct_answer": "B", "is_correct": False}
+    ]
+    result_id = db.save_exam_submission("sub001", 50, False, 10, 1, "General", answers,
+                                        new_status="PENDING_EXAM")
+    
+    db.flush_audit_log()
+    with db.pool.connection() as conn:
+        actions = [row[0] for row in conn.execute(
+            "SELECT action FROM audit_log WHERE user_id = ? ORDER BY id", ("sub001",))]
+    assert [dict(answer.to_dict(), result_id=None) for answer in db.get_exam_answers(result_id)] == [
+        dict(answer, result_id=None) for answer in answers
+    ]
+    assert sorted(actions) == ["APPLICATION_CREATED", "EXAM_COMPLETED", "STATUS_UPDATED"]
+    assert db.get_application("sub001").status == 'PENDING_EXAM'
+    db.close()
+
+
+def test_failed_submission_rolls_back(db_path):
+    """Test a submission that fails midway leaves no partial result"""
+    db = Database(db_path)
+    db.add_application("sub002", "Submitter", "sub2@example.com")
+    try:
+        db.save_exam_submission("sub002", 100, True, 5, 1, "General", [{"question_id": 1}])
+    except KeyError:
+        pass
+    assert db.get_exam_history("sub002") == []
+    db.close()
+
+
+def test_migrates_legacy_database(db_path):
+    """Test an unversioned database is upgraded in place"""
+    legacy = sqlite3.connect(db_path)
+    legacy.execute("""
+        CREATE TABLE exam_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL,
+            exam_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP, score INTEGER, passed BOOLEAN,
+            time_taken_minutes INTEGER, attempt_number INTEGER, category TEXT
+        )
+    """)
+    legacy.execute("INSERT INTO exam_results (user_id, score, passed) VALUES ('legacy', 80, 1)")
+    legacy.commit()
+    legacy.close()
+    
+    db = Database(db_path)
+    with db.pool.connection() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        plan = " ".join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM exam_results WHERE user_id = ? ORDER BY exam_date DESC",
+            ("legacy",)))
+    assert version == SCHEMA_VERSION
+    assert "idx_exam_results_user_date" in plan
+    assert len(db.get_exam_history("legacy")) == 1
+    assert db.get_exam_summary("legacy")['attempt_count'] == 1
+    db.close()
+
+
+def test_audit_log_batches_async_entries(db_path):
+    """Test async audit entries are written in the background and flushed on close"""
+    db = Database(db_path)
+    for i in range(25):
+        db.log_action(f"audit{i:03d}", "STATUS_UPDATED", "Status changed to SUBMITTED")
+    db.log_action("audit999", "APPLICATION_REJECTED", "Incomplete documents")
+    
+    # Sync actions are written before log_action returns
+    with db.pool.connection() as conn:
+        rejected = conn.execute(
+            "SELECT COUNT(*) FROM audit_log WHERE action = 'APPLICATION_REJECTED'").fetchone()[0]
+    assert rejected == 1
+    db.close()
+    
+    db = Database(db_path)
+    with db.pool.connection() as conn:
+        total = conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0]
+    assert total == 26
+    db.close()
+
+
+def test_full_audit_queue_does_not_hold_a_connection(db_path):
+    """Test a writer blocked on a full audit queue leaves the pool to the audit writer"""
+    db = Database(db_path, pool_size=1)
+    db.audit = AuditLogWriter(db.pool, {"queue_size": 2, "batch_size": 2})
+    for i in range(20):
+        db.add_application(f"queue{i:03d}", "Queue", "queue@example.com")
+    db.flush_audit_log()
+    assert db.audit.dropped == 0
+    with db.pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0] == 20
+    db.close()
+
+
+def test_failed_audit_batch_is_counted_and_flush_returns(db_path):
+    """Test a batch that cannot be written is dropped without stopping the writer"""
+    db = Database(db_path)
+    db.init_database()
+    dropped_before = METRICS.snapshot()['audit_dropped']
+    # A row with a missing column fails with ProgrammingError, not a busy error
+    db.audit.submit([("bad001", "NOTE", "2026-01-01 00:00:00")])
+    flushed = threading.Thread(target=db.flush_audit_log)
+    flushed.start()
+    flushed.join(timeout=10)
+    assert not flushed.is_alive()
+    assert db.audit.dropped == 1
+    assert METRICS.snapshot()['audit_dropped'] == dropped_before + 1
+    
+    # The writer is still running
+    db.log_action("good001", "NOTE", "written")
+    db.flush_audit_log()
+    with db.pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0] == 1
+    db.close()
+
+
+def test_read_cache_hits_and_invalidation(db_path):
+    """Test repeated reads are cached and writes invalidate them"""
+    db = Database(db_path)
+    assert db.get_application("cache001") is None
+    db.add_application("cache001", "Cached", "cache@example.com")
+    assert db.get_application("cache001").status == 'DRAFT'
+    assert db.get_application("cache001").status == 'DRAFT'
+    
+    db.update_application_status("cache001", "SUBMITTED")
+    assert db.get_application("cache001").status == 'SUBMITTED'
+    
+    assert db.get_exam_history("cache001") == []
+    db.save_exam_result("cache001", 90, True, 12, 1, "General")
+    assert len(db.get_exam_history("cache001")) == 1
+    
+    stats = db.cache_stats()
+    assert stats['applications']['hits'] == 1
+    assert stats['applications']['misses'] == 3
+    assert stats['exam_history']['misses'] == 2
+    db.close()
+
+
+def test_exam_summary_tracks_attempts(db_path):
+    """Test the summary numbers attempts and counts failures as results are saved"""
+    db = Database(db_path)
+    db.add_application("summary001", "Summary", "summary@example.com")
+    db.save_exam_submission("summary001", 40, False, 30, None, "General", [])
+    db.save_exam_submission("summary001", 85, True, 25, None, "General", [])
+    db.save_exam_submission("summary001", 60, False, 20, None, "General", [])
+    
+    summary = db.get_exam_summary("summary001")
+    assert summary['attempt_count'] == 3
+    assert summary['failed_count'] == 2
+    assert summary['best_score'] == 85
+    assert sorted(r.attempt_number for r in db.get_exam_history("summary001")) == [1, 2, 3]
+    assert db.get_exam_summary("nobody") is None
+    db.close()
+
+
+def test_answer_storage_modes(db_path):
+    """Test packed and per-row answer storage read back the same answers"""
+    answers = [
+        {"question_id": qid, "user_answer": "ABCD"[qid % 4], "correct_answer": "B",
+         "is_correct": qid % 4 == 1}
+        for qid in range(1, 51)
+    ]
+    for storage in ("packed", "rows"):
+        db = Database(db_path, answer_storage=storage)
+        db.add_application(storage, "Storage", "storage@example.com")
+        result_id = db.save_exam_submission(storage, 24, False, 10, None, "General", answers)
+        stored = db.get_exam_answers(result_id)
+        assert [answer.question_id for answer in stored] == list(range(1, 51))
+        assert [answer.is_correct for answer in stored] == [a['is_correct'] for a in answers]
+        assert stored[2].user_answer == "D" and stored[2].correct_answer == "B"
+        db.close()
+    
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM exam_answer_packs").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM exam_answers").fetchone()[0] == 50
+    
+    # Answers that are not a single character are kept row by row
+    db = Database(db_path)
+    result_id = db.save_exam_submission("packed", 0, False, 10, None, "General", [
+        {"question_id": 1, "user_answer": "", "correct_answer": "B", "is_correct": False}
+    ])
+    assert db.get_exam_answers(result_id)[0].user_answer == ""
+    db.close()
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_pool_uses_wal_journal(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_pool_uses_wal_journal passed")
+    
+    test_concurrent_writers(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_concurrent_writers passed")
+    
+    test_failed_insert_releases_lock(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_failed_insert_releases_lock passed")
+    
+    test_save_exam_submission(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_save_exam_submission passed")
+    
+    test_failed_submission_rolls_back(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_failed_submission_rolls_back passed")
+    
+    test_migrates_legacy_database(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_migrates_legacy_database passed")
+    
+    test_audit_log_batches_async_entries(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_audit_log_batches_async_entries passed")
+    
+    test_full_audit_queue_does_not_hold_a_connection(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_full_audit_queue_does_not_hold_a_connection passed")
+    
+    test_failed_audit_batch_is_counted_and_flush_returns(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_failed_audit_batch_is_counted_and_flush_returns passed")
+    
+    test_read_cache_hits_and_invalidation(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_read_cache_hits_and_invalidation passed")
+    
+    test_exam_summary_tracks_attempts(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_exam_summary_tracks_attempts passed")
+    
+    test_answer_storage_modes(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_answer_storage_modes passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll database tests passed!")
@@ -1,95 +1,222 @@
-"""
-Unit tests for IA Exam
-"""
-
-import sys
-import os
-
-# Add src to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-from exam import IAExam
-from application import ApplicationManager
-
-
-def test_start_exam():
-    """Test starting an exam"""
-    # First create and approve an application
-    app_mgr = ApplicationManager()
-    app_mgr.create_application("exam_user001", "Exam Test", "exam@example.com")
-    app_mgr.submit_application("exam_user001")
-    app_mgr.approve_application("exam_user001")
-    
-    # Now start exam
-    exam = IAExam()
-    result = exam.start_exam("exam_user001")
-    assert result['success'] == True
-    assert 'exam_session' in result
-    
-    exam.close()
-    app_mgr.close()
-
-
-def test_submit_exam():
-    """Test submitting exam answers"""
-    # Setup
-    app_mgr = ApplicationManager()
-    app_mgr.create_application("exam_user002", "Submit Exam Test", "examsubmit@example.com")
-    app_mgr.submit_application("exam_user002")
-    app_mgr.approve_application("exam_user002")
-    
-    exam = IAExam()
-    
-    # Submit answers
-    answers = [
-        {"question_id": 1, "answer": "B"},
-        {"question_id": 2, "answer": "B"},
-        {"question_id": 3, "answer": "C"}
-    ]
-    
-    result = exam.submit_exam("exam_user002", answers)
-    assert result['success'] == True
-    assert 'score' in result
-    
-    exam.close()
-    app_mgr.close()
-
-
-def test_get_exam_results():
-    """Test retrieving exam results"""
-    # Setup
-    app_mgr = ApplicationManager()
-    app_mgr.create_application("exam_user003", "Results Test", "results@example.com")
-    app_mgr.submit_application("exam_user003")
-    app_mgr.approve_application("exam_user003")
-    
-    exam = IAExam()
-    
-    # Submit exam first
-    answers = [
-        {"question_id": 1, "answer": "B"},
-        {"question_id": 2, "answer": "B"}
-    ]
-    exam.submit_exam("exam_user003", answers)
-    
-    # Get results
-    result = exam.get_exam_results("exam_user003")
-    assert result['success'] == True
-    assert 'results' in result
-    assert len(result['results']) > 0
-    
-    exam.close()
-    app_mgr.close()
-
-
-if __name__ == "__main__":
-    test_start_exam()
-    print("✓ test_start_exam passed")
-    
-    test_submit_exam()
-    print("✓ test_submit_exam passed")
-    
-    test_get_exam_results()
-    print("✓ test_get_exam_results passed")
-    
-    print("\nAll exam tests passed!")
+"""
+Unit tests for IA Exam
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from exam import IAExam
+from application import ApplicationManager
+from database import Database
+from config.settings import IA_EXAM_CONFIG
+
+
+def test_start_exam():
+    """Test starting an exam"""
+    # First create and approve an application
+    app_mgr = ApplicationManager()
+    app_mgr.create_application("exam_user001", "Exam Test", "exam@example.com")
+    app_mgr.submit_application("exam_user001")
+    app_mgr.approve_application("exam_user001")
+    
+    # Now start exam
+    exam = IAExam()
+    result = exam.start_exam("exam_user001")
+    assert result['success'] == True
+    assert 'exam_session' in result
+    
+    exam.close()
+    app_mgr.close()
+
+
+def test_submit_exam():
+    """Test submitting exam answers"""
+    # Setup
+    app_mgr = ApplicationManager()
+    app_mgr.create_application("exam_user002", "Submit Exam Test", "examsubmit@example.com")
+    app_mgr.submit_application("exam_user002")
+    app_mgr.approve_application("exam_user002")
+    
+    exam = IAExam()
+    exam.start_exam("exam_user002")
+    
+    # Submit answers
+    answers = [
+        {"question_id": 1, "answer": "B"},
+        {"question_id": 2, "answer": "B"},
+        {"question_id": 3, "answer": "C"}
+    ]
+    
+    result = exam.submit_exam("exam_user002", answers)
+    assert result['success'] == True
+    assert 'score' in result
+    
+    exam.close()
+    app_mgr.close()
+
+
+def test_get_exam_results():
+    """Test retrieving exam results"""
+    # Setup
+    app_mgr = ApplicationManager()
+    app_mgr.create_application("exam_user003", "Results Test", "results@example.com")
+    app_mgr.submit_application("exam_user003")
+    app_mgr.approve_application("exam_user003")
+    
+    exam = IAExam()
+    
+    # Submit exam first
+    exam.start_exam("exam_user003")
+    answers = [
+        {"question_id": 1, "answer": "B"},
+        {"question_id": 2, "answer": "B"}
+    ]
+    exam.submit_exam("exam_user003", answers)
+    
+    # Get results
+    result = exam.get_exam_results("exam_user003")
+    assert result['success'] == True
+    assert 'results' in result
+    assert len(result['results']) > 0
+    
+    exam.close()
+    app_mgr.close()
+
+
+def test_submit_requires_session():
+    """Test answers are only accepted for questions served in an active session"""
+    app_mgr = ApplicationManager()
+    app_mgr.create_application("exam_user004", "Session Test", "session@example.com")
+    app_mgr.submit_application("exam_user004")
+    app_mgr.approve_application("exam_user004")
+    
+    exam = IAExam()
+    result = exam.submit_exam("exam_user004", [{"question_id": 1, "answer": "B"}])
+    assert result['success'] == False
+    
+    session = exam.start_exam("exam_user004")['exam_session']
+    served = session['questions'][0]
+    result = exam.submit_exam("exam_user004", [
+        {"question_id": served['id'], "answer": served['correct_answer']},
+        {"question_id": served['id'], "answer": "Z"},
+        {"question_id": 999999, "answer": "A"}
+    ])
+    assert result['success'] == True
+    assert result['total_questions'] == 1
+    assert result['score'] == 100
+    
+    # The session is closed once the exam is submitted
+    result = exam.submit_exam("exam_user004", [{"question_id": served['id'], "answer": "B"}])
+    assert result['success'] == False
+    
+    exam.close()
+    app_mgr.close()
+
+
+def test_grade_answer_sheets(db_path):
+    """Test offline answer sheets are graded together and recorded"""
+    app_mgr = ApplicationManager(Database(db_path))
+    for user_id in ("exam_user005", "exam_user006", "exam_user007", "exam_user008"):
+        app_mgr.create_application(user_id, "Paper Sitting", f"{user_id}@example.com")
+        app_mgr.approve_application(user_id)
+    
+    exam = IAExam(db=app_mgr.db)
+    questions = [exam.question_bank.get(qid) for qid in (1, 2, 3)]
+    result = exam.grade_answer_sheets([
+        {"user_id": "exam_user005", "time_taken": 60,
+         "answers": [{"question_id": q['id'], "answer": q['correct_answer']} for q in questions]},
+        {"user_id": "exam_user006",
+         "answers": [{"question_id": q['id'], "answer": "Z"} for q in questions]},
+        {"user_id": "exam_user007", "question_ids": [1, 2],
+         "answers": [{"question_id": q['id'], "answer": q['correct_answer']} for q in questions]},
+        {"user_id": "exam_user008", "question_ids": [1, 999],
+         "answers": [{"question_id": 1, "answer": "A"}]},
+        {"user_id": "exam_missing", "answers": []}
+    ])
+    assert result['graded'] == 3
+    assert result['results']['exam_user005']['score'] == 100
+    assert result['results']['exam_user006']['passed'] == False
+    assert result['results']['exam_user007']['total_questions'] == 2
+    assert result['results']['exam_user008']['success'] == False
+    assert result['results']['exam_missing']['success'] == False
+    assert app_mgr.get_application_status("exam_user005")['status'] == 'APPROVED'
+    assert len(exam.get_exam_results("exam_user006")['results']) == 1
+    
+    exam.close()
+    app_mgr.db.close()
+
+
+def test_grade_answer_sheets_rejects_duplicate_users(db_path):
+    """Test a user with two answer sheets gets neither graded"""
+    app_mgr = ApplicationManager(Database(db_path))
+    for user_id in ("twice", "once"):
+        app_mgr.create_application(user_id, "Paper Sitting", f"{user_id}@example.com")
+        app_mgr.approve_application(user_id)
+    
+    exam = IAExam(db=app_mgr.db)
+    answers = [{"question_id": 1, "answer": exam.question_bank.get(1)['correct_answer']}]
+    result = exam.grade_answer_sheets([
+        {"user_id": "twice", "answers": answers},
+        {"user_id": "once", "answers": answers},
+        {"user_id": "twice", "answers": [{"question_id": 1, "answer": "Z"}]}
+    ])
+    assert result['graded'] == 1
+    assert result['results']['twice']['success'] == False
+    assert result['results']['once']['success'] == True
+    assert exam.get_exam_results("twice")['success'] == False
+    
+    exam.close()
+    app_mgr.db.close()
+
+
+def test_grade_answer_sheets_enforces_max_attempts(db_path):
+    """Test answer sheets stop being graded once a user is out of attempts"""
+    app_mgr = ApplicationManager(Database(db_path))
+    app_mgr.create_application("retaker", "Paper Sitting", "retaker@example.com")
+    app_mgr.approve_application("retaker")
+    
+    exam = IAExam(db=app_mgr.db)
+    sheet = {"user_id": "retaker", "answers": [{"question_id": 1, "answer": "Z"}]}
+    for _ in range(IA_EXAM_CONFIG['max_attempts']):
+        assert exam.grade_answer_sheets([sheet])['graded'] == 1
+    result = exam.grade_answer_sheets([sheet])
+    assert result['graded'] == 0
+    assert result['results']['retaker']['message'] == "Maximum exam attempts exceeded"
+    assert exam.start_exam("retaker")['message'] == "Maximum exam attempts exceeded"
+    assert len(exam.get_exam_results("retaker")['results']) == IA_EXAM_CONFIG['max_attempts']
+    
+    exam.close()
+    app_mgr.db.close()
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_start_exam()
+    print("✓ test_start_exam passed")
+    
+    test_submit_exam()
+    print("✓ test_submit_exam passed")
+    
+    test_get_exam_results()
+    print("✓ test_get_exam_results passed")
+    
+    test_submit_requires_session()
+    print("✓ test_submit_requires_session passed")
+    
+    test_grade_answer_sheets(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_grade_answer_sheets passed")
+    
+    test_grade_answer_sheets_rejects_duplicate_users(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_grade_answer_sheets_rejects_duplicate_users passed")
+    
+    test_grade_answer_sheets_enforces_max_attempts(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_grade_answer_sheets_enforces_max_attempts passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll exam tests passed!")
@@ -0,0 +1,147 @@
+"""
+Unit tests for streaming export
+"""
+
+import sys
+import os
+import shutil
+import csv
+import json
+import tempfile
+from pathlib import Path
+
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database import Database
+from export import export_table, last_exported_id, last_exported_position
+from sharding import open_database
+
+
+def _database_with_results(directory, count):
+    """Return a database holding one exam result per applicant"""
+    db = Database(os.path.join(directory, "test.db"))
+    for i in range(count):
+        user_id = f"export{i}"
+        db.add_application(user_id, "Export", f"{user_id}@example.com")
+        if i % 2:
+            db.update_application_status(user_id, "PENDING_EXAM")
+        db.save_exam_submission(user_id, 80, True, 10, None, "General", [
+            {"question_id": 1, "user_answer": "A", "correct_answer": "A", "is_correct": True},
+            {"question_id": 2, "user_answer": "B", "correct_answer": "C", "is_correct": False}
+        ])
+    return db
+
+
+def test_export_pages_and_filters(tmp_path):
+    """Test every row is exported across pages and filters apply"""
+    db = _database_with_results(tmp_path, 7)
+    path = os.path.join(tmp_path, "results.csv")
+    result = export_table(db, "exam_results", path, page_size=3)
+    assert result['rows'] == 7
+    with open(path, newline="") as handle:
+        rows = list(csv.DictReader(handle))
+    assert [row['user_id'] for row in rows] == [f"export{i}" for i in range(7)]
+    
+    path = os.path.join(tmp_path, "answers.jsonl")
+    result = export_table(db, "exam_answers", path, status="PENDING_EXAM", page_size=2)
+    with open(path) as handle:
+        answers = [json.loads(line) for line in handle]
+    assert result['rows'] == 6
+    assert answers[1] == {"result_id": 2, "question_id": 2, "user_answer": "B",
+                          "correct_answer": "C", "is_correct": False}
+    
+    result = export_table(db, "exam_results", os.path.join(tmp_path, "none.csv"),
+                          since="2999-01-01")
+    assert result['rows'] == 0
+    db.close()
+
+
+def test_export_resumes_after_last_id(tmp_path):
+    """Test an interrupted export continues from the last whole row"""
+    db = _database_with_results(tmp_path, 5)
+    path = os.path.join(tmp_path, "results.jsonl")
+    export_table(db, "exam_results", path)
+    
+    # Simulate an export cut off after the second row, mid-way through the third
+    with open(path) as handle:
+        lines = handle.readlines()
+    with open(path, "w") as handle:
+        handle.writelines(lines[:2])
+        handle.write(lines[2][:10])
+    
+    result = export_table(db, "exam_results", path, after_id="resume")
+    assert result['rows'] == 3
+    with open(path) as handle:
+        ids = [json.loads(line)['id'] for line in handle]
+    assert ids == [1, 2, 3, 4, 5]
+    assert last_exported_id(path, "exam_results") == 5
+    db.close()
+
+
+def test_answer_export_resumes_mid_result(tmp_path):
+    """Test resuming an answers export cut off inside a result re-exports that result"""
+    db = _database_with_results(tmp_path, 6)
+    for file_format in ("jsonl", "csv"):
+        path = os.path.join(tmp_path, f"answers.{file_format}")
+        export_table(db, "exam_answers", path)
+        with open(path, newline="") as handle:
+            lines = handle.readlines()
+        
+        # Cut off after the first answer of the third result (plus the CSV header)
+        keep = 5 if file_format == "jsonl" else 6
+        with open(path, "w", newline="") as handle:
+            handle.writelines(lines[:keep])
+            handle.write(lines[keep][:5])
+        result = export_table(db, "exam_answers", path, after_id="resume")
+        assert result['rows'] == 8
+        with open(path, newline="") as handle:
+            assert handle.readlines() == lines
+    db.close()
+
+
+def test_export_sharded_database(db_path, tmp_path):
+    """Test a sharded export covers every shard and resumes in the right one"""
+    db = open_database(db_path, shards=3)
+    for i in range(9):
+        db.add_application(f"sharded{i}", "Sharded", "sharded@example.com")
+        db.save_exam_result(f"sharded{i}", 70, True, 10, None, "General")
+    path = os.path.join(tmp_path, "results.csv")
+    export_table(db, "exam_results", path, page_size=2)
+    with open(path, newline="") as handle:
+        rows = list(csv.DictReader(handle))
+    assert sorted(row['user_id'] for row in rows) == [f"sharded{i}" for i in range(9)]
+    
+    with open(path, newline="") as handle:
+        lines = handle.readlines()
+    with open(path, "w", newline="") as handle:
+        handle.writelines(lines[:5])
+    shard, last_id = last_exported_position(path, "exam_results")
+    assert (shard, last_id) == (int(rows[3]['shard']), int(rows[3]['id']))
+    
+    result = export_table(db, "exam_results", path, after_id="resume")
+    assert result['rows'] == 5
+    with open(path, newline="") as handle:
+        assert list(csv.DictReader(handle)) == rows
+    db.close()
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_export_pages_and_filters(Path(tempfile.mkdtemp(dir=directory)))
+    print("✓ test_export_pages_and_filters passed")
+    
+    test_export_resumes_after_last_id(Path(tempfile.mkdtemp(dir=directory)))
+    print("✓ test_export_resumes_after_last_id passed")
+    
+    test_answer_export_resumes_mid_result(Path(tempfile.mkdtemp(dir=directory)))
+    print("✓ test_answer_export_resumes_mid_result passed")
+    
+    test_export_sharded_database(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"),
+                                 Path(tempfile.mkdtemp(dir=directory)))
+    print("✓ test_export_sharded_database passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll export tests passed!")
@@ -0,0 +1,121 @@
+"""
+Unit tests for the exam form pool
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from application import ApplicationManager
+from database import Database
+from exam import IAExam, SAMPLE_QUESTIONS, get_question_bank
+from forms import ExamFormPool, form_version
+from question_bank import QuestionBank
+from sharding import open_database
+
+
+def test_refill_and_take(db_path):
+    """Test the pool fills up, hands out forms in order and regenerates when empty"""
+    db = Database(db_path)
+    pool = ExamFormPool(db, get_question_bank(), {"pool_size": 5, "low_water_mark": 0, "batch_size": 2})
+    assert pool.refill() == 5
+    assert pool.refill() == 0
+    assert pool.available() == [5]
+    
+    taken = [pool.take(f"form{i}") for i in range(5)]
+    assert [form_id for form_id, _ in taken] == [1, 2, 3, 4, 5]
+    assert all(question_ids for _, question_ids in taken)
+    assert pool.available() == [0]
+    
+    # An empty pool still serves a form, sampled on the spot
+    form_id, question_ids = pool.take("form5")
+    assert form_id == 6 and question_ids
+    pool.release("form5", form_id)
+    assert pool.available() == [1]
+    pool.close()
+    db.close()
+
+
+def test_low_water_mark_refills_in_background(db_path):
+    """Test taking a form below the low-water mark tops the pool up again once started"""
+    db = open_database(db_path, shards=2)
+    pool = ExamFormPool(db, get_question_bank(), {"pool_size": 4, "low_water_mark": 4, "batch_size": 3})
+    assert pool.refill() == 8
+    pool.take("water1")
+    assert pool._thread is None
+    assert sorted(pool.available()) == [3, 4]
+    
+    pool.start()
+    pool.take("water2")
+    pool._thread.join()
+    assert pool.available() == [4, 4]
+    with db.shard_for("water2").connection() as conn:
+        assert conn.execute(
+            "SELECT COUNT(*) FROM exam_forms WHERE claimed_at IS NULL"
+        ).fetchone()[0] == 4
+    pool.close()
+    db.close()
+
+
+def test_stale_forms_are_replaced(db_path):
+    """Test a changed question bank gets a new version and old unused forms are dropped"""
+    db = Database(db_path)
+    bank = get_question_bank()
+    pool = ExamFormPool(db, bank, {"pool_size": 3})
+    pool.refill()
+    
+    smaller = QuestionBank(SAMPLE_QUESTIONS[:-1])
+    assert form_version(smaller) != pool.version
+    assert form_version(QuestionBank(SAMPLE_QUESTIONS)) == pool.version
+    
+    new_pool = ExamFormPool(db, smaller, {"pool_size": 3})
+    assert new_pool.available() == [0]
+    assert new_pool.refill() == 3
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM exam_forms").fetchone()[0] == 3
+    db.close()
+
+
+def test_exam_records_form_id(db_path):
+    """Test an exam is served from the pool and its result records the form"""
+    db = Database(db_path)
+    app_mgr = ApplicationManager(db)
+    app_mgr.create_application("form_user", "Form Test", "form@example.com")
+    app_mgr.submit_application("form_user")
+    app_mgr.approve_application("form_user")
+    
+    exam = IAExam(db)
+    exam.forms.refill()
+    started = exam.start_exam("form_user")
+    assert started['success'] == True
+    session = exam.sessions.get("form_user")
+    assert session.form_id == 1
+    assert [q['id'] for q in started['exam_session']['questions']] == list(session.question_ids)
+    
+    assert exam.submit_exam("form_user", [{"question_id": 1, "answer": "B"}])['success'] == True
+    assert exam.get_exam_results("form_user")['results'][0]['form_id'] == 1
+    exam.close()
+    db.close()
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_refill_and_take(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_refill_and_take passed")
+    
+    test_low_water_mark_refills_in_background(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_low_water_mark_refills_in_background passed")
+    
+    test_stale_forms_are_replaced(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_stale_forms_are_replaced passed")
+    
+    test_exam_records_form_id(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_exam_records_form_id passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll form pool tests passed!")
@@ -0,0 +1,118 @@
+"""
+Unit tests for the batch grader
+"""
+
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from grading import BatchGrader, score_percentage
+from question_bank import QuestionBank
+
+
+def _bank():
+    """Build a small bank whose answer to question n is 'ABCD'[n % 4]"""
+    return QuestionBank([
+        {
+            "id": question_id,
+            "category": "Security Fundamentals",
+            "difficulty": "Easy",
+            "question": f"Question {question_id}",
+            "options": ["A) One", "B) Two", "C) Three", "D) Four"],
+            "correct_answer": "ABCD"[question_id % 4]
+        }
+        for question_id in range(1, 11)
+    ])
+
+
+def test_grade_batch():
+    """Test scores, pass flags and per-answer correctness for several sheets"""
+    grader = BatchGrader(_bank(), min_passing_score=70)
+    perfect = [{"question_id": qid, "answer": "ABCD"[qid % 4]} for qid in range(1, 11)]
+    half = [{"question_id": qid, "answer": "ABCD"[qid % 4] if qid <= 5 else "Z"}
+            for qid in range(1, 11)]
+    graded = grader.grade([perfect, half, []])
+    
+    assert list(graded.scores) == [100, 50, 0]
+    assert list(graded.passed) == [True, False, False]
+    assert graded.result(1) == {"score": 50, "passed": False,
+                                "correct_answers": 5, "total_questions": 10}
+    details = graded.detailed_answers(1)
+    assert [answer['question_id'] for answer in details] == list(range(1, 11))
+    assert details[5] == {"question_id": 6, "user_answer": "Z",
+                          "correct_answer": "C", "is_correct": False}
+    assert graded.detailed_answers(2) == []
+
+
+def test_grade_ignores_unserved_and_repeated_answers():
+    """Test only the first answer to each served question in the bank counts"""
+    grader = BatchGrader(_bank())
+    sheet = [
+        {"question_id": 1, "answer": "B"},
+        {"question_id": 1, "answer": "A"},
+        {"question_id": 2, "answer": "C"},
+        {"question_id": 3, "answer": "D"},
+        {"question_id": 42, "answer": "A"}
+    ]
+    graded = grader.grade([sheet], served=[(1, 3)])
+    assert graded.result(0)['total_questions'] == 2
+    assert graded.result(0)['correct_answers'] == 2
+    assert score_percentage(29, 50) == 58
+
+
+def test_grade_mixed_served_filters():
+    """Test sheets without a served list are graded in full next to filtered ones"""
+    grader = BatchGrader(_bank())
+    perfect = [{"question_id": qid, "answer": "ABCD"[qid % 4]} for qid in range(1, 11)]
+    graded = grader.grade([perfect, perfect], served=[None, (1, 2)])
+    assert graded.result(0)['total_questions'] == 10
+    assert graded.result(0)['score'] == 100
+    assert graded.result(1)['total_questions'] == 2
+    
+    try:
+        grader.grade([perfect, perfect], served=[(1, 11), (1,)])
+        assert False, "served ids outside the bank should be rejected"
+    except ValueError:
+        pass
+
+
+def test_grade_sparse_question_ids():
+    """Test a bank with large, scattered ids grades like a dense one"""
+    grader = BatchGrader(QuestionBank([
+        {"id": question_id, "category": "Security Fundamentals", "difficulty": "Easy",
+         "question": f"Question {question_id}", "options": ["A) One", "B) Two"],
+         "correct_answer": answer}
+        for question_id, answer in ((2_000_000_000, "A"), (7, "B"), (900_000, "A"))
+    ]))
+    assert len(grader.key) == 3
+    sheet = [
+        {"question_id": 2_000_000_000, "answer": "A"},
+        {"question_id": 7, "answer": "A"},
+        {"question_id": 900_000, "answer": "A"},
+        {"question_id": 900_001, "answer": "A"},
+        {"question_id": -5, "answer": "A"}
+    ]
+    graded = grader.grade([sheet, sheet], served=[None, (7, 2_000_000_000)])
+    assert graded.result(0) == {"score": 66, "passed": False,
+                                "correct_answers": 2, "total_questions": 3}
+    assert graded.result(1)['correct_answers'] == 1
+    assert graded.result(1)['total_questions'] == 2
+    assert [answer['correct_answer'] for answer in graded.detailed_answers(0)] == ["A", "B", "A"]
+
+
+if __name__ == "__main__":
+    test_grade_batch()
+    print("✓ test_grade_batch passed")
+    
+    test_grade_ignores_unserved_and_repeated_answers()
+    print("✓ test_grade_ignores_unserved_and_repeated_answers passed")
+    
+    test_grade_mixed_served_filters()
+    print("✓ test_grade_mixed_served_filters passed")
+    
+    test_grade_sparse_question_ids()
+    print("✓ test_grade_sparse_question_ids passed")
+    
+    print("\nAll grading tests passed!")
@@ -0,0 +1,66 @@
+"""
+Unit tests for request and SQL metrics
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bot import DHSBot
+from database import Database
+from metrics import METRICS, normalize_sql
+
+
+def test_normalize_sql():
+    """Test literals and IN lists collapse so similar statements share a label"""
+    assert normalize_sql("SELECT *  FROM t\n WHERE id IN (?, ?, ?) AND n = 5") == \
+        "SELECT * FROM t WHERE id IN (?) AND n = ?"
+    assert normalize_sql("SELECT 'a''b' FROM t") == "SELECT ? FROM t"
+
+
+def test_request_and_sql_metrics(db_path):
+    """Test requests, statements and per-request commits are recorded"""
+    db = Database(db_path)
+    bot = DHSBot(db)
+    # Create the schema up front so its migration commit is not counted below
+    db.init_database()
+    METRICS.reset()
+    
+    bot.process_user_request("create_application", "metrics1", name="M", email="m@example.com")
+    bot.process_user_request("create_application", "metrics1", name="M", email="m@example.com")
+    bot.process_user_request("no_such_request", "metrics1")
+    
+    snapshot = bot.get_metrics()
+    create = snapshot['requests']['create_application']
+    assert create['count'] == 2
+    assert (create['success'], create['failure']) == (1, 1)
+    assert create['commits'] == 1
+    assert snapshot['requests']['unknown']['failure'] == 1
+    assert snapshot['commits']['count'] >= 1
+    inserts = [statement for statement in snapshot['statements']
+               if statement.startswith("INSERT INTO applications")]
+    assert snapshot['statements'][inserts[0]]['count'] == 2
+    
+    text = bot.get_metrics_text()
+    assert 'dhs_bot_requests_total{request_type="create_application",outcome="success"} 1' in text
+    assert 'dhs_bot_request_duration_seconds_bucket{request_type="create_application",le="+Inf"} 2' in text
+    assert "# TYPE dhs_bot_sql_commit_duration_seconds histogram" in text
+    bot.close()
+    db.close()
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_normalize_sql()
+    print("✓ test_normalize_sql passed")
+    
+    test_request_and_sql_metrics(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_request_and_sql_metrics passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll metrics tests passed!")
@@ -0,0 +1,69 @@
+"""
+Unit tests for row records
+"""
+
+import sys
+import os
+import shutil
+import json
+import sqlite3
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from application import ApplicationManager
+from database import Database
+from models import Application, ExamAnswer, ExamResult
+
+
+def test_row_factory_and_to_dict():
+    """Test records are built by a row factory and convert back to dicts"""
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.execute("SELECT 7, 3, 'A', 'B', 0")
+    cursor.row_factory = ExamAnswer.from_row
+    answer = cursor.fetchone()
+    assert answer == ExamAnswer(7, 3, "A", "B", False)
+    assert answer.is_correct is False
+    assert answer.to_dict() == {"result_id": 7, "question_id": 3, "user_answer": "A",
+                                "correct_answer": "B", "is_correct": False}
+    assert not hasattr(answer, "__dict__")
+    assert ExamResult.select_list().startswith("id, user_id, exam_date")
+    conn.close()
+
+
+def test_database_returns_records(db_path):
+    """Test reads return records, cached reads return the same ones, and responses stay dicts"""
+    db = Database(db_path)
+    manager = ApplicationManager(db)
+    manager.create_application("model001", "Model", "model@example.com")
+    app = db.get_application("model001")
+    assert isinstance(app, Application)
+    assert app.status == "DRAFT"
+    assert db.get_application("model001") is app
+    
+    db.save_exam_submission("model001", 90, True, 5, None, "General", [
+        {"question_id": 4, "user_answer": "C", "correct_answer": "C", "is_correct": True}
+    ])
+    history = db.get_exam_history("model001")
+    assert isinstance(history[0], ExamResult)
+    assert history[0].score == 90
+    assert db.get_exam_histories(["model001"])["model001"] == history
+    
+    response = manager.get_application("model001")
+    assert response['data']['status'] == "DRAFT"
+    json.dumps(response)
+    db.close()
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_row_factory_and_to_dict()
+    print("✓ test_row_factory_and_to_dict passed")
+    
+    test_database_returns_records(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_database_returns_records passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll model tests passed!")
@@ -0,0 +1,117 @@
+"""
+Unit tests for the Question Bank
+"""
+
+import sys
+import os
+import shutil
+import random
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from question_bank import QuestionBank, write_question_bank, load_question_bank
+from config.settings import EXAM_CATEGORIES
+
+
+def _synthetic_questions(per_cell):
+    """Build a bank with per_cell questions for every category and difficulty"""
+    questions = []
+    for category in EXAM_CATEGORIES:
+        for difficulty in ("Easy", "Medium", "Hard"):
+            for _ in range(per_cell):
+                questions.append({
+                    "id": len(questions) + 1,
+                    "category": category,
+                    "difficulty": difficulty,
+                    "question": f"Question {len(questions) + 1}",
+                    "options": ["A) One", "B) Two", "C) Three", "D) Four"],
+                    "correct_answer": "A"
+                })
+    return questions
+
+
+def test_lookup_by_id():
+    """Test questions and answer keys are found by id"""
+    bank = QuestionBank(_synthetic_questions(2))
+    assert len(bank) == 30
+    assert bank.get(7)['id'] == 7
+    assert bank.answer_key(7) == "A"
+    assert bank.get(999) is None
+    assert bank.answer_key(999) is None
+
+
+def test_stratified_sample_meets_quotas():
+    """Test a sample is balanced across categories and difficulty levels"""
+    bank = QuestionBank(_synthetic_questions(2000))
+    questions = bank.sample(50, rng=random.Random(1))
+    
+    assert len(questions) == 50
+    assert len({q['id'] for q in questions}) == 50
+    by_category = Counter(q['category'] for q in questions)
+    assert all(by_category[category] == 10 for category in EXAM_CATEGORIES)
+    by_difficulty = Counter(q['difficulty'] for q in questions)
+    assert by_difficulty == {"Easy": 15, "Medium": 25, "Hard": 10}
+
+
+def test_sample_redistributes_short_strata():
+    """Test quotas a category cannot fill are taken from the others"""
+    questions = _synthetic_questions(10)
+    questions = [q for q in questions if q['category'] != "Cryptography" or q['difficulty'] == "Easy"]
+    bank = QuestionBank(questions)
+    sample = bank.sample(50, rng=random.Random(2))
+    
+    assert len(sample) == 50
+    assert sum(1 for q in sample if q['category'] == "Cryptography") <= 10
+    assert len(bank.sample(1000)) == len(bank)
+
+
+def test_packed_bank_file_round_trip(tmp_path):
+    """Test a bank written to disk is memory-mapped, shared and decoded on demand"""
+    questions = _synthetic_questions(50)
+    path = str(tmp_path / "bank.qbank")
+    write_question_bank(questions, path)
+    
+    bank = load_question_bank(path)
+    assert load_question_bank(path) is bank
+    assert len(bank) == len(questions)
+    assert bank.get(123) == questions[122]
+    assert bank.answer_key(123) == "A"
+    assert len(bank.ids_in_category("Cryptography")) == 150
+    assert len(bank.sample(50)) == 50
+
+
+def test_any_name_length_round_trips():
+    """Test banks load whatever padding follows the category names"""
+    for suffix in range(8):
+        bank = QuestionBank([{
+            "id": 1, "category": "C" * suffix, "difficulty": "Easy", "question": "Q",
+            "options": ["A) One"], "correct_answer": "A"
+        }])
+        assert bank.categories() == ["C" * suffix]
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_lookup_by_id()
+    print("✓ test_lookup_by_id passed")
+    
+    test_stratified_sample_meets_quotas()
+    print("✓ test_stratified_sample_meets_quotas passed")
+    
+    test_sample_redistributes_short_strata()
+    print("✓ test_sample_redistributes_short_strata passed")
+    
+    test_packed_bank_file_round_trip(Path(tempfile.mkdtemp(dir=directory)))
+    print("✓ test_packed_bank_file_round_trip passed")
+    
+    test_any_name_length_round_trips()
+    print("✓ test_any_name_length_round_trips passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll question bank tests passed!")
@@ -0,0 +1,91 @@
+"""
+Unit tests for Exam Session storage
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database import Database
+from sessions import ExamSession, MemorySessionStore, SQLiteSessionStore
+
+
+def test_memory_store_expiry_and_cap():
+    """Test expired sessions are evicted and the size cap is enforced"""
+    store = MemorySessionStore(max_sessions=2)
+    now = time.time()
+    assert store.put(ExamSession("old", [1, 2], started_at=now - 100, expires_at=now - 1))
+    assert store.put(ExamSession("a", [1, 2]))
+    assert store.get("old") is None
+    
+    assert store.put(ExamSession("b", [3]))
+    assert store.put(ExamSession("c", [4])) == False
+    assert store.pop("a").question_ids == (1, 2)
+    assert store.put(ExamSession("c", [4]))
+    assert len(store) == 2
+
+
+def test_sqlite_store_survives_restart(db_path):
+    """Test sessions in the sqlite store are visible to a new store instance"""
+    db = Database(db_path)
+    SQLiteSessionStore(db).put(ExamSession("persisted", [5, 3, 1]))
+    db.close()
+    
+    db = Database(db_path)
+    store = SQLiteSessionStore(db)
+    session = store.get("persisted")
+    assert session is not None
+    assert session.question_ids == (5, 3, 1)
+    assert store.pop("persisted") is not None
+    assert store.get("persisted") is None
+    db.close()
+
+
+def test_sqlite_pop_hands_a_session_out_once(db_path):
+    """Test concurrent pops of one session return it to exactly one caller"""
+    db = Database(db_path)
+    store = SQLiteSessionStore(db)
+    store.put(ExamSession("popped", [2, 4], form_id=7))
+    barrier = threading.Barrier(4)
+    popped = []
+    
+    def pop():
+        barrier.wait()
+        popped.append(store.pop("popped"))
+    
+    threads = [threading.Thread(target=pop) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sessions = [session for session in popped if session is not None]
+    assert len(sessions) == 1
+    assert sessions[0].question_ids == (2, 4) and sessions[0].form_id == 7
+    
+    now = time.time()
+    store.put(ExamSession("expired", [1], started_at=now - 100, expires_at=now - 1))
+    assert store.pop("expired") is None
+    assert len(store) == 0
+    db.close()
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_memory_store_expiry_and_cap()
+    print("✓ test_memory_store_expiry_and_cap passed")
+    
+    test_sqlite_store_survives_restart(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_sqlite_store_survives_restart passed")
+    
+    test_sqlite_pop_hands_a_session_out_once(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_sqlite_pop_hands_a_session_out_once passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll session tests passed!")
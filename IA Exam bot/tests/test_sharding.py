@@ -0,0 +1,204 @@
+"""
+Unit tests for sharded storage
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from application import ApplicationManager
+from bot import DHSBot
+from database import Database
+from exam import IAExam
+from sessions import SQLiteSessionStore
+from sharding import ShardedDatabase, open_database, reshard, shard_index, shard_paths
+
+
+ANSWERS = [
+    {"question_id": 1, "user_answer": "A", "correct_answer": "A", "is_correct": True},
+    {"question_id": 2, "user_answer": "B", "correct_answer": "C", "is_correct": False}
+]
+
+
+def test_routing_is_stable(db_path):
+    """Test users map to the same shard every time and spread over all shards"""
+    assert shard_index("user001", 4) == shard_index("user001", 4)
+    assert shard_index(None, 4) == 0
+    assert {shard_index(f"user{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+    
+    assert isinstance(open_database(db_path, shards=1), Database)
+    names = [p.name for p in shard_paths(db_path, 3)]
+    assert names == ["test.1-of-3.db", "test.2-of-3.db", "test.3-of-3.db"]
+
+
+def test_per_user_operations_use_one_shard(db_path):
+    """Test a user's rows live in their shard and bulk reads merge shards"""
+    db = open_database(db_path, shards=3)
+    user_ids = [f"shard{i}" for i in range(12)]
+    assert db.add_applications([(user_id, "Shard", "shard@example.com") for user_id in user_ids]) == set()
+    assert db.add_applications([("shard0", "Again", "again@example.com")]) == {"shard0"}
+    
+    for user_id in user_ids:
+        result_id = db.save_exam_submission(user_id, 80, True, 10, None, "General", ANSWERS)
+        shard = db.shard_for(user_id)
+        assert shard.get_application(user_id) is not None
+        assert len(shard.get_exam_history(user_id)) == 1
+        others = [other for other in db.shards if other is not shard]
+        assert all(other.get_application(user_id) is None for other in others)
+        assert db.get_exam_answers(result_id, user_id=user_id)[0].user_answer == "A"
+    
+    assert set(db.get_applications(user_ids + ["missing"])) == set(user_ids)
+    assert all(len(history) == 1 for history in db.get_exam_histories(user_ids).values())
+    assert db.transition_applications(user_ids, ["SUBMITTED"]) == set(user_ids)
+    assert db.get_application("shard5").status == "SUBMITTED"
+    db.close()
+
+
+def test_audit_log_pages_merge_shards(db_path):
+    """Test the whole audit log pages across shards without repeats or gaps"""
+    db = open_database(db_path, shards=3)
+    for i in range(10):
+        db.add_application(f"audit{i}", "Audit", "audit@example.com")
+        db.log_action(f"audit{i}", "NOTE", f"note {i}")
+    db.flush_audit_log()
+    
+    seen = []
+    cursor = None
+    while True:
+        page = db.get_audit_log_page(cursor=cursor, limit=4)
+        seen.extend((item['shard'], item['id']) for item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == 20
+    assert len(set(seen)) == 20
+    
+    notes = db.get_audit_log_page(action="NOTE", limit=100)['items']
+    assert sorted(item['details'] for item in notes) == sorted(f"note {i}" for i in range(10))
+    assert len(db.get_audit_log_page(user_id="audit3")['items']) == 2
+    db.close()
+
+
+def test_exam_lifecycle_on_shards(db_path):
+    """Test the managers and the session store work on a sharded database"""
+    db = open_database(db_path, shards=2)
+    app_mgr = ApplicationManager(db)
+    exam = IAExam(db, session_store=SQLiteSessionStore(db))
+    for user_id in ["life1", "life2", "life3"]:
+        app_mgr.create_application(user_id, "Life", "life@example.com")
+        app_mgr.submit_application(user_id)
+        app_mgr.approve_application(user_id)
+        assert exam.start_exam(user_id)['success'] == True
+    assert len(exam.sessions) == 3
+    result = exam.submit_exam("life2", [{"question_id": 1, "answer": "B"}])
+    assert result['success'] == True
+    assert len(exam.sessions) == 2
+    assert exam.get_exam_results("life2")['success'] == True
+    exam.close()
+    db.close()
+
+
+def test_batch_holds_only_its_shards(db_path):
+    """Test a write to one shard goes through while a batch holds another"""
+    db = open_database(db_path, shards=2)
+    bot = DHSBot(db)
+    holder, writer = [next(f"user{i}" for i in range(100) if shard_index(f"user{i}", 2) == index)
+                      for index in (0, 1)]
+    entered, release = threading.Event(), threading.Event()
+    
+    def hold(user_id, **kwargs):
+        entered.set()
+        release.wait(10)
+        return {"success": True, "message": "Held"}
+    
+    bot.register_handler("hold", hold, "Hold the batch open", writes=True)
+    batch = threading.Thread(target=bot.process_batch, args=([
+        {"request_type": "hold", "user_id": holder}
+    ],))
+    batch.start()
+    assert entered.wait(10)
+    write = threading.Thread(target=bot.app_manager.create_application,
+                             args=(writer, "Writer", "writer@example.com"))
+    write.start()
+    write.join(5)
+    try:
+        assert not write.is_alive(), "write to a free shard waited for the batch"
+    finally:
+        release.set()
+        batch.join()
+        write.join()
+    assert db.get_application(writer) is not None
+    bot.close()
+    db.close()
+
+
+def test_reshard_moves_every_row(db_path):
+    """Test resharding copies applications, results and answers to their new shards"""
+    db = Database(db_path, answer_storage="rows")
+    for i in range(9):
+        user_id = f"move{i}"
+        db.add_application(user_id, "Move", "move@example.com")
+        db.save_exam_submission(user_id, 60 + i, True, 10, None, "General", ANSWERS)
+    db.close()
+    
+    copied = reshard(db_path, 1, 3, batch_size=4)
+    assert copied['applications'] == 9
+    assert copied['exam_results'] == 9
+    assert copied['exam_answers'] == 9
+    
+    sharded = ShardedDatabase(shard_paths(db_path, 3))
+    for i in range(9):
+        history = sharded.get_exam_history(f"move{i}")
+        assert [result.score for result in history] == [60 + i]
+        answers = sharded.get_exam_answers(history[0].id, user_id=f"move{i}")
+        assert [answer.question_id for answer in answers] == [1, 2]
+        assert sharded.get_exam_summary(f"move{i}")['attempt_count'] == 1
+    assert len(sharded.get_audit_log_page(user_id="move4")['items']) == 2
+    sharded.close()
+    
+    # The old layout refuses to open once it has been copied
+    old = Database(db_path)
+    try:
+        old.get_application("move0")
+        assert False, "a resharded file should not open"
+    except ValueError as exc:
+        assert "DATABASE_SHARDS = 3" in str(exc)
+    finally:
+        old.close()
+    
+    assert reshard(db_path, 3, 2)['exam_results'] == 9
+    try:
+        reshard(db_path, 3, 2)
+        assert False, "resharding into existing files should fail"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_routing_is_stable(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_routing_is_stable passed")
+    
+    test_per_user_operations_use_one_shard(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_per_user_operations_use_one_shard passed")
+    
+    test_audit_log_pages_merge_shards(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_audit_log_pages_merge_shards passed")
+    
+    test_exam_lifecycle_on_shards(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_exam_lifecycle_on_shards passed")
+    
+    test_batch_holds_only_its_shards(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_batch_holds_only_its_shards passed")
+    
+    test_reshard_moves_every_row(os.path.join(tempfile.mkdtemp(dir=directory), "test.db"))
+    print("✓ test_reshard_moves_every_row passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll sharding tests passed!")
@@ -0,0 +1,65 @@
+"""
+Unit tests for fast startup
+"""
+
+import sys
+import os
+import shutil
+import json
+import subprocess
+import tempfile
+from pathlib import Path
+
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROBE = """
+import json, os, pathlib, sys
+sys.path.insert(0, {project!r})
+sys.path.insert(0, os.path.join({project!r}, 'src'))
+made = []
+original_mkdir = pathlib.Path.mkdir
+pathlib.Path.mkdir = lambda self, *args, **kwargs: made.append(str(self)) or original_mkdir(self, *args, **kwargs)
+import config.settings
+after_settings = list(made)
+from bot import DHSBot
+from database import Database
+path = os.path.join({directory!r}, "nested", "startup.db")
+bot = DHSBot(Database(path))
+constructed = os.path.exists(path)
+answer = bot.process_user_request("get_status", "nobody")
+print(json.dumps({{
+    "after_settings": after_settings,
+    "heavy": [name for name in ("numpy", "tabulate") if name in sys.modules],
+    "db_before_request": constructed,
+    "db_after_request": os.path.exists(path),
+    "answer": answer
+}}))
+bot.close()
+"""
+
+
+def test_startup_is_lazy(tmp_path):
+    """Test importing and constructing the bot touches no files and loads no heavy modules"""
+    probe = PROBE.format(project=PROJECT_DIR, directory=str(tmp_path))
+    output = subprocess.run([sys.executable, "-c", probe], check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output)
+    assert result['after_settings'] == []
+    assert result['heavy'] == []
+    assert result['db_before_request'] == False
+    assert result['db_after_request'] == True
+    assert result['answer'] == {"success": False, "message": "Application not found"}
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    
+    test_startup_is_lazy(Path(tempfile.mkdtemp(dir=directory)))
+    print("✓ test_startup_is_lazy passed")
+    
+    shutil.rmtree(directory)
+    print("\nAll startup tests passed!")